@@ -1,22 +1,31 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from app.core.database import get_db
+from app.core.pagination import ListParams, ListQuery
 from app.schemas import booking as booking_schema
 from app.models import booking as booking_model
 
 router = APIRouter()
 
+booking_list = ListQuery(
+    booking_model.PageListing, booking_schema.PageListing,
+    filters=("generic_booking_id", "inst_id", "foreign_id", "page_association_type_id", "archived", "start_date", "end_date"),
+    sorts=("title", "start_date", "end_date"),
+)
+
 @router.get("/", response_model=List[booking_schema.PageListing])
 def read_bookings(
     skip: int = 0,
     limit: int = 100,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
     """
     Retrieve page listings (bookings).
     """
-    return db.query(booking_model.PageListing).offset(skip).limit(limit).all()
+    query = db.query(booking_model.PageListing).options(selectinload(booking_model.PageListing.booking))
+    return booking_list.respond(query, params, skip, limit)
 
 @router.post("/", response_model=booking_schema.PageListing)
 def create_booking(
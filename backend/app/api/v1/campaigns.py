@@ -1,11 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List, Dict
-from app.core.database import get_db
+from typing import Any, List, Dict, Literal, Optional
+from app.core.config import settings
+from app.core.database import get_async_db, get_db
+from app.core.responses import conditional_response, json_body
+from app.models.campaign import CampaignRule
+from app.schemas import campaign as campaign_schema
 from app.schemas.campaign import CampaignList
+from app.services.budget_optimizer import budget_optimizer
+from app.services.campaign_classifier import Rule, rule_error
+from app.services.campaign_rules import campaign_rules
+from app.services.country_insights import country_insights
+from app.services.daily_insights import daily_insights
 from app.services.meta_service import meta_service
 from app.services.prediction_service import prediction_service
-from pydantic import BaseModel
+from app.services.stats_cube import stats_cube
+from pydantic import BaseModel, Field
 
 router = APIRouter()
 
@@ -14,11 +27,64 @@ class PredictionRequest(BaseModel):
     countries: List[str]
     allocations: Dict[str, float]
     duration: int
+    month: Optional[int] = Field(None, ge=1, le=12)  # Start month, for seasonal CPM/CPC/CPL
+
+class PredictionBatchRequest(BaseModel):
+    scenarios: List[PredictionRequest]
+
+class OptimizationRequest(BaseModel):
+    campaign_type: str
+    countries: List[str] = Field(..., min_length=1)
+    duration: int = Field(..., ge=1)
+    objective: Literal["impressions", "reach", "clicks", "leads"] = "impressions"
+    month: Optional[int] = Field(None, ge=1, le=12)
+    # Percent of the media spend, per country; countries not listed use the defaults
+    min_share: Dict[str, float] = {}
+    max_share: Dict[str, float] = {}
+    default_min_share: float = Field(0.0, ge=0, le=100)
+    default_max_share: float = Field(100.0, ge=0, le=100)
 
 @router.get("/", response_model=CampaignList)
-def get_campaigns(db: Session = Depends(get_db)):
-    """Get all current campaigns."""
-    return meta_service.get_campaigns(db)
+async def get_campaigns(
+    request: Request,
+    country: Optional[str] = Query(None, min_length=2, max_length=2, description="ISO country code the campaign targets or delivered in"),
+    targeted_only: bool = False,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get all current campaigns (served from the pre-serialized snapshot)."""
+    snapshot = meta_service.get_published_snapshot()
+    if snapshot is None:
+        # First read after startup (or an empty DB): build it off the event loop
+        snapshot = await run_in_threadpool(meta_service.load_campaign_snapshot)
+    headers = {"X-Snapshot-Version": str(snapshot.version)}
+    if not country:
+        return conditional_response(request, snapshot.body, etag=snapshot.etag, headers=headers)
+
+    # Index seek on campaign_country_insights, then filter the already-built snapshot
+    ids = await country_insights.campaign_ids_for_country_async(db, country, targeted_only)
+    campaigns = snapshot.campaigns
+    filtered = campaigns.model_copy(update={
+        "Brand": [c for c in campaigns.Brand if c.id in ids],
+        "LeadGen": [c for c in campaigns.LeadGen if c.id in ids]
+    })
+    return conditional_response(request, filtered.model_dump_json().encode("utf-8"), headers=headers)
+
+@router.get("/trend")
+async def get_campaign_trend(
+    campaign_id: Optional[str] = None,
+    campaign_type: Optional[str] = None,
+    brand: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Daily spend, impressions, clicks and leads (with CPM/CTR/CPL) from the daily insights table."""
+    return await daily_insights.trend_async(db, campaign_id, campaign_type, brand, date_from, date_to)
+
+@router.get("/refresh-status")
+def get_refresh_status():
+    """State of the background Meta refresh (in flight, last success, last error)."""
+    return meta_service.get_refresh_status()
 
 @router.post("/predict")
 def predict_performance(request: PredictionRequest):
@@ -28,7 +94,122 @@ def predict_performance(request: PredictionRequest):
             request.campaign_type,
             request.countries,
             request.allocations,
-            request.duration
+            request.duration,
+            request.month
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/predict/batch")
+def predict_performance_batch(request: Request, batch: PredictionBatchRequest):
+    """Predictions for many scenarios in one go; results are in request order and match /predict for each."""
+    if len(batch.scenarios) > settings.PREDICT_BATCH_MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.PREDICT_BATCH_MAX_SCENARIOS} scenarios per batch")
+    try:
+        results = prediction_service.calculate_predictions_batch([
+            {
+                "campaign_type": s.campaign_type,
+                "countries": s.countries,
+                "allocations": s.allocations,
+                "duration_months": s.duration,
+                "month": s.month
+            }
+            for s in batch.scenarios
+        ])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Large payloads: orjson + compression instead of jsonable_encoder
+    return conditional_response(request, json_body({"results": results}))
+
+@router.post("/optimize")
+def optimize_allocations(request: OptimizationRequest):
+    """Split the media spend across countries to maximise the objective, within the share bounds."""
+    try:
+        return budget_optimizer.optimize(
+            request.campaign_type,
+            request.countries,
+            request.duration,
+            request.objective,
+            request.month,
+            request.min_share,
+            request.max_share,
+            request.default_min_share,
+            request.default_max_share
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/predict/stats")
+def get_prediction_stats(
+    campaign_type: str,
+    country: str,
+    month: Optional[int] = Query(None, ge=1, le=12)
+):
+    """CPM/CPC/CPL/frequency predictions would use, with percentiles, sample counts and the cell each came from."""
+    return {"stats": stats_cube.lookup(campaign_type, country, month), "cube": stats_cube.get_status()}
+
+
+def _check_rule(rule: CampaignRule):
+    error = rule_error(Rule(rule.kind, rule.pattern, rule.value, rule.match, rule.priority, rule.exclude_types))
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+@router.get("/rules", response_model=List[campaign_schema.CampaignRule])
+def read_campaign_rules(db: Session = Depends(get_db)) -> Any:
+    """Campaign taxonomy rules (type, brand, display-name prefixes) in evaluation order."""
+    campaign_rules.reload_if_changed(db)
+    return db.query(CampaignRule).order_by(CampaignRule.kind, CampaignRule.priority, CampaignRule.id).all()
+
+@router.post("/rules", response_model=campaign_schema.CampaignRule)
+def create_campaign_rule(
+    *,
+    db: Session = Depends(get_db),
+    rule_in: campaign_schema.CampaignRuleCreate
+) -> Any:
+    """Add a rule; it applies to the next refresh, or now via POST /reclassify."""
+    rule = CampaignRule(**rule_in.model_dump())
+    _check_rule(rule)
+    db.add(rule)
+    db.commit()
+    db.refresh(rule)
+    campaign_rules.load(db)
+    return rule
+
+@router.put("/rules/{rule_id}", response_model=campaign_schema.CampaignRule)
+def update_campaign_rule(
+    *,
+    db: Session = Depends(get_db),
+    rule_id: int,
+    rule_in: campaign_schema.CampaignRuleUpdate
+) -> Any:
+    rule = db.query(CampaignRule).filter(CampaignRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    for field, value in rule_in.model_dump(exclude_unset=True).items():
+        setattr(rule, field, value)
+    _check_rule(rule)
+    db.commit()
+    db.refresh(rule)
+    campaign_rules.load(db)
+    return rule
+
+@router.delete("/rules/{rule_id}")
+def delete_campaign_rule(
+    *,
+    db: Session = Depends(get_db),
+    rule_id: int
+) -> Any:
+    rule = db.query(CampaignRule).filter(CampaignRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Rule not found")
+    db.delete(rule)
+    db.commit()
+    campaign_rules.load(db)
+    return {"deleted": rule_id}
+
+@router.post("/reclassify")
+def reclassify_campaigns(db: Session = Depends(get_db)):
+    """Re-apply the current rules to every stored campaign, without refetching from Meta."""
+    return meta_service.reclassify_campaigns(db)
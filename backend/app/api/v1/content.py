@@ -2,19 +2,27 @@ from typing import Any, List
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.pagination import ListParams, ListQuery
 from app.schemas import content as content_schema
 from app.models import content as content_model
 from datetime import datetime
 
 router = APIRouter()
 
+template_list = ListQuery(
+    content_model.PageTemplate, content_schema.PageTemplate,
+    filters=("archived", "mode", "domains", "modified_on"),
+    sorts=("title", "created_on", "modified_on"),
+)
+
 @router.get("/templates/", response_model=List[content_schema.PageTemplate])
 def read_templates(
     skip: int = 0,
     limit: int = 100,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
-    return db.query(content_model.PageTemplate).offset(skip).limit(limit).all()
+    return template_list.respond(db.query(content_model.PageTemplate), params, skip, limit)
 
 @router.post("/templates/", response_model=content_schema.PageTemplate)
 def create_template(
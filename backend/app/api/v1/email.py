@@ -2,12 +2,19 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, BackgroundTasks
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.pagination import ListParams, ListQuery
 from app.schemas import email as email_schema
 from app.models import email as email_model
 import time
 
 router = APIRouter()
 
+mailshot_list = ListQuery(
+    email_model.Mailshot, email_schema.Mailshot,
+    filters=("status", "send_date", "created_at"),
+    sorts=("created_at", "send_date", "title"),
+)
+
 def fake_send_email(mailshot_id: int, db: Session):
     """
     Simulate background email sending.
@@ -23,9 +30,10 @@ def fake_send_email(mailshot_id: int, db: Session):
 def read_mailshots(
     skip: int = 0,
     limit: int = 100,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
-    return db.query(email_model.Mailshot).offset(skip).limit(limit).all()
+    return mailshot_list.respond(db.query(email_model.Mailshot), params, skip, limit)
 
 @router.post("/mailshots/", response_model=email_schema.Mailshot)
 def create_mailshot(
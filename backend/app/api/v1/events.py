@@ -1,24 +1,53 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.database import get_async_db, get_db
+from app.core.pagination import ListParams, ListQuery
+from app.core.config import settings
+from app.core.responses import conditional_response
 from app.schemas import event as event_schema
 from app.models import event as event_model
-from app.services.event_service import event_service as legacy_event_service
+from app.models.legacy_event import LegacyEventStat, LegacyEventSignupSnapshot
+from app.services.event_service import EventFeedUnavailable, event_service as legacy_event_service
 
 router = APIRouter()
 
+event_list = ListQuery(
+    event_model.Event, event_schema.Event,
+    filters=("type_id", "status_id", "city", "start_date", "end_date"),
+    sorts=("name", "start_date", "created_at"),
+)
+
+LEGACY_DIMENSIONS = {
+    "brand": LegacyEventStat.brand,
+    "platform": LegacyEventStat.platform,
+    "product": LegacyEventStat.product,
+    "week": LegacyEventStat.week_start,
+}
+
+def _legacy_filters(stmt, brand: Optional[str], platform: Optional[str], product: Optional[str]):
+    if brand:
+        stmt = stmt.where(LegacyEventStat.brand == brand)
+    if platform:
+        stmt = stmt.where(LegacyEventStat.platform == platform)
+    if product:
+        stmt = stmt.where(LegacyEventStat.product == product)
+    return stmt
+
 @router.get("/", response_model=List[event_schema.Event])
-def read_events(
+async def read_events(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db)
+    params: ListParams = Depends(),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Any:
     """
     Retrieve events (CMS4 Logic).
     """
-    events = db.query(event_model.Event).offset(skip).limit(limit).all()
-    return events
+    return await event_list.respond_async(db, select(event_model.Event), params, skip, limit)
 
 @router.post("/", response_model=event_schema.Event)
 def create_event(
@@ -50,8 +79,92 @@ def read_event(
     return event
 
 @router.get("/stats/legacy")
-def read_legacy_event_stats() -> Any:
+async def read_legacy_event_stats(request: Request) -> Any:
     """
     Get external event stats (Legacy Keystone Logic).
     """
-    return legacy_event_service.fetch_events()
+    try:
+        snapshot = await legacy_event_service.get_snapshot_async()
+    except EventFeedUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    stale = snapshot.age > settings.EVENTS_CACHE_TTL_SECONDS
+    return conditional_response(
+        request,
+        snapshot.body,
+        etag=snapshot.etag,
+        headers={
+            "X-Data-Age": str(int(snapshot.age)),
+            "X-Data-Stale": "true" if stale else "false"
+        }
+    )
+
+@router.get("/stats/legacy/status")
+def read_legacy_event_feed_status() -> Any:
+    """
+    Cache age and last refresh outcome for the legacy event feed.
+    """
+    return legacy_event_service.get_status()
+
+
+@router.get("/stats/legacy/by/{dimension}", response_model=List[event_schema.LegacyEventAggregate])
+async def read_legacy_event_aggregates(
+    dimension: str = Path(..., pattern="^(brand|platform|product|week)$"),
+    brand: Optional[str] = None,
+    platform: Optional[str] = None,
+    product: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    """
+    Signups from the stored legacy feed grouped by brand, platform, product or week (of LiveDate).
+    """
+    column = LEGACY_DIMENSIONS[dimension]
+    stmt = select(
+        column.label("key"),
+        func.count(LegacyEventStat.tag_id).label("events"),
+        func.coalesce(func.sum(LegacyEventStat.signups), 0).label("signups")
+    )
+    stmt = _legacy_filters(stmt, brand, platform, product)
+    if date_from:
+        stmt = stmt.where(LegacyEventStat.live_date >= date_from)
+    if date_to:
+        stmt = stmt.where(LegacyEventStat.live_date <= date_to)
+    stmt = stmt.group_by(column)
+    # Weeks read as a time series, everything else as a ranking
+    stmt = stmt.order_by(column.asc()) if dimension == "week" else stmt.order_by(func.sum(LegacyEventStat.signups).desc())
+
+    rows = (await db.execute(stmt)).all()
+    return [
+        {"key": key.isoformat() if isinstance(key, date) else key, "events": events, "signups": signups}
+        for key, events, signups in rows
+    ]
+
+@router.get("/stats/legacy/signups/history", response_model=List[event_schema.LegacyEventSignupPoint])
+async def read_legacy_signup_history(
+    brand: Optional[str] = None,
+    platform: Optional[str] = None,
+    product: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_db)
+) -> Any:
+    """
+    Total SignupCount per daily snapshot, for signup growth over time.
+    """
+    stmt = select(
+        LegacyEventSignupSnapshot.snapshot_date,
+        func.count(LegacyEventSignupSnapshot.tag_id).label("events"),
+        func.coalesce(func.sum(LegacyEventSignupSnapshot.signups), 0).label("signups")
+    )
+    if brand or platform or product:
+        stmt = stmt.join(LegacyEventStat, LegacyEventStat.tag_id == LegacyEventSignupSnapshot.tag_id)
+        stmt = _legacy_filters(stmt, brand, platform, product)
+    if date_from:
+        stmt = stmt.where(LegacyEventSignupSnapshot.snapshot_date >= date_from)
+    if date_to:
+        stmt = stmt.where(LegacyEventSignupSnapshot.snapshot_date <= date_to)
+    stmt = stmt.group_by(LegacyEventSignupSnapshot.snapshot_date).order_by(LegacyEventSignupSnapshot.snapshot_date)
+
+    rows = (await db.execute(stmt)).all()
+    return [{"snapshot_date": d, "events": events, "signups": signups} for d, events, signups in rows]
@@ -1,27 +1,73 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Query
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.services.hubspot_service import HubSpotService
-from app.core.database import get_db
+from app.services.contact_search import contact_search
+from app.core.database import get_async_db, get_db
+from app.core.responses import conditional_response, json_body
 
 router = APIRouter()
 service = HubSpotService()
 
 @router.get("/contacts")
 async def get_contacts(
-    background_tasks: BackgroundTasks,
+    request: Request,
     page: int = Query(0, ge=0),
-    pageSize: int = Query(100, le=1000),
-    db: Session = Depends(get_db)
+    pageSize: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|email|updated_at)$"),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Returns paginated contacts from local DB.
-    Triggers a background sync from HubSpot.
+    Pass the previous response's nextCursor as `cursor` for constant-time deep pages;
+    `page` still works for older clients.
+    Triggers a background sync from HubSpot (debounced by the sync scheduler).
     """
     try:
-        # Trigger background sync (non-blocking)
-        background_tasks.add_task(service.sync_contacts_background, db)
+        # Trigger background sync (non-blocking, ignored during cooldown)
+        service.schedule_sync()
         
         # Return current DB data immediately
-        return service.get_contacts_paginated(db, skip=page * pageSize, limit=pageSize)
+        result = await service.get_contacts_page_async(
+            db,
+            limit=pageSize,
+            cursor=cursor,
+            sort=sort,
+            descending=order == "desc",
+            skip=0 if cursor else page * pageSize
+        )
+        return conditional_response(request, json_body(result))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/contacts/search")
+def search_contacts(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db)
+):
+    """
+    Ranked prefix search over name, email, company and job title.
+    """
+    contacts = contact_search.search(db, q, limit=limit)
+    return {"items": [service._serialize_contact(c) for c in contacts], "query": q}
+
+@router.post("/sync/full")
+def trigger_full_sync():
+    """
+    Explicitly re-read every contact from HubSpot and reset the incremental watermark.
+    """
+    future = service.schedule_sync(full=True)
+    return {"message": "Full HubSpot sync started", "scheduled": future is not None}
+
+@router.get("/sync/status")
+def get_sync_status(db: Session = Depends(get_db)):
+    """
+    Current HubSpot sync state: running, last completed, rows changed, duration.
+    """
+    return service.get_sync_status(db)
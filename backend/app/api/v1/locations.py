@@ -2,16 +2,24 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.pagination import ListParams, ListQuery
 from app.schemas import location as location_schema
 from app.models import location as location_model
 
 router = APIRouter()
 
+location_list = ListQuery(
+    location_model.GeoLocation, location_schema.GeoLocation,
+    filters=("location_type_id", "location_code", "archived"),
+    sorts=("name", "location_code"),
+)
+
 @router.get("/", response_model=List[location_schema.GeoLocation])
 def read_locations(
     parent_id: int = None,
     skip: int = 0,
     limit: int = 200,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
     """
@@ -20,9 +28,7 @@ def read_locations(
     query = db.query(location_model.GeoLocation)
     if parent_id is not None:
         query = query.filter(location_model.GeoLocation.parent_id == parent_id)
-    
-    locations = query.offset(skip).limit(limit).all()
-    return locations
+    return location_list.respond(query, params, skip, limit)
 
 @router.post("/", response_model=location_schema.GeoLocation)
 def create_location(
@@ -2,19 +2,32 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.pagination import ListParams, ListQuery
 from app.schemas import marketing as marketing_schema
 from app.models import marketing as marketing_model
 
 router = APIRouter()
 
+popup_list = ListQuery(
+    marketing_model.MarketingPopup, marketing_schema.MarketingPopup,
+    filters=("is_active", "start_date", "end_date"),
+    sorts=("title", "start_date", "end_date"),
+)
+banner_list = ListQuery(
+    marketing_model.SplashBanner, marketing_schema.SplashBanner,
+    filters=("is_active", "weight"),
+    sorts=("name", "weight", "created_at"),
+)
+
 # --- Popups ---
 @router.get("/popups/", response_model=List[marketing_schema.MarketingPopup])
 def read_popups(
     skip: int = 0,
     limit: int = 100,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
-    return db.query(marketing_model.MarketingPopup).offset(skip).limit(limit).all()
+    return popup_list.respond(db.query(marketing_model.MarketingPopup), params, skip, limit)
 
 @router.post("/popups/", response_model=marketing_schema.MarketingPopup)
 def create_popup(
@@ -33,9 +46,10 @@ def create_popup(
 def read_banners(
     skip: int = 0,
     limit: int = 100,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
-    return db.query(marketing_model.SplashBanner).offset(skip).limit(limit).all()
+    return banner_list.respond(db.query(marketing_model.SplashBanner), params, skip, limit)
 
 @router.post("/banners/", response_model=marketing_schema.SplashBanner)
 def create_banner(
@@ -2,22 +2,29 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.pagination import ListParams, ListQuery
 from app.schemas import order as order_schema
 from app.models import order as order_model
 
 router = APIRouter()
 
+order_list = ListQuery(
+    order_model.Order, order_schema.Order,
+    filters=("status_id", "purchaser_id", "purchaser_type_id", "timestamp", "order_total"),
+    sorts=("timestamp", "order_total"),
+)
+
 @router.get("/", response_model=List[order_schema.Order])
 def read_orders(
     skip: int = 0,
     limit: int = 100,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
     """
     Retrieve orders.
     """
-    orders = db.query(order_model.Order).offset(skip).limit(limit).all()
-    return orders
+    return order_list.respond(db.query(order_model.Order), params, skip, limit)
 
 @router.post("/", response_model=order_schema.Order)
 def create_order(
@@ -38,3 +38,10 @@ def get_debug_info(db: Session = Depends(get_db)):
         "cache_exists": cache_exists,
         "base_dir": BASE_DIR
     }
+
+
+@api_router.get("/debug/upstreams", tags=["system"])
+def get_upstream_metrics():
+    """Per-host outbound HTTP metrics: requests, retries, throttling, limiter rate."""
+    from app.core.http_client import http_client
+    return http_client.metrics()
@@ -2,22 +2,29 @@ from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
+from app.core.pagination import ListParams, ListQuery
 from app.schemas import user as user_schema
 from app.models import user as user_model
 
 router = APIRouter()
 
+user_list = ListQuery(
+    user_model.User, user_schema.User,
+    filters=("role_id", "department_id", "status", "email", "username"),
+    sorts=("username", "email", "created_at"),
+)
+
 @router.get("/", response_model=List[user_schema.User])
 def read_users(
     skip: int = 0,
     limit: int = 100,
+    params: ListParams = Depends(),
     db: Session = Depends(get_db)
 ) -> Any:
     """
     Retrieve users.
     """
-    users = db.query(user_model.User).offset(skip).limit(limit).all()
-    return users
+    return user_list.respond(db.query(user_model.User), params, skip, limit)
 
 @router.post("/", response_model=user_schema.User)
 def create_user(
@@ -12,23 +12,74 @@ class Settings(BaseSettings):
     BACKEND_CORS_ORIGINS: List[str] = ["http://localhost:3000", "http://localhost:8000", "*"]
     
     # Funny name as requested, located in project root for visibility
+    # Override with DATABASE_URL in the environment (docker-compose points it at PostgreSQL)
     DATABASE_URL: str = f"sqlite:///{os.path.join(BASE_DIR, 'keystone_banana.db')}"
     
+    # Connection pool: PostgreSQL, and the async engine on either backend
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    # Seconds to wait for a pooled connection before erroring
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+    # Recycle connections before server/proxy idle timeouts drop them
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    # Server-side cap per statement; 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = 30000
+    
+    # SQLite engine profile
+    # How long a writer waits on the database lock before "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE_BYTES: int = 256 * 1024 * 1024
+    
+    # Outbound HTTP (app/core/http_client.py); hosts can override rate/pool via configure_host
+    HTTP_POOL_SIZE: int = 20
+    HTTP_DEFAULT_RATE_PER_SECOND: float = 10.0
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_BACKOFF_BASE_SECONDS: float = 0.5
+    HTTP_BACKOFF_MAX_SECONDS: float = 30.0
+    # Fail fast instead of queueing behind a limiter pause longer than this
+    HTTP_MAX_LIMITER_WAIT_SECONDS: float = 60.0
+    
+    # Legacy events feed: served from cache, revalidated in the background after this long
+    EVENTS_CACHE_TTL_SECONDS: int = 300
+    # Minimum gap between feed refresh attempts (bounds retries while upstream is down)
+    EVENTS_REFRESH_MIN_INTERVAL_SECONDS: int = 30
+    
+    # Payloads smaller than this are sent uncompressed
+    RESPONSE_COMPRESS_MIN_BYTES: int = 1024
+    
     # HubSpot
     HUBSPOT_ACCOUNT_ID: str = "179140854579"
+    # Incremental syncs re-read this many seconds before the watermark
+    HUBSPOT_SYNC_OVERLAP_SECONDS: int = 300
+    # Sync triggers within this many seconds of the last sync are ignored
+    HUBSPOT_SYNC_COOLDOWN_SECONDS: int = 300
     
     # Meta API
     META_ACCESS_TOKEN: str = os.getenv("META_ACCESS_TOKEN", "")
     AD_ACCOUNT_ID: str = os.getenv("AD_ACCOUNT_ID", "act_162214292")
+    # Upper bound on Graph API calls per second (usage headers lower it further)
+    META_MAX_REQUESTS_PER_SECOND: float = 20.0
+    # Minimum gap between Meta refreshes, however many stale reads come in
+    META_REFRESH_MIN_INTERVAL_SECONDS: int = 120
+    # Also fetch per-country insights (breakdowns=country) and ad set targeting on each refresh
+    META_COUNTRY_INSIGHTS: bool = True
+    # Keep daily insights per campaign and derive totals from them instead of refetching lifetime totals
+    META_DAILY_INSIGHTS: bool = True
+    # Days before the newest stored day that are re-fetched each refresh (late attribution)
+    META_DAILY_INSIGHTS_TRAILING_DAYS: int = 3
+    
+    # Prediction stats cube: campaign-country rows with fewer impressions than this are too noisy to use
+    STATS_CUBE_MIN_IMPRESSIONS: int = 1000
+    # A cell needs this many campaign-country samples before lookups use it instead of falling back
+    STATS_CUBE_MIN_SAMPLES: int = 5
+    # Most scenarios accepted by one /campaigns/predict/batch request
+    PREDICT_BATCH_MAX_SCENARIOS: int = 10000
+    # Wall-clock cap on the budget optimizer's search; the best split found so far is returned
+    OPTIMIZER_TIME_LIMIT_SECONDS: float = 0.25
 
     class Config:
         case_sensitive = True
         env_file = ".env"
         extra = "ignore" # Allow extra fields in env
 
-    def __init__(self, **data):
-        super().__init__(**data)
-        # FORCE override to use local DB, ignoring .env
-        self.DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'keystone_banana.db')}"
-
 settings = Settings()
@@ -1,15 +1,125 @@
-from sqlalchemy import create_engine
+import threading
+from contextlib import nullcontext
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.config import settings
 
 
-if "sqlite" in settings.DATABASE_URL:
-    connect_args = {"check_same_thread": False}
-    engine = create_engine(settings.DATABASE_URL, connect_args=connect_args)
-else:
-    engine = create_engine(settings.DATABASE_URL)
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE_BYTES)}")
+    cursor.close()
+
+
+def _sqlite_engine(url: str) -> Engine:
+    """
+    WAL lets API readers run alongside a background writer; synchronous=NORMAL is
+    durable enough under WAL and skips an fsync per commit.
+    """
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+
+def _postgres_engine(url: str) -> Engine:
+    connect_args = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        connect_args["options"] = f"-c statement_timeout={int(settings.DB_STATEMENT_TIMEOUT_MS)}"
+    return create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        # Drop connections the server closed while they sat in the pool
+        pool_pre_ping=True,
+        connect_args=connect_args,
+    )
+
+
+# Engine profile per backend, picked from the DATABASE_URL scheme
+ENGINE_PROFILES = {
+    "sqlite": _sqlite_engine,
+    "postgresql": _postgres_engine,
+}
+
+
+def build_engine(url: str) -> Engine:
+    backend = make_url(url).get_backend_name()
+    factory = ENGINE_PROFILES.get(backend)
+    return factory(url) if factory else create_engine(url, pool_pre_ping=True)
+
+
+engine = build_engine(settings.DATABASE_URL)
+
+
+# Async drivers for the same database, used by the async read endpoints
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    """sqlite:///x.db -> sqlite+aiosqlite:///x.db, postgresql://... -> postgresql+asyncpg://..."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise NotImplementedError(f"No async driver configured for '{backend}'")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+
+def build_async_engine(url: str) -> AsyncEngine:
+    async_url = async_database_url(url)
+    if make_url(url).get_backend_name() == "sqlite":
+        # aiosqlite defaults to NullPool: a new connection, thread and pragma round per session
+        async_engine = create_async_engine(
+            async_url,
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+        event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        return async_engine
+
+    # asyncpg takes server settings directly instead of libpq's "options"
+    server_settings = {}
+    if settings.DB_STATEMENT_TIMEOUT_MS:
+        server_settings["statement_timeout"] = str(int(settings.DB_STATEMENT_TIMEOUT_MS))
+    return create_async_engine(
+        async_url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=True,
+        connect_args={"server_settings": server_settings},
+    )
+
+
+async_engine = build_async_engine(settings.DATABASE_URL)
+
+# SQLite allows one writer at a time. Background writers take this first so they
+# queue in-process instead of timing out on the file lock; reads never wait on it.
+_sqlite_write_lock = threading.RLock()
+
+
+def write_guard(bind=None):
+    """Context manager held around write transactions; a no-op outside SQLite"""
+    bind = bind if bind is not None else engine
+    if bind.dialect.name == "sqlite":
+        return _sqlite_write_lock
+    return nullcontext()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: attributes can't lazy-load after commit in async code
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -19,3 +129,27 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def sync_schema():
+    """
+    create_all() only creates missing tables. There are no migrations yet, so also add
+    nullable columns and indexes that were added to existing models since the DB was made.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or column.primary_key or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                print(f"Adding column {table.name}.{column.name}")
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
@@ -0,0 +1,325 @@
+import json
+import random
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from app.core.config import settings
+
+
+# Statuses worth another attempt; everything else goes straight back to the caller
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Graph API error codes that mean "slow down" even though the status is 400/403
+META_THROTTLE_CODES = {4, 17, 32, 613, 80000, 80001, 80002, 80003, 80004, 80005, 80006, 80008, 80009, 80014}
+
+
+class UpstreamThrottled(requests.exceptions.RequestException):
+    """The limiter would have to wait longer than HTTP_MAX_LIMITER_WAIT_SECONDS"""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. reserve() takes a token immediately and returns how
+    long the caller must wait before using it, so sync and async callers share one bucket.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def set_rate(self, rate: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+    def pause(self, seconds: float):
+        """Hold every caller for `seconds` and drop any saved-up burst"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = min(self._tokens, 0.0)
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.monotonic())
+
+
+class HostConfig:
+    """Limits and connection settings for one upstream host"""
+
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        verify: bool = True
+    ):
+        self.rate = rate or settings.HTTP_DEFAULT_RATE_PER_SECOND
+        self.burst = burst or max(1.0, self.rate)
+        self.pool_size = pool_size or settings.HTTP_POOL_SIZE
+        self.verify = verify
+
+
+class Upstream:
+    """Per-host state: limiter, adaptive rate and metrics"""
+
+    def __init__(self, host: str, config: HostConfig):
+        self.host = host
+        self.config = config
+        self.bucket = TokenBucket(config.rate, config.burst)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.throttled = 0
+        self.status_counts: Dict[str, int] = {}
+        self.limiter_wait_seconds = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.usage_pct: Optional[float] = None
+
+    def record(self, latency: float, status: Optional[int] = None, error: bool = False):
+        with self._lock:
+            self.requests += 1
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if error:
+                self.errors += 1
+            if status is not None:
+                key = f"{status // 100}xx"
+                self.status_counts[key] = self.status_counts.get(key, 0) + 1
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.limiter_wait_seconds += seconds
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def observe_usage(self, headers) -> Optional[float]:
+        """
+        Scale the rate to Meta's reported usage: full speed below 50%, linearly
+        down to 5% of it at 100%. A regain-access estimate pauses the host outright.
+        """
+        usage, regain_minutes = _parse_usage_headers(headers)
+        if usage is None:
+            # No signal: creep back towards the configured rate
+            if self.bucket.rate < self.config.rate:
+                self.bucket.set_rate(min(self.config.rate, self.bucket.rate + self.config.rate * 0.1))
+            return None
+
+        self.usage_pct = usage
+        factor = 1.0 if usage < 50 else max(0.05, (100 - usage) / 50)
+        self.bucket.set_rate(self.config.rate * factor)
+        if regain_minutes:
+            self.bucket.pause(regain_minutes * 60)
+        return usage
+
+    def observe_throttle(self, retry_after: Optional[float]):
+        with self._lock:
+            self.throttled += 1
+        self.bucket.set_rate(max(self.config.rate * 0.05, self.bucket.rate / 2))
+        self.bucket.pause(retry_after if retry_after is not None else settings.HTTP_BACKOFF_BASE_SECONDS)
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "host": self.host,
+                "requests": self.requests,
+                "retries": self.retries,
+                "errors": self.errors,
+                "throttled": self.throttled,
+                "status": dict(self.status_counts),
+                "avg_latency_ms": round(self.total_latency / self.requests * 1000, 1) if self.requests else None,
+                "max_latency_ms": round(self.max_latency * 1000, 1),
+                "limiter_wait_seconds": round(self.limiter_wait_seconds, 3),
+                "usage_pct": self.usage_pct,
+                "rate_per_second": round(self.bucket.rate, 3),
+                "configured_rate_per_second": self.config.rate,
+                "paused_for_seconds": round(self.bucket.paused_for, 3)
+            }
+
+
+def _parse_usage_headers(headers):
+    """Highest usage % across X-Business-Use-Case-Usage, X-App-Usage and X-Ad-Account-Usage"""
+    usage = None
+    regain = 0
+    buc = headers.get("x-business-use-case-usage")
+    if buc:
+        try:
+            for entries in json.loads(buc).values():
+                for entry in entries:
+                    for key in ("call_count", "total_cputime", "total_time"):
+                        if key in entry:
+                            usage = max(usage or 0, float(entry[key]))
+                    regain = max(regain, int(entry.get("estimated_time_to_regain_access") or 0))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    for name in ("x-app-usage", "x-ad-account-usage"):
+        raw = headers.get(name)
+        if not raw:
+            continue
+        try:
+            for key, value in json.loads(raw).items():
+                if key in ("call_count", "total_cputime", "total_time", "acc_id_util_pct"):
+                    usage = max(usage or 0, float(value))
+        except (ValueError, TypeError, AttributeError):
+            pass
+    return usage, regain
+
+
+def _retry_after(headers) -> Optional[float]:
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _is_throttle(status: int, body_json) -> bool:
+    if status == 429:
+        return True
+    if status in (400, 403) and isinstance(body_json, dict):
+        error = body_json.get("error")
+        if isinstance(error, dict) and error.get("code") in META_THROTTLE_CODES:
+            return True
+    return False
+
+
+def _error_json(response):
+    # Only 400/403 can carry a Graph throttle code; don't parse anything else
+    if response.status_code not in (400, 403):
+        return None
+    if "json" not in response.headers.get("content-type", ""):
+        return None
+    try:
+        return response.json()
+    except ValueError:
+        return None
+
+
+class HTTPClient:
+    """
+    Shared outbound HTTP for every upstream (Meta Graph, the legacy events feed, ...).
+    One keep-alive requests pool per host, a token bucket per host that adapts to
+    Meta usage headers and 429s, retries with exponential backoff and full jitter,
+    and per-host metrics.
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, HostConfig] = {}
+        self._upstreams: Dict[str, Upstream] = {}
+        self._sessions: Dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def configure_host(self, host: str, **options):
+        """Set limits for a host before its first request (rate, burst, pool_size, verify)"""
+        with self._lock:
+            self._configs[host] = HostConfig(**options)
+            self._upstreams.pop(host, None)
+            self._sessions.pop(host, None)
+
+    def _upstream(self, host: str) -> Upstream:
+        upstream = self._upstreams.get(host)
+        if upstream is None:
+            with self._lock:
+                upstream = self._upstreams.get(host)
+                if upstream is None:
+                    upstream = Upstream(host, self._configs.get(host) or HostConfig())
+                    self._upstreams[host] = upstream
+        return upstream
+
+    def _session(self, upstream: Upstream) -> requests.Session:
+        session = self._sessions.get(upstream.host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(upstream.host)
+                if session is None:
+                    session = requests.Session()
+                    # Retries are ours; the adapter only pools connections
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=upstream.config.pool_size, max_retries=0)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.verify = upstream.config.verify
+                    self._sessions[upstream.host] = session
+        return session
+
+    def _limiter_wait(self, upstream: Upstream) -> float:
+        wait = upstream.bucket.reserve()
+        if wait > settings.HTTP_MAX_LIMITER_WAIT_SECONDS:
+            raise UpstreamThrottled(f"{upstream.host} is rate limited for another {wait:.0f}s")
+        if wait > 0:
+            upstream.record_wait(wait)
+        return wait
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        ceiling = min(settings.HTTP_BACKOFF_MAX_SECONDS, settings.HTTP_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        return max(delay, retry_after) if retry_after is not None else delay
+
+    def _should_retry(self, upstream: Upstream, response) -> bool:
+        """Feed the limiter from a response; True if it is worth another attempt"""
+        upstream.observe_usage(response.headers)
+        if _is_throttle(response.status_code, _error_json(response)):
+            upstream.observe_throttle(_retry_after(response.headers))
+            return True
+        return response.status_code in RETRY_STATUSES
+
+    def request(self, method: str, url: str, retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Blocking request through the host's pool. Returns the last response (the caller
+        still decides what a 4xx/5xx means) or raises the last connection error.
+        """
+        upstream = self._upstream(urlsplit(url).hostname or "")
+        session = self._session(upstream)
+        retries = settings.HTTP_MAX_RETRIES if retries is None else retries
+
+        for attempt in range(retries + 1):
+            wait = self._limiter_wait(upstream)
+            if wait:
+                time.sleep(wait)
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                upstream.record(time.perf_counter() - started, error=True)
+                if attempt == retries:
+                    raise
+                upstream.record_retry()
+                time.sleep(self._backoff(attempt, None))
+                continue
+
+            upstream.record(time.perf_counter() - started, status=response.status_code)
+            if not self._should_retry(upstream, response) or attempt == retries:
+                return response
+            upstream.record_retry()
+            time.sleep(self._backoff(attempt, _retry_after(response.headers)))
+        raise AssertionError("unreachable")
+
+    def metrics(self) -> Dict[str, Dict]:
+        return {host: upstream.as_dict() for host, upstream in list(self._upstreams.items())}
+
+
+http_client = HTTPClient()
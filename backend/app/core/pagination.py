@@ -0,0 +1,227 @@
+import base64
+import json
+import operator
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Type
+from fastapi import HTTPException, Query, Request, Response
+from pydantic import BaseModel
+from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.responses import FastJSONResponse, serialize_rows
+
+
+def encode_cursor(values: List[Any]) -> str:
+    """Opaque, URL-safe token holding the sort key of the last row on a page"""
+    payload = [
+        v.isoformat() if isinstance(v, (datetime, date)) else str(v) if isinstance(v, Decimal) else v
+        for v in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> List[Any]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not produce"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def coerce_cursor_value(column, value: Any) -> Any:
+    """
+    Turn a JSON cursor value back into the Python type the column binds. Raises
+    ValueError/TypeError for values that can't be that type (a tampered cursor).
+    """
+    if value is None or column is None:
+        return value
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if python_type is datetime and isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if python_type is date and isinstance(value, str):
+        return date.fromisoformat(value)
+    if python_type is Decimal and not isinstance(value, Decimal):
+        return Decimal(str(value))
+    if python_type in (int, str) and not isinstance(value, python_type):
+        raise TypeError(f"Expected {python_type.__name__} in cursor")
+    if python_type is float and not isinstance(value, (int, float)):
+        raise TypeError("Expected a number in cursor")
+    return value
+
+
+def keyset_after(sort_column, id_column, sort_value: Optional[Any], last_id: Any, descending: bool = False):
+    """
+    WHERE clause for rows after (sort_value, last_id) in ORDER BY sort_column, id_column.
+    NULL sort values are ordered first ascending (last descending), matching keyset_order().
+    """
+    last_id = coerce_cursor_value(id_column, last_id)
+    if sort_column is None:
+        return id_column < last_id if descending else id_column > last_id
+
+    sort_value = coerce_cursor_value(sort_column, sort_value)
+    tie = and_(sort_column == sort_value, id_column < last_id if descending else id_column > last_id)
+    if descending:
+        if sort_value is None:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(sort_column < sort_value, tie, sort_column.is_(None))
+    if sort_value is None:
+        return or_(and_(sort_column.is_(None), id_column > last_id), sort_column.isnot(None))
+    return or_(sort_column > sort_value, tie)
+
+
+def make_cursor(sort_name: str, order: str, sort_column, last_row) -> str:
+    """Cursor after `last_row`, bound to the sort and direction it was issued for"""
+    sort_value = getattr(last_row, sort_column.key) if sort_column is not None else None
+    return encode_cursor([sort_name, order, sort_value, last_row.id])
+
+
+def cursor_condition(token: str, sort_name: str, order: str, sort_column, id_column):
+    """
+    WHERE clause continuing from a make_cursor() token. Raises ValueError for a token
+    that is malformed, tampered with, or was issued for another sort or order.
+    """
+    try:
+        cursor_sort, cursor_order, sort_value, last_id = decode_cursor(token)
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort_name or cursor_order != order:
+        raise ValueError("Cursor was issued for a different sort or order")
+    try:
+        return keyset_after(sort_column, id_column, sort_value, last_id, order == "desc")
+    except (TypeError, ValueError, ArithmeticError):
+        raise ValueError("Invalid cursor")
+
+
+def keyset_order(sort_column, id_column, descending: bool = False) -> List:
+    """ORDER BY for keyset pagination; the id tiebreaker keeps the order total"""
+    if sort_column is None:
+        return [id_column.desc() if descending else id_column.asc()]
+    if descending:
+        return [sort_column.desc().nulls_last(), id_column.desc()]
+    return [sort_column.asc().nulls_first(), id_column.asc()]
+
+
+class ListParams:
+    """Query parameters shared by every cursor-paginated list endpoint"""
+
+    def __init__(
+        self,
+        request: Request,
+        cursor: Optional[str] = Query(None, description="nextCursor from the previous page (X-Next-Cursor header)"),
+        sort: Optional[str] = Query(None, description="Whitelisted sort field; defaults to id"),
+        order: str = Query("asc", pattern="^(asc|desc)$"),
+        fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    ):
+        self.request = request
+        self.cursor = cursor
+        self.sort = sort
+        self.order = order
+        self.descending = order == "desc"
+        self.fields = [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+
+class ListQuery:
+    """
+    Reusable list layer for the v1 CRUD routers: keyset cursors, whitelisted
+    equality/range filters and sorts, `?fields=` projection, and a has_more flag
+    from fetching one extra row instead of a COUNT.
+    Filters are plain query params: `?status_id=1`, `?start_date__gte=2025-01-01`.
+    The body stays a JSON list; paging state travels in X-Next-Cursor / X-Has-More.
+    """
+
+    FILTER_OPS = {"": operator.eq, "gte": operator.ge, "lte": operator.le, "gt": operator.gt, "lt": operator.lt, "ne": operator.ne}
+    MAX_LIMIT = 1000
+
+    def __init__(self, model, schema: Type[BaseModel], filters: Sequence[str] = (), sorts: Sequence[str] = ()):
+        self.model = model
+        self.schema = schema
+        self.id_column = model.id
+        self.filters = {name: getattr(model, name) for name in filters}
+        self.sorts = {name: getattr(model, name) for name in sorts}
+
+    def _parse_filter_value(self, column, raw: str) -> Any:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            return raw
+        if python_type is bool:
+            return raw.lower() in ("1", "true", "yes")
+        if python_type is datetime:
+            return datetime.fromisoformat(raw)
+        if python_type is date:
+            return date.fromisoformat(raw)
+        if python_type in (int, float, Decimal):
+            return python_type(raw)
+        return raw
+
+    def _apply_filters(self, query, params: ListParams):
+        for key, raw in params.request.query_params.multi_items():
+            name, _, op = key.partition("__")
+            # Anything not whitelisted (skip, limit, endpoint params...) is left alone
+            if name not in self.filters or op not in self.FILTER_OPS:
+                continue
+            column = self.filters[name]
+            try:
+                value = self._parse_filter_value(column, raw)
+            except (TypeError, ValueError, ArithmeticError):
+                raise HTTPException(status_code=400, detail=f"Invalid value for filter '{key}'")
+            query = query.filter(self.FILTER_OPS[op](column, value))
+        return query
+
+    def _page(self, query, params: ListParams, skip: int, limit: int):
+        """Apply filters, order, cursor and limit + 1 to an ORM Query or a select()"""
+        if not 1 <= limit <= self.MAX_LIMIT:
+            raise HTTPException(status_code=400, detail=f"limit must be between 1 and {self.MAX_LIMIT}")
+        if skip < 0:
+            raise HTTPException(status_code=400, detail="skip must not be negative")
+        sort_name = params.sort or "id"
+        if sort_name != "id" and sort_name not in self.sorts:
+            raise HTTPException(status_code=400, detail=f"Unsupported sort '{sort_name}'")
+        sort_column = self.sorts.get(sort_name)
+
+        if params.fields:
+            unknown = set(params.fields) - set(self.schema.model_fields)
+            if unknown:
+                raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+
+        query = self._apply_filters(query, params)
+        query = query.order_by(*keyset_order(sort_column, self.id_column, params.descending))
+        if params.cursor:
+            try:
+                after = cursor_condition(params.cursor, sort_name, params.order, sort_column, self.id_column)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            query = query.filter(after)
+        elif skip:
+            query = query.offset(skip)
+        return query.limit(limit + 1), sort_name, sort_column
+
+    def _response(self, rows: List, params: ListParams, limit: int, sort_name: str, sort_column) -> Response:
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        headers = {"X-Has-More": "true" if has_more else "false"}
+        if has_more and rows:
+            headers["X-Next-Cursor"] = make_cursor(sort_name, params.order, sort_column, rows[-1])
+
+        # Trusted ORM rows: skip per-row validation and serialize in one pass
+        return FastJSONResponse(serialize_rows(rows, self.schema, params.fields), headers=headers)
+
+    def respond(self, query, params: ListParams, skip: int = 0, limit: int = 100) -> Response:
+        """Run `query` (an ORM Query over self.model) for one page and build the response"""
+        query, sort_name, sort_column = self._page(query, params, skip, limit)
+        return self._response(query.all(), params, limit, sort_name, sort_column)
+
+    async def respond_async(self, db: AsyncSession, stmt, params: ListParams, skip: int = 0, limit: int = 100) -> Response:
+        """Async counterpart of respond(); `stmt` is a select() over self.model"""
+        stmt, sort_name, sort_column = self._page(stmt, params, skip, limit)
+        rows = (await db.execute(stmt)).scalars().all()
+        return self._response(rows, params, limit, sort_name, sort_column)
@@ -0,0 +1,225 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type, Union, get_args, get_origin
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; stdlib json is the fallback
+    orjson = None
+
+
+# Compressed bodies keyed by (etag, encoding) so unchanged payloads are compressed once
+_COMPRESSED_CACHE_SIZE = 64
+_compressed_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+_compressed_lock = threading.Lock()
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag from the payload bytes"""
+    return f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _json_default(obj: Any) -> Any:
+    # Match pydantic's JSON output for the types our models use
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(data: Any) -> bytes:
+    """Serialize to JSON bytes with orjson when installed, stdlib json otherwise"""
+    if orjson is not None:
+        return orjson.dumps(data, default=_json_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def json_body(data: Any) -> bytes:
+    """Serialize a handler result to bytes we can hash and send as-is"""
+    try:
+        return dumps(data)
+    except TypeError:
+        # Unusual types: let FastAPI's encoder normalise them first
+        return dumps(jsonable_encoder(data))
+
+
+def _nested_schema(annotation: Any) -> Tuple[Optional[Type[BaseModel]], bool]:
+    """Return (model, is_list) for fields typed as Model, Optional[Model] or List[Model]"""
+    origin = get_origin(annotation)
+    if origin is Union:
+        args = [a for a in get_args(annotation) if a is not type(None)]
+        return _nested_schema(args[0]) if len(args) == 1 else (None, False)
+    if origin in (list, List):
+        args = get_args(annotation)
+        model, _ = _nested_schema(args[0]) if args else (None, False)
+        return model, model is not None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation, False
+    return None, False
+
+
+@lru_cache(maxsize=None)
+def _row_plan(schema: Type[BaseModel]) -> Tuple:
+    plan = []
+    for name, field in schema.model_fields.items():
+        model, is_list = _nested_schema(field.annotation)
+        plan.append((name, model, is_list))
+    return tuple(plan)
+
+
+def row_to_dict(row: Any, schema: Type[BaseModel], fields: Optional[Iterable[str]] = None) -> Dict:
+    """
+    Read a trusted ORM row straight into a dict shaped like `schema`, skipping
+    pydantic validation. Nested schema fields are followed; `fields` limits the output.
+    """
+    wanted = set(fields) if fields else None
+    out = {}
+    for name, model, is_list in _row_plan(schema):
+        if wanted is not None and name not in wanted:
+            continue
+        value = getattr(row, name, None)
+        if model is not None and value is not None:
+            value = [row_to_dict(v, model) for v in value] if is_list else row_to_dict(value, model)
+        out[name] = value
+    return out
+
+
+def serialize_rows(rows: Iterable[Any], schema: Type[BaseModel], fields: Optional[Iterable[str]] = None) -> bytes:
+    """Validation-free serialization of ORM rows for a response_model=List[schema] endpoint"""
+    return dumps([row_to_dict(r, schema, fields) for r in rows])
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Opt-in JSON response rendered with orjson. Handlers can also pass bytes that are
+    already serialized (e.g. a cached snapshot) and they are sent untouched.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return json_body(content)
+
+
+def _variant_etag(etag: str, encoding: Optional[str]) -> str:
+    # Each encoding is a different representation, so it gets its own strong tag
+    if not encoding:
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    base = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        # If-None-Match uses weak comparison, so W/ tags still count
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == base or candidate in (f"{base}-gzip", f"{base}-br"):
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q-values"""
+    if not accept_encoding:
+        return None
+
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[token.strip().lower()] = q
+
+    wildcard = qualities.get("*", 0.0)
+    if brotli is not None and qualities.get("br", wildcard) > 0:
+        return "br"
+    if qualities.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def _compress(body: bytes, encoding: str, etag: str) -> bytes:
+    key = (etag, encoding)
+    with _compressed_lock:
+        cached = _compressed_cache.get(key)
+        if cached is not None:
+            _compressed_cache.move_to_end(key)
+            return cached
+
+    if encoding == "br":
+        compressed = brotli.compress(body, quality=5)
+    else:
+        compressed = gzip.compress(body, compresslevel=6)
+
+    with _compressed_lock:
+        _compressed_cache[key] = compressed
+        if len(_compressed_cache) > _COMPRESSED_CACHE_SIZE:
+            _compressed_cache.popitem(last=False)
+    return compressed
+
+
+def conditional_response(
+    request: Request,
+    body: bytes,
+    etag: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None,
+    media_type: str = "application/json"
+) -> Response:
+    """
+    Build a response for a JSON payload that answers If-None-Match with 304 and
+    compresses large bodies with the best encoding the client accepts.
+    """
+    etag = etag or make_etag(body)
+    encoding = None
+    if len(body) >= settings.RESPONSE_COMPRESS_MIN_BYTES:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+
+    response_headers = dict(headers or {})
+    response_headers["ETag"] = _variant_etag(etag, encoding)
+    response_headers["Vary"] = "Accept-Encoding"
+    # Clients may keep the body but must revalidate before reusing it
+    response_headers["Cache-Control"] = "no-cache"
+
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=response_headers)
+
+    if encoding:
+        body = _compress(body, encoding, etag)
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=response_headers)
@@ -0,0 +1,75 @@
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.core.database import write_guard
+
+
+def _dialect_insert(db: Session, model):
+    """Return a dialect-specific INSERT that supports ON CONFLICT"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    raise NotImplementedError(f"Bulk upsert is not supported for dialect '{dialect}'")
+
+
+def _upsert_statement(db: Session, model, columns: Sequence[str]):
+    table = model.__table__
+    pk_keys = [c.key for c in table.primary_key.columns]
+    stmt = _dialect_insert(db, model)
+    update_set = {key: stmt.excluded[key] for key in columns if key not in pk_keys}
+    if not update_set:
+        return stmt.on_conflict_do_nothing(index_elements=pk_keys)
+    return stmt.on_conflict_do_update(index_elements=pk_keys, set_=update_set)
+
+
+def bulk_upsert(
+    db: Session,
+    model,
+    rows: List[Dict],
+    batch_size: int = 500,
+    columns: Optional[Sequence[str]] = None,
+    failed: Optional[List[Dict]] = None
+) -> int:
+    """
+    Insert or update rows with INSERT ... ON CONFLICT DO UPDATE on the primary key.
+    Rows are written in batches, one transaction per batch. If a batch fails it is
+    replayed row by row so one bad row only loses itself, not its whole batch.
+    Returns the number of rows written; rows that could not be written are appended
+    to `failed` when a list is passed.
+    """
+    if not rows:
+        return 0
+
+    # Every row in a call shares the same keys, so one statement serves all batches
+    columns = list(columns or rows[0].keys())
+    stmt = _upsert_statement(db, model, columns)
+    guard = write_guard(db.get_bind())
+    written = 0
+
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        # Held per batch so concurrent writers interleave instead of waiting out a whole sync
+        with guard:
+            try:
+                db.execute(stmt, batch)
+                db.commit()
+                written += len(batch)
+                continue
+            except Exception as e:
+                print(f"Bulk upsert batch into {model.__tablename__} failed ({e}), retrying row by row")
+                db.rollback()
+
+            for row in batch:
+                try:
+                    db.execute(stmt, [row])
+                    db.commit()
+                    written += 1
+                except Exception as e:
+                    print(f"Error upserting row into {model.__tablename__}: {e}")
+                    db.rollback()
+                    if failed is not None:
+                        failed.append(row)
+
+    return written
@@ -1,11 +1,16 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.database import engine, Base
-from app.models import CampaignModel, User, Event, GeoLocation, Order, Product, OrderDetail, SplashBanner, MarketingPopup, GenericBooking, PageListing, BenchmarkStats, InstitutionBenchmark, Mailshot, EmailTemplate, PageTemplate, BespokePage, CompassSubscription
+from app.core.database import engine, async_engine, Base, sync_schema
+from app.models import CampaignModel, CampaignRule, CampaignCountryInsight, CampaignDailyInsight, User, Event, GeoLocation, Order, Product, OrderDetail, SplashBanner, MarketingPopup, GenericBooking, PageListing, BenchmarkStats, InstitutionBenchmark, Mailshot, EmailTemplate, PageTemplate, BespokePage, CompassSubscription, SyncState, LegacyEventStat, LegacyEventSignupSnapshot
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+sync_schema()
+
+from app.services.contact_search import contact_search
+
+contact_search.ensure_index(engine)
 
 app = FastAPI(title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json")
 
@@ -17,8 +22,14 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        # Paging state for the list endpoints travels in headers (see ListQuery)
+        expose_headers=["X-Next-Cursor", "X-Has-More"],
     )
 
+@app.on_event("shutdown")
+async def close_async_resources():
+    await async_engine.dispose()
+
 @app.get("/")
 def root():
     return {"message": "Welcome to Keystone Ad Ops API"}
@@ -1,5 +1,5 @@
 from app.models.contact import Contact
-from app.models.campaign import CampaignModel
+from app.models.campaign import CampaignModel, CampaignRule, CampaignCountryInsight, CampaignDailyInsight
 from app.models.user import User
 from app.models.event import Event
 from app.models.location import GeoLocation
@@ -10,3 +10,5 @@ from app.models.analytics import BenchmarkStats, InstitutionBenchmark
 from app.models.email import Mailshot, EmailTemplate
 from app.models.content import PageTemplate, BespokePage
 from app.models.subscription import CompassSubscription, CompassSubscriptionGroup
+from app.models.sync_state import SyncState
+from app.models.legacy_event import LegacyEventStat, LegacyEventSignupSnapshot
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, JSON, Date, DateTime, Index, PrimaryKeyConstraint
 from app.core.database import Base
 from datetime import datetime
 
@@ -7,6 +7,7 @@ class CampaignModel(Base):
 
     id = Column(String, primary_key=True, index=True)
     name = Column(String)
+    raw_name = Column(String, nullable=True)  # Name as it comes from Meta, so rule changes can reclassify without a refetch
     status = Column(String)
     effective_status = Column(String)
     objective = Column(String, nullable=True)
@@ -23,3 +24,66 @@ class CampaignModel(Base):
     targeted_countries = Column(JSON, default=list)
     
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CampaignRule(Base):
+    """Taxonomy rules for campaign names (type, brand, display prefixes); see campaign_classifier"""
+    __tablename__ = "campaign_rules"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, index=True)  # type, brand or prefix
+    pattern = Column(String)
+    value = Column(String, nullable=True)  # Type/brand assigned on match
+    match = Column(String, default="contains")  # contains, token or prefix
+    priority = Column(Integer, default=100)  # Lower runs first
+    exclude_types = Column(String, nullable=True)  # Comma-separated campaign types the rule skips
+    enabled = Column(Boolean, default=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CampaignCountryInsight(Base):
+    """
+    Per-country Meta insights for a campaign (breakdowns=country), one row per
+    (campaign, country) delivered to or targeted. Only raw counters are stored;
+    CPM, CTR, CPC and the other ratios are derived in SQL (see country_insights).
+    """
+    __tablename__ = "campaign_country_insights"
+    __table_args__ = (
+        PrimaryKeyConstraint("campaign_id", "country"),
+        # "Which campaigns target DE" without scanning per-campaign JSON
+        Index("ix_campaign_country_insights_country", "country", "campaign_id"),
+    )
+
+    campaign_id = Column(String)
+    country = Column(String(2))  # ISO 3166-1 alpha-2, as Meta reports it
+    is_targeted = Column(Boolean, default=False)  # In some ad set's geo targeting
+
+    # Lifetime (date_preset=maximum)
+    spend = Column(Float, default=0.0)
+    impressions = Column(Integer, default=0)
+    reach = Column(Integer, default=0)
+    link_clicks = Column(Integer, default=0)
+    leads = Column(Integer, default=0)
+    conversions = Column(Integer, default=0)
+
+    # Last 7 days, for recent_7d_cpm
+    recent_7d_spend = Column(Float, default=0.0)
+    recent_7d_impressions = Column(Integer, default=0)
+
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CampaignDailyInsight(Base):
+    """Meta insights per campaign per day (time_increment=1); campaign totals are SUMs over this"""
+    __tablename__ = "campaign_daily_insights"
+    __table_args__ = (
+        PrimaryKeyConstraint("campaign_id", "date"),
+        # Account-wide trend charts scan by date
+        Index("ix_campaign_daily_insights_date", "date"),
+    )
+
+    campaign_id = Column(String)
+    date = Column(Date)  # Meta's date_start for the day
+    spend = Column(Float, default=0.0)
+    impressions = Column(Integer, default=0)
+    reach = Column(Integer, default=0)  # Daily reach; not additive across days
+    link_clicks = Column(Integer, default=0)
+    leads = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.core.database import Base
 
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        # Keyset pagination seeks on (sort column, id)
+        Index("ix_contacts_email_id", "email", "id"),
+        Index("ix_contacts_updated_at_id", "updated_at", "id"),
+    )
     
     id = Column(String, primary_key=True, index=True) # HubSpot ID
     first_name = Column(String, nullable=True)
@@ -12,5 +17,6 @@ class Contact(Base):
     phone = Column(String, nullable=True)
     company = Column(String, nullable=True)
     job_title = Column(String, nullable=True)
+    content_hash = Column(String(40), nullable=True)  # SHA-1 of the synced fields, skips no-op writes
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Index
+from app.core.database import Base
+from datetime import datetime
+
+class LegacyEventStat(Base):
+    """Latest state of each row in the findamasters legacy events feed"""
+    __tablename__ = "legacy_event_stats"
+    __table_args__ = (
+        # Weekly trend charts filter by week and split by brand/platform
+        Index("ix_legacy_event_stats_week_brand", "week_start", "brand"),
+        Index("ix_legacy_event_stats_week_platform", "week_start", "platform"),
+    )
+
+    tag_id = Column(String, primary_key=True)  # Feed TagID
+    product = Column(String, nullable=True, index=True)  # ProductGroup
+    venue = Column(String, nullable=True)  # ProductName
+    audience = Column(String, nullable=True)
+    brand = Column(String, nullable=True, index=True)  # TrafficSource: FAM/FAP
+    platform = Column(String, nullable=True, index=True)  # Cleaned Medium
+    signups = Column(Integer, default=0)
+    live_date = Column(Date, nullable=True)
+    week_start = Column(Date, nullable=True)  # Monday of live_date's week, so weekly rollups are a plain GROUP BY
+    first_seen_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class LegacyEventSignupSnapshot(Base):
+    """SignupCount per TagID, one row per day, for signup growth over time"""
+    __tablename__ = "legacy_event_signup_snapshots"
+
+    # Primary key (snapshot_date, tag_id): date first, so the history query's date range and GROUP BY use it
+    snapshot_date = Column(Date, primary_key=True)
+    tag_id = Column(String, primary_key=True)
+    signups = Column(Integer, default=0)
+    captured_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, String, DateTime
+from app.core.database import Base
+from datetime import datetime
+
+class SyncState(Base):
+    """High-water marks for incremental syncs from external systems"""
+    __tablename__ = "sync_state"
+
+    key = Column(String, primary_key=True)  # e.g. "hubspot_contacts"
+    watermark = Column(DateTime, nullable=True)  # Newest source modification time ingested (UTC)
+    last_full_sync_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
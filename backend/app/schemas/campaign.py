@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Literal, Optional
+from datetime import datetime
 
 class InsightBase(BaseModel):
     spend: float
@@ -46,3 +47,30 @@ class CampaignList(BaseModel):
     Brand: List[Campaign]
     LeadGen: List[Campaign]
     last_updated: str
+
+
+class CampaignRuleBase(BaseModel):
+    kind: Literal["type", "brand", "prefix"]
+    pattern: str
+    value: Optional[str] = None
+    match: Literal["contains", "token", "prefix"] = "contains"
+    priority: int = 100
+    exclude_types: Optional[str] = None
+    enabled: bool = True
+
+class CampaignRuleCreate(CampaignRuleBase):
+    pass
+
+class CampaignRuleUpdate(CampaignRuleBase):
+    kind: Optional[Literal["type", "brand", "prefix"]] = None
+    pattern: Optional[str] = None
+    match: Optional[Literal["contains", "token", "prefix"]] = None
+    priority: Optional[int] = None
+    enabled: Optional[bool] = None
+
+class CampaignRule(CampaignRuleBase):
+    id: int
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 from decimal import Decimal
 
 class EventBase(BaseModel):
@@ -33,3 +33,13 @@ class EventInDBBase(EventBase):
 
 class Event(EventInDBBase):
     pass
+
+class LegacyEventAggregate(BaseModel):
+    key: Optional[str] = None  # Brand, platform, product, or ISO week start (Monday)
+    events: int
+    signups: int
+
+class LegacyEventSignupPoint(BaseModel):
+    snapshot_date: date
+    events: int
+    signups: int
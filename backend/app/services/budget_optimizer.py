@@ -0,0 +1,183 @@
+import math
+import time
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.services.meta_service import meta_service
+from app.services.prediction_service import prediction_service
+from app.services.stats_cube import stats_cube
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional elsewhere, but the optimizer's search is written against it
+    np = None
+
+# Objective name -> prediction/curve outcome
+OBJECTIVES = {"impressions": "impressions", "reach": "reach", "clicks": "link_clicks", "leads": "leads"}
+# Campaign types whose predictions include the outcome (calculate_predictions leaves it at 0 for the rest)
+OBJECTIVE_TYPES = {"clicks": ("Brand", "LeadGen"), "leads": ("LeadGen",)}
+
+# Fitted exponents are kept in this range: above 0 so more budget never loses outcome,
+# below 1 so every curve is strictly concave and the optimum is unique
+MIN_ELASTICITY = 0.05
+MAX_ELASTICITY = 0.99
+
+# Multiplier values tried per round of the search; each round shrinks the bracket ~this much
+GRID_POINTS = 64
+MAX_ROUNDS = 50
+TOLERANCE = 1e-9
+
+
+class BudgetOptimizer:
+    """
+    Splits the media spend across countries to maximise one outcome, each country's
+    outcome following a * budget^b fitted from stored insights (see StatsCube.curve).
+    Because every curve is concave the optimum has equal marginal returns λ wherever a
+    share isn't at its min/max bound, so the search is over λ alone: each round
+    evaluates the shares for GRID_POINTS values of λ as one (λ x country) array and
+    keeps the interval where the total crosses 100%.
+    """
+
+    def _curve(self, campaign_type: str, country: str, outcome: str, month: Optional[int]) -> Dict:
+        curve = stats_cube.get_cube().curve(campaign_type, country, outcome, month, settings.STATS_CUBE_MIN_SAMPLES)
+        if curve is not None:
+            return curve
+        # No fit anywhere in the fallback chain: the linear model predictions use
+        stats = meta_service.get_aggregated_stats(campaign_type, country, month)
+        rates = {
+            "impressions": 1000 / stats["CPM"] if stats["CPM"] > 0 else 0.0,
+            "reach": 1000 / (stats["CPM"] * stats["Frequency"]) if stats["CPM"] > 0 and stats["Frequency"] > 0 else 0.0,
+            "link_clicks": 1 / stats["CPC"] if stats["CPC"] > 0 else 0.0,
+            "leads": 1 / stats["CPL"] if stats["CPL"] > 0 else 0.0
+        }
+        rate = rates[outcome]
+        return {"log_a": math.log(rate) if rate > 0 else -math.inf, "b": 1.0, "samples": 0, "source": None}
+
+    def _shares(self, levels, lc, b, log_lo, log_hi):
+        """Shares where each country's marginal return equals each of `levels` (log λ), clipped to bounds"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_x = (levels[:, None] - lc[None, :]) / (b - 1.0)[None, :]
+        return np.exp(np.clip(log_x, log_lo, log_hi))
+
+    def _solve(self, lc, b, lo, hi, deadline: float) -> Dict:
+        """
+        Shares x (fractions) maximising sum a_i (x_i B)^b_i subject to sum x = 1 and
+        lo <= x <= hi, where lc = log(a b B^b) is each country's log marginal coefficient.
+        """
+        with np.errstate(divide="ignore"):
+            log_lo = np.log(lo)
+            log_hi = np.log(hi)
+        active = np.isfinite(lc)
+        rounds = 0
+        converged = False
+        x = lo.copy()
+        if active.any():
+            floor = np.log(np.maximum(lo, 1e-12))
+            # λ at which each share sits at its max (low end) / its min (high end)
+            low = float(np.min((lc + (b - 1.0) * log_hi)[active])) - 1.0
+            high = float(np.max((lc + (b - 1.0) * floor)[active])) + 1.0
+            while rounds < MAX_ROUNDS:
+                rounds += 1
+                levels = np.linspace(low, high, GRID_POINTS)
+                totals = self._shares(levels, lc, b, log_lo, log_hi).sum(axis=1)  # Decreasing in λ
+                above = int(np.searchsorted(-totals, -1.0, side="right"))  # Levels with total >= 1
+                low = float(levels[max(above - 1, 0)])
+                high = float(levels[min(above, GRID_POINTS - 1)])
+                x = self._shares(np.array([(low + high) / 2]), lc, b, log_lo, log_hi)[0]
+                if abs(x.sum() - 1.0) < TOLERANCE or high - low < 1e-12:
+                    converged = True
+                    break
+                if time.perf_counter() > deadline:
+                    break
+
+        # Hand the leftover rounding (or an unreached remainder) to the shares with room
+        residual = 1.0 - x.sum()
+        room = hi - x if residual > 0 else x - lo
+        if room.sum() > 0:
+            x = np.clip(x + residual * room / room.sum(), lo, hi)
+        return {"shares": x, "rounds": rounds, "converged": converged}
+
+    def optimize(
+        self,
+        campaign_type: str,
+        countries: List[str],
+        duration_months: int,
+        objective: str = "impressions",
+        month: Optional[int] = None,
+        min_share: Optional[Dict[str, float]] = None,
+        max_share: Optional[Dict[str, float]] = None,
+        default_min_share: float = 0.0,
+        default_max_share: float = 100.0
+    ) -> Dict:
+        """
+        Best split of the media spend (shares in percent, like `allocations`) for
+        `objective`, plus calculate_predictions for that split. Raises ValueError for
+        unknown objectives or bounds that can't add up to 100%.
+        """
+        if np is None:
+            raise RuntimeError("numpy is required for the budget optimizer")
+        if objective not in OBJECTIVES:
+            raise ValueError(f"Unknown objective {objective!r}; expected one of {', '.join(OBJECTIVES)}")
+        if campaign_type not in OBJECTIVE_TYPES.get(objective, (campaign_type,)):
+            raise ValueError(f"{campaign_type} predictions have no {objective}")
+        countries = list(dict.fromkeys(countries))
+        if not countries:
+            raise ValueError("At least one country is required")
+
+        start = time.perf_counter()
+        deadline = start + settings.OPTIMIZER_TIME_LIMIT_SECONDS
+        min_share = min_share or {}
+        max_share = max_share or {}
+        lo = np.array([min_share.get(c, default_min_share) for c in countries], dtype=float) / 100.0
+        hi = np.array([max_share.get(c, default_max_share) for c in countries], dtype=float) / 100.0
+        if (lo < 0).any() or (hi > 1).any() or (lo > hi).any():
+            raise ValueError("Shares must satisfy 0 <= min_share <= max_share <= 100")
+        if lo.sum() > 1 + 1e-9 or hi.sum() < 1 - 1e-9:
+            raise ValueError("min_share values must total at most 100 and max_share values at least 100")
+
+        outcome = OBJECTIVES[objective]
+        budget = prediction_service.media_spend(campaign_type, duration_months)
+        curves = [self._curve(campaign_type, c, outcome, month) for c in countries]
+        log_a = np.array([c["log_a"] for c in curves])
+        b = np.clip([c["b"] for c in curves], MIN_ELASTICITY, MAX_ELASTICITY)
+        if budget > 0:
+            with np.errstate(divide="ignore"):
+                lc = log_a + np.log(b) + b * math.log(budget)
+            solution = self._solve(lc, b, lo, hi, deadline)
+        else:
+            solution = {"shares": lo + (1.0 - lo.sum()) * (hi - lo) / max((hi - lo).sum(), 1e-12), "rounds": 0, "converged": True}
+
+        shares = solution["shares"]
+        expected = np.exp(log_a) * (shares * budget) ** b
+        even = np.exp(log_a) * (budget / len(countries)) ** b
+        allocations = {c: round(float(s) * 100, 2) for c, s in zip(countries, shares)}
+        return {
+            "objective": objective,
+            "allocations": allocations,
+            "curve_estimate": {
+                "by_country": {c: round(float(v), 2) for c, v in zip(countries, expected)},
+                "total": round(float(expected.sum()), 2),
+                # Same curves with the budget split evenly (ignoring bounds), for comparison
+                "even_split_total": round(float(even.sum()), 2)
+            },
+            "curves": {
+                c: {
+                    "a": math.exp(curve["log_a"]) if math.isfinite(curve["log_a"]) else 0.0,
+                    "b": float(exponent),
+                    "samples": curve["samples"],
+                    "source": curve["source"]
+                }
+                for c, curve, exponent in zip(countries, curves, b)
+            },
+            # The linear PredictionService model, evaluated at the optimised split
+            "predictions": prediction_service.calculate_predictions(
+                campaign_type, countries, allocations, duration_months, month
+            ),
+            "search": {
+                "rounds": solution["rounds"],
+                "converged": solution["converged"],
+                "duration_seconds": round(time.perf_counter() - start, 4)
+            }
+        }
+
+
+budget_optimizer = BudgetOptimizer()
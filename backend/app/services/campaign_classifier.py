@@ -0,0 +1,320 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional; per-pattern str.find scans are the fallback
+    ahocorasick = None
+
+# Built-in prefixes stripped from display names, most specific first; the first one that matches wins
+NAME_PREFIXES = (
+    "FAU - FAM - Brand Paid Social - ",
+    "FAU - FAP - Brand Paid Social - ",
+    "FAU - FAM - Paid Social Brand - ",
+    "FAU - FAP - Paid Social Brand - ",
+    "FAU - FAM - Paid Social Lead Gen - ",
+    "FAU - FAP - Paid Social Lead Gen - ",
+    "FAU - FAM - Paid Social - ",
+    "FAU - FAP - Paid Social - ",
+    "FAU - FAM - PG LIVE - ",
+    "FAU - FAP - PG LIVE - ",
+    "FAU - FAM - ",
+    "FAU - FAP - ",
+    "FAM - Brand Paid Social - ",
+    "FAP - Brand Paid Social - ",
+    "FAM - Paid Social Brand - ",
+    "FAP - Paid Social Brand - ",
+    "FAM - Paid Social - ",
+    "FAP - Paid Social - ",
+    "FAM - PG LIVE - ",
+    "FAP - PG LIVE - ",
+    "FAM - ",
+    "FAP - ",
+    "Brand Paid Social - FAM - ",
+    "Brand Paid Social - FAP - ",
+    "Brand Social - FAP - ",
+    "Brand Social - FAM - ",
+    "Paid Social Lead Gen - FAM - ",
+    "Paid Social Lead Gen - FAP - ",
+    "Paid Social Brand - FAM - ",
+    "Paid Social Brand - FAP - ",
+    "Paid Social - FAM - ",
+    "Paid Social - FAP - ",
+    "Paid Social Brand - ",
+    "Paid Social - ",
+    "PG LIVE - FAM - ",
+    "PG LIVE - FAP - ",
+    "PG LIVE - ",
+    "PG LIVE",
+    "LeadGen - FAM - ",
+    "LeadGen - FAP - ",
+    "LeadGen - ",
+    "Lead Gen - FAM - ",
+    "Lead Gen - FAP - ",
+    "Lead Gen - ",
+    "Brand Paid Social - ",
+    "Paid Social - ",
+    "Brand - ",
+)
+
+# The old "looks like a date" test was `(Month...).*\d{2,4}|\d{2,4}`; its second branch
+# accepts any two digits and the first implies them, so this is the same test
+DATE_HINT_RE = re.compile(r"\d{2}")
+DATE_RE = re.compile(
+    r"(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)(?:/(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec))?\s*(\d{2,4})",
+    re.IGNORECASE
+)
+
+# (substring every match must contain, pattern), applied in this order: each pass can
+# expose a match for the next one. The substring check skips the regex for most names.
+BRAND_TERM_RES = (
+    ("brand", re.compile(r"brand\s+paid\s+social", re.IGNORECASE)),
+    ("pa", re.compile(r"paid\s+social", re.IGNORECASE)),
+    ("brand", re.compile(r"brand", re.IGNORECASE)),
+)
+LEADING_SEPARATOR_RE = re.compile(r"^\s*[-|]\s*")
+TRAILING_SEPARATOR_RE = re.compile(r"\s*[-|]\s*$")
+DOUBLE_SEPARATOR_RE = re.compile(r"\s*[-|]\s*[-|]\s*")
+
+CLASSIFIER_CACHE_SIZE = 65536
+
+RULE_KINDS = ("type", "brand", "prefix")
+MATCH_MODES = ("contains", "token", "prefix")
+
+DEFAULT_TYPE = "Brand"
+DEFAULT_BRAND = "FAU"
+# A name that matches rules for more than one brand covers both, i.e. FindAUniversity...
+MULTI_BRAND = "FAU"
+# ...except events, which always run for one brand: the highest-priority match wins
+SINGLE_BRAND_TYPES = frozenset({"Event"})
+
+# Rules match against the name in the same case the original if-chains used
+KIND_NORMALISERS = {"type": str.lower, "brand": str.upper}
+
+
+class Rule(NamedTuple):
+    kind: str  # type, brand or prefix
+    pattern: str
+    value: Optional[str] = None  # Campaign type / brand this rule assigns; unused for prefixes
+    match: str = "contains"  # contains, token (standalone word, see _is_token) or prefix
+    priority: int = 100  # Lower runs first
+    exclude_types: Optional[str] = None  # Comma-separated campaign types the rule does not apply to
+
+
+# Seeded into campaign_rules on first load; identical to the hard-coded rules they replace
+DEFAULT_RULES = (
+    Rule("type", "pg live", "Event", priority=10),
+    Rule("type", "pglive", "Event", priority=11),
+    Rule("type", "lead", "LeadGen", priority=20),
+    Rule("brand", "FAM/FAP", "FAU", priority=10, exclude_types="Event"),
+    Rule("brand", "FAP/FAM", "FAU", priority=11, exclude_types="Event"),
+    Rule("brand", "FAM", "FAM", match="token", priority=20),
+    Rule("brand", "FAP", "FAP", match="token", priority=21),
+) + tuple(Rule("prefix", p, match="prefix", priority=i) for i, p in enumerate(NAME_PREFIXES, start=1))
+
+
+class CampaignClassification(NamedTuple):
+    campaign_type: str  # Event, LeadGen or Brand
+    brand: str  # FAM, FAP or FAU
+    campaign_date: Optional[str]  # "Mar 25" / "Mar/Apr 25"
+    display_name: str
+
+
+def _split_date(name: str) -> Tuple[str, Optional[str]]:
+    """
+    (name without its date part, date part) when the part after the last " - " looks like a date.
+    Uses split() rather than rpartition(): for " - - " they pick different separators.
+    """
+    parts = name.split(" - ")
+    if len(parts) > 1:
+        potential_date = parts[-1].strip()
+        if DATE_HINT_RE.search(potential_date):
+            return " - ".join(parts[:-1]).strip(), potential_date
+    return name, None
+
+
+def extract_date(name: str) -> Optional[str]:
+    """Month(s) and two-digit year from the trailing " - <date>" part of a name"""
+    _, potential_date = _split_date(name)
+    if potential_date is None:
+        return None
+    match = DATE_RE.search(potential_date)
+    if not match:
+        return None
+    month1 = match.group(1).capitalize()
+    month2 = match.group(2).capitalize() if match.group(2) else None
+    year = match.group(3)
+    if len(year) == 4:
+        year = year[2:]
+    return f"{month1}/{month2} {year}" if month2 else f"{month1} {year}"
+
+
+def remove_date(name: str) -> str:
+    """Drop a trailing date part and generic branding terms, then tidy separators"""
+    clean_name, _ = _split_date(name)
+
+    for needle, pattern in BRAND_TERM_RES:
+        if needle in clean_name.lower():
+            clean_name = pattern.sub("", clean_name)
+
+    # Cheap necessary conditions first; str.strip() and regex \s agree on what whitespace is
+    if clean_name.lstrip()[:1] in ("-", "|"):
+        clean_name = LEADING_SEPARATOR_RE.sub("", clean_name)
+    if clean_name.rstrip()[-1:] in ("-", "|"):
+        clean_name = TRAILING_SEPARATOR_RE.sub("", clean_name)
+    if clean_name.count("-") + clean_name.count("|") >= 2:
+        clean_name = DOUBLE_SEPARATOR_RE.sub(" - ", clean_name)
+    return clean_name.strip()
+
+
+def rule_error(rule: Rule) -> Optional[str]:
+    """Why a rule can't be compiled, or None if it is valid"""
+    if rule.kind not in RULE_KINDS:
+        return f"Unknown rule kind '{rule.kind}'"
+    if rule.match not in MATCH_MODES:
+        return f"Unknown match mode '{rule.match}'"
+    if not rule.pattern:
+        return "Pattern must not be empty"
+    if (rule.kind == "prefix") != (rule.match == "prefix"):
+        return "Prefix rules, and only prefix rules, use match 'prefix'"
+    if rule.kind != "prefix" and not rule.value:
+        return f"{rule.kind.capitalize()} rules need a value"
+    return None
+
+
+def _is_token(text: str, start: int, end: int) -> bool:
+    """Standalone token at text[start:end]: " T ", "T " at the start, " T" at the end, "T -" or "- T" """
+    before_space = start > 0 and text[start - 1] == " "
+    after_space = end < len(text) and text[end] == " "
+    return (
+        (after_space and (before_space or start == 0))
+        or (before_space and end == len(text))
+        or text.startswith(" -", end)
+        or (start >= 2 and text[start - 2:start] == "- ")
+    )
+
+
+class _PatternIndex:
+    """Every occurrence of a fixed set of strings: one Aho-Corasick pass when pyahocorasick is installed"""
+
+    def __init__(self, patterns: Sequence[str]):
+        self.patterns = list(patterns)
+        self._automaton = None
+        if ahocorasick is not None and self.patterns:
+            by_pattern: Dict[str, List[int]] = {}
+            for i, pattern in enumerate(self.patterns):
+                by_pattern.setdefault(pattern, []).append(i)
+            automaton = ahocorasick.Automaton()
+            for pattern, indexes in by_pattern.items():
+                automaton.add_word(pattern, (len(pattern), indexes))
+            automaton.make_automaton()
+            self._automaton = automaton
+
+    def occurrences(self, text: str) -> Iterator[Tuple[int, int]]:
+        """(pattern index, start offset) for each occurrence, overlapping ones included"""
+        if self._automaton is not None:
+            for end, (length, indexes) in self._automaton.iter(text):
+                for i in indexes:
+                    yield i, end - length + 1
+            return
+        for i, pattern in enumerate(self.patterns):
+            start = text.find(pattern)
+            while start != -1:
+                yield i, start
+                start = text.find(pattern, start + 1)
+
+
+class _RuleMatcher:
+    """The type or brand rules of a RuleSet, in priority order"""
+
+    def __init__(self, rules: Sequence[Rule]):
+        self.rules = list(rules)
+        normalise = KIND_NORMALISERS[self.rules[0].kind] if self.rules else str
+        self._patterns = [normalise(r.pattern) for r in self.rules]
+        self._index = _PatternIndex(self._patterns)
+        self._excluded = [
+            frozenset(t.strip() for t in r.exclude_types.split(",")) if r.exclude_types else frozenset()
+            for r in self.rules
+        ]
+
+    def matches(self, text: str, campaign_type: Optional[str] = None) -> List[Rule]:
+        """Rules matching the (already normalised) text, highest priority first"""
+        hit = set()
+        for i, start in self._index.occurrences(text):
+            if i in hit or campaign_type in self._excluded[i]:
+                continue
+            if self.rules[i].match == "token" and not _is_token(text, start, start + len(self._patterns[i])):
+                continue
+            hit.add(i)
+        return [self.rules[i] for i in sorted(hit)]
+
+
+class RuleSet:
+    """
+    Rules compiled into matchers: type and brand patterns share one automaton each,
+    prefixes one anchored regex. Immutable; a rule change builds a new RuleSet (and memo).
+    """
+
+    def __init__(self, rules: Iterable[Rule], version: int = 0):
+        # Stable sort: equal priorities keep the order they were given in (id order from the DB)
+        self.rules = tuple(sorted(rules, key=lambda r: r.priority))
+        self.version = version
+        self._types = _RuleMatcher([r for r in self.rules if r.kind == "type"])
+        self._brands = _RuleMatcher([r for r in self.rules if r.kind == "brand"])
+        prefixes = [r.pattern for r in self.rules if r.kind == "prefix"]
+        # Regex alternatives are tried in order, so this keeps first-match-wins
+        self._prefix_re = re.compile("^(?:" + "|".join(re.escape(p) for p in prefixes) + ")") if prefixes else None
+        self.classify = lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)(self._classify)
+
+    def campaign_type(self, name: str) -> str:
+        """Campaign type from the original (uncleaned) name"""
+        matched = self._types.matches(name.lower())
+        return matched[0].value if matched else DEFAULT_TYPE
+
+    def detect_brand(self, name: str, c_type: Optional[str] = None) -> str:
+        matched = self._brands.matches(name.upper(), c_type)
+        if not matched:
+            return DEFAULT_BRAND
+        if c_type not in SINGLE_BRAND_TYPES and len({r.value for r in matched}) > 1:
+            return MULTI_BRAND
+        return matched[0].value
+
+    def strip_prefix(self, name: str) -> str:
+        """Remove the first matching prefix (and a bare leading "PG LIVE")"""
+        match = self._prefix_re.match(name) if self._prefix_re else None
+        if match:
+            name = name[match.end():]
+        if name.startswith("PG LIVE"):
+            name = name[7:].strip()
+        return name
+
+    def _classify(self, name: str) -> CampaignClassification:
+        c_type = self.campaign_type(name)
+        return CampaignClassification(
+            campaign_type=c_type,
+            brand=self.detect_brand(name, c_type),
+            campaign_date=extract_date(name),
+            display_name=remove_date(self.strip_prefix(name))
+        )
+
+
+_active = RuleSet(DEFAULT_RULES)
+
+
+def get_ruleset() -> RuleSet:
+    return _active
+
+
+def set_ruleset(ruleset: RuleSet):
+    """Swap in new rules; readers pick them up on their next classify() call"""
+    global _active
+    _active = ruleset
+
+
+def classify(name: str) -> CampaignClassification:
+    """
+    Type, brand, date and display name for a raw Meta campaign name under the active rules.
+    Memoized per RuleSet; refreshes see the same names every time.
+    """
+    return _active.classify(name)
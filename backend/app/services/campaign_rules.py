@@ -0,0 +1,69 @@
+import threading
+from typing import Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.database import write_guard
+from app.models.campaign import CampaignRule
+from app.services.campaign_classifier import DEFAULT_RULES, Rule, RuleSet, get_ruleset, rule_error, set_ruleset
+
+
+class CampaignRuleService:
+    """
+    Loads campaign_rules into the active classifier RuleSet. Edits made through this
+    process reload immediately; other workers notice the change (row count, newest
+    updated_at) the next time they refresh or reclassify.
+    """
+
+    def __init__(self):
+        self._fingerprint: Optional[Tuple] = None
+        self._lock = threading.Lock()
+
+    def _fingerprint_of(self, db: Session) -> Tuple:
+        count, newest, max_id = db.query(
+            func.count(CampaignRule.id), func.max(CampaignRule.updated_at), func.max(CampaignRule.id)
+        ).one()
+        return count, newest, max_id
+
+    def seed_defaults(self, db: Session) -> int:
+        """
+        Write the built-in rules if the table is empty. Deleting every rule therefore
+        resets to the defaults; disable rules to switch them off.
+        """
+        with write_guard(db.get_bind()):
+            if db.query(CampaignRule.id).first() is not None:
+                return 0
+            db.add_all(CampaignRule(**rule._asdict(), enabled=True) for rule in DEFAULT_RULES)
+            db.commit()
+        print(f"Seeded {len(DEFAULT_RULES)} default campaign rules")
+        return len(DEFAULT_RULES)
+
+    def load(self, db: Session) -> RuleSet:
+        """Compile the enabled rules and swap them in"""
+        with self._lock:
+            self.seed_defaults(db)
+            rows = db.query(CampaignRule).filter(CampaignRule.enabled.is_(True)).order_by(
+                CampaignRule.priority, CampaignRule.id
+            ).all()
+            rules = []
+            for r in rows:
+                rule = Rule(r.kind, r.pattern, r.value, r.match, r.priority, r.exclude_types)
+                error = rule_error(rule)
+                if error:
+                    # Rows written around the API; one bad rule shouldn't take the rest down
+                    print(f"Skipping campaign rule {r.id}: {error}")
+                    continue
+                rules.append(rule)
+            ruleset = RuleSet(rules, version=get_ruleset().version + 1)
+            set_ruleset(ruleset)
+            self._fingerprint = self._fingerprint_of(db)
+        print(f"Loaded campaign rules v{ruleset.version} ({len(rules)} enabled)")
+        return ruleset
+
+    def reload_if_changed(self, db: Session) -> RuleSet:
+        """Reload when the table changed since the last load (or was never loaded)"""
+        if self._fingerprint is None or self._fingerprint_of(db) != self._fingerprint:
+            return self.load(db)
+        return get_ruleset()
+
+
+campaign_rules = CampaignRuleService()
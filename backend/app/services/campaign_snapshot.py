@@ -0,0 +1,30 @@
+import hashlib
+from datetime import datetime
+from typing import Optional
+from app.schemas.campaign import CampaignList
+
+
+class CampaignSnapshot:
+    """
+    Materialized, already-serialized CampaignList.
+    Built once per refresh and swapped in whole, so readers never see a half-built list.
+    """
+
+    def __init__(
+        self,
+        campaigns: CampaignList,
+        version: int,
+        row_count: int,
+        data_updated_at: Optional[datetime] = None
+    ):
+        self.campaigns = campaigns
+        self.version = version
+        self.row_count = row_count
+        # Newest updated_at in the DB when this was built; None for non-DB sources
+        self.data_updated_at = data_updated_at
+        self.built_at = datetime.utcnow()
+        self.body = campaigns.model_dump_json().encode("utf-8")
+        self.etag = f'"{hashlib.sha1(self.body).hexdigest()}"'
+
+    def is_stale(self, max_age_before: datetime) -> bool:
+        return self.data_updated_at is None or self.data_updated_at < max_age_before
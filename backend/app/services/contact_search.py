@@ -0,0 +1,141 @@
+import re
+from typing import Dict, List
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from app.models.contact import Contact
+
+
+class ContactSearch:
+    """
+    Ranked prefix search over contact name, email, company and job title.
+    SQLite: an external-content FTS5 table kept in step with `contacts` by triggers,
+    so every ingest upsert updates the index in the same transaction.
+    PostgreSQL: expression GIN indexes (tsvector + pg_trgm) that the database maintains.
+    """
+
+    FIELDS = ("first_name", "last_name", "email", "company", "job_title")
+    # bm25 column weights, in FIELDS order: names matter most, job title least
+    WEIGHTS = (10.0, 10.0, 5.0, 2.0, 1.0)
+    FTS_TABLE = "contacts_fts"
+
+    def __init__(self):
+        # Set by ensure_index once pg_trgm is known to be installed
+        self._pg_trigram = False
+
+    def _dialect(self, bind) -> str:
+        return bind.dialect.name
+
+    def _pg_document(self) -> str:
+        return " || ' ' || ".join(f"coalesce({f}, '')" for f in self.FIELDS)
+
+    def ensure_index(self, engine: Engine):
+        """Create the search index if missing and backfill it from existing contacts"""
+        dialect = self._dialect(engine)
+        if dialect == "sqlite":
+            self._ensure_sqlite(engine)
+        elif dialect == "postgresql":
+            self._ensure_postgres(engine)
+        else:
+            print(f"Contact search index not supported on {dialect}")
+
+    def _ensure_sqlite(self, engine: Engine):
+        cols = ", ".join(self.FIELDS)
+        new_cols = ", ".join(f"new.{f}" for f in self.FIELDS)
+        old_cols = ", ".join(f"old.{f}" for f in self.FIELDS)
+        t = self.FTS_TABLE
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": t}
+            ).first()
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {t} USING fts5("
+                f"{cols}, content='contacts', content_rowid='rowid', prefix='2 3')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS contacts_fts_ai AFTER INSERT ON contacts BEGIN "
+                f"INSERT INTO {t}(rowid, {cols}) VALUES (new.rowid, {new_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS contacts_fts_ad AFTER DELETE ON contacts BEGIN "
+                f"INSERT INTO {t}({t}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS contacts_fts_au AFTER UPDATE ON contacts BEGIN "
+                f"INSERT INTO {t}({t}, rowid, {cols}) VALUES ('delete', old.rowid, {old_cols}); "
+                f"INSERT INTO {t}(rowid, {cols}) VALUES (new.rowid, {new_cols}); END"
+            ))
+            if not exists:
+                print("Building contact search index...")
+                conn.execute(text(f"INSERT INTO {t}({t}) VALUES ('rebuild')"))
+
+    def _ensure_postgres(self, engine: Engine):
+        doc = self._pg_document()
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS ix_contacts_search_tsv ON contacts "
+                f"USING GIN (to_tsvector('simple', {doc}))"
+            ))
+        # pg_trgm needs CREATE privilege on the database; search still works without it
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                conn.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_contacts_search_trgm ON contacts "
+                    f"USING GIN (({doc}) gin_trgm_ops)"
+                ))
+            self._pg_trigram = True
+        except Exception as e:
+            print(f"Trigram index unavailable, using full-text only: {e}")
+
+    def rebuild(self, db: Session):
+        """Re-derive the SQLite index from `contacts` (needed after a VACUUM renumbers rowids)"""
+        if self._dialect(db.get_bind()) == "sqlite":
+            db.execute(text(f"INSERT INTO {self.FTS_TABLE}({self.FTS_TABLE}) VALUES ('rebuild')"))
+            db.commit()
+
+    def _terms(self, query: str) -> List[str]:
+        return re.findall(r"\w+", query.lower())
+
+    def search(self, db: Session, query: str, limit: int = 20) -> List[Contact]:
+        """Contacts matching every term in `query` as a prefix, best match first"""
+        terms = self._terms(query)
+        if not terms:
+            return []
+
+        dialect = self._dialect(db.get_bind())
+        if dialect == "sqlite":
+            match = " ".join(f'"{term}"*' for term in terms)
+            weights = ", ".join(str(w) for w in self.WEIGHTS)
+            # Rank inside the FTS table first, then join only the top hits back to contacts
+            stmt = text(
+                f"SELECT c.id FROM ("
+                f"SELECT rowid, bm25({self.FTS_TABLE}, {weights}) AS score FROM {self.FTS_TABLE} "
+                f"WHERE {self.FTS_TABLE} MATCH :match ORDER BY score LIMIT :limit"
+                f") f JOIN contacts c ON c.rowid = f.rowid ORDER BY f.score"
+            )
+            params: Dict = {"match": match, "limit": limit}
+        elif dialect == "postgresql":
+            doc = self._pg_document()
+            where = f"to_tsvector('simple', {doc}) @@ to_tsquery('simple', :tsquery)"
+            rank = f"ts_rank(to_tsvector('simple', {doc}), to_tsquery('simple', :tsquery))"
+            params = {"tsquery": " & ".join(f"{term}:*" for term in terms), "limit": limit}
+            if self._pg_trigram:
+                # Trigram index also catches matches inside words ("smith" in "goldsmith")
+                where = f"({where} OR ({doc}) ILIKE ALL(:likes))"
+                rank = f"{rank} + similarity({doc}, :raw)"
+                params["likes"] = [f"%{term}%" for term in terms]
+                params["raw"] = " ".join(terms)
+            stmt = text(f"SELECT id FROM contacts WHERE {where} ORDER BY {rank} DESC, id LIMIT :limit")
+        else:
+            raise NotImplementedError(f"Contact search is not supported for dialect '{dialect}'")
+
+        ids = [row[0] for row in db.execute(stmt, params)]
+        if not ids:
+            return []
+        # Preserve the index's ranking when loading the full rows
+        by_id = {c.id: c for c in db.query(Contact).filter(Contact.id.in_(ids)).all()}
+        return [by_id[i] for i in ids if i in by_id]
+
+
+contact_search = ContactSearch()
@@ -0,0 +1,193 @@
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import Float, case, cast, delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.database import write_guard
+from app.core.upsert import bulk_upsert
+from app.models.campaign import CampaignCountryInsight
+from app.schemas.campaign import CountryInsight
+
+# Meta action types counted as leads / conversions in the `actions` breakdown
+LEAD_ACTION_TYPES = ("lead",)
+CONVERSION_ACTION_TYPES = ("complete_registration",)
+
+
+def ratio(numerator, denominator, scale: float = 1.0):
+    """numerator * scale / denominator in SQL, 0 when the denominator is 0 (float division on every backend)"""
+    return case((denominator > 0, cast(numerator, Float) * scale / denominator), else_=0.0)
+
+
+def action_total(actions: Optional[List[Dict]], action_types: Iterable[str]) -> int:
+    total = 0
+    for action in actions or []:
+        if action.get("action_type") in action_types:
+            try:
+                total += int(float(action.get("value", 0)))
+            except (TypeError, ValueError):
+                pass
+    return total
+
+
+def as_int(value) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def as_float(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CountryInsightService:
+    """Storage and SQL-derived metrics for the per-country campaign fact table"""
+
+    def insight_columns(self) -> List:
+        """Everything CountryInsight needs; ratios are computed by the database"""
+        t = CampaignCountryInsight
+        return [
+            t.campaign_id,
+            t.country,
+            t.is_targeted,
+            t.spend,
+            t.impressions,
+            t.reach,
+            t.link_clicks,
+            t.leads,
+            t.conversions,
+            ratio(t.spend, t.impressions, 1000).label("cpm"),
+            ratio(t.impressions, t.reach).label("frequency"),
+            ratio(t.link_clicks, t.impressions, 100).label("ctr"),
+            ratio(t.spend, t.link_clicks).label("cpc"),
+            ratio(t.spend, t.leads).label("cpl"),
+            ratio(t.conversions, t.link_clicks, 100).label("cvr"),
+            ratio(t.recent_7d_spend, t.recent_7d_impressions, 1000).label("recent_7d_cpm"),
+        ]
+
+    def _insight(self, row) -> CountryInsight:
+        return CountryInsight(
+            country=row.country,
+            is_targeted=bool(row.is_targeted),
+            spend=round(row.spend or 0.0, 2),
+            impressions=row.impressions or 0,
+            reach=row.reach or 0,
+            link_clicks=row.link_clicks or 0,
+            leads=row.leads or 0,
+            conversions=row.conversions or 0,
+            cpm=round(row.cpm, 2),
+            frequency=round(row.frequency, 2),
+            ctr=round(row.ctr, 2),
+            cpc=round(row.cpc, 2),
+            cpl=round(row.cpl, 2),
+            cvr=round(row.cvr, 2),
+            recent_7d_cpm=round(row.recent_7d_cpm, 2)
+        )
+
+    def load_by_campaign(self, db: Session) -> Dict[str, List[CountryInsight]]:
+        """CountryInsight lists for every campaign, biggest spend first"""
+        stmt = select(*self.insight_columns()).order_by(
+            CampaignCountryInsight.campaign_id, CampaignCountryInsight.spend.desc(), CampaignCountryInsight.country
+        )
+        by_campaign: Dict[str, List[CountryInsight]] = defaultdict(list)
+        for row in db.execute(stmt):
+            by_campaign[row.campaign_id].append(self._insight(row))
+        return by_campaign
+
+    def _campaigns_in_country_stmt(self, country: str, targeted_only: bool = False):
+        stmt = select(CampaignCountryInsight.campaign_id).where(CampaignCountryInsight.country == country.upper())
+        if targeted_only:
+            stmt = stmt.where(CampaignCountryInsight.is_targeted.is_(True))
+        return stmt
+
+    async def campaign_ids_for_country_async(
+        self, db: AsyncSession, country: str, targeted_only: bool = False
+    ) -> Set[str]:
+        """Campaigns that target or delivered in `country` (index seek on (country, campaign_id))"""
+        result = await db.execute(self._campaigns_in_country_stmt(country, targeted_only))
+        return set(result.scalars().all())
+
+    def build_rows(
+        self,
+        campaign_id: str,
+        lifetime: List[Dict],
+        recent: List[Dict],
+        targeted: Iterable[str],
+        now: datetime
+    ) -> List[Dict]:
+        """Fact rows for one campaign from its breakdowns=country insights and targeted countries"""
+        rows: Dict[str, Dict] = {}
+
+        def row_for(country: str) -> Dict:
+            if country not in rows:
+                rows[country] = {
+                    "campaign_id": campaign_id, "country": country, "is_targeted": False,
+                    "spend": 0.0, "impressions": 0, "reach": 0, "link_clicks": 0, "leads": 0,
+                    "conversions": 0, "recent_7d_spend": 0.0, "recent_7d_impressions": 0,
+                    "updated_at": now
+                }
+            return rows[country]
+
+        for item in lifetime:
+            if not item.get("country"):
+                continue
+            row = row_for(item["country"])
+            row["spend"] += as_float(item.get("spend"))
+            row["impressions"] += as_int(item.get("impressions"))
+            row["reach"] += as_int(item.get("reach"))
+            row["link_clicks"] += as_int(item.get("inline_link_clicks"))
+            row["leads"] += action_total(item.get("actions"), LEAD_ACTION_TYPES)
+            row["conversions"] += action_total(item.get("actions"), CONVERSION_ACTION_TYPES)
+
+        for item in recent:
+            if not item.get("country"):
+                continue
+            row = row_for(item["country"])
+            row["recent_7d_spend"] += as_float(item.get("spend"))
+            row["recent_7d_impressions"] += as_int(item.get("impressions"))
+
+        for country in targeted:
+            row_for(country)["is_targeted"] = True
+        return list(rows.values())
+
+    def store(
+        self,
+        db: Session,
+        campaign_ids: List[str],
+        rows: List[Dict],
+        batch_size: int = 500
+    ) -> int:
+        """
+        Upsert the rows, then drop countries these campaigns no longer have. Campaigns whose
+        fetch failed must not be in `campaign_ids`; they keep their rows. Only (campaign, country)
+        pairs missing from `rows` are deleted, so a row whose upsert failed keeps its previous data.
+        """
+        written = bulk_upsert(db, CampaignCountryInsight, rows, batch_size=batch_size)
+        if not campaign_ids:
+            return written
+
+        t = CampaignCountryInsight
+        fetched = {(row["campaign_id"], row["country"]) for row in rows}
+        stale = []
+        for i in range(0, len(campaign_ids), batch_size):
+            stale.extend(
+                pair for pair in db.execute(
+                    select(t.campaign_id, t.country).where(t.campaign_id.in_(campaign_ids[i:i + batch_size]))
+                ).tuples()
+                if pair not in fetched
+            )
+        if not stale:
+            return written
+
+        with write_guard(db.get_bind()):
+            for i in range(0, len(stale), batch_size):
+                db.execute(delete(t).where(tuple_(t.campaign_id, t.country).in_(stale[i:i + batch_size])))
+            db.commit()
+        return written
+
+
+country_insights = CountryInsightService()
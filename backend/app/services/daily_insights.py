@@ -0,0 +1,120 @@
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.upsert import bulk_upsert
+from app.models.campaign import CampaignDailyInsight, CampaignModel
+from app.services.country_insights import LEAD_ACTION_TYPES, action_total, as_float, as_int, ratio
+
+
+class DailyInsightService:
+    """Storage, incremental windows and rollups for the campaign_daily_insights table"""
+
+    def fetch_windows(self, db: Session, campaign_ids: List[str]) -> Dict[str, Optional[date]]:
+        """
+        First day to request per campaign: a few days before the newest stored day, so late
+        attribution is picked up. None means nothing is stored yet (fetch the whole lifetime).
+        """
+        newest = dict(db.execute(
+            select(CampaignDailyInsight.campaign_id, func.max(CampaignDailyInsight.date))
+            .where(CampaignDailyInsight.campaign_id.in_(campaign_ids))
+            .group_by(CampaignDailyInsight.campaign_id)
+        ).all())
+        trailing = timedelta(days=settings.META_DAILY_INSIGHTS_TRAILING_DAYS)
+        return {cid: newest[cid] - trailing if newest.get(cid) else None for cid in campaign_ids}
+
+    def build_rows(self, campaign_id: str, days: List[Dict], now: datetime) -> List[Dict]:
+        rows = []
+        for item in days:
+            try:
+                day = date.fromisoformat(item["date_start"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            rows.append({
+                "campaign_id": campaign_id,
+                "date": day,
+                "spend": as_float(item.get("spend")),
+                "impressions": as_int(item.get("impressions")),
+                "reach": as_int(item.get("reach")),
+                "link_clicks": as_int(item.get("inline_link_clicks")),
+                "leads": action_total(item.get("actions"), LEAD_ACTION_TYPES),
+                "updated_at": now
+            })
+        return rows
+
+    def store(self, db: Session, rows: List[Dict], batch_size: int = 500) -> int:
+        return bulk_upsert(db, CampaignDailyInsight, rows, batch_size=batch_size)
+
+    def totals(self, db: Session, campaign_ids: List[str]) -> Dict[str, Dict]:
+        """Lifetime spend/impressions per campaign, summed from the daily rows"""
+        rows = db.execute(
+            select(
+                CampaignDailyInsight.campaign_id,
+                func.sum(CampaignDailyInsight.spend),
+                func.sum(CampaignDailyInsight.impressions)
+            )
+            .where(CampaignDailyInsight.campaign_id.in_(campaign_ids))
+            .group_by(CampaignDailyInsight.campaign_id)
+        ).all()
+        return {cid: {"spend": spend or 0.0, "impressions": impressions or 0} for cid, spend, impressions in rows}
+
+    async def trend_async(
+        self,
+        db: AsyncSession,
+        campaign_id: Optional[str] = None,
+        campaign_type: Optional[str] = None,
+        brand: Optional[str] = None,
+        date_from: Optional[date] = None,
+        date_to: Optional[date] = None
+    ) -> List[Dict]:
+        """Daily totals (and CPM/CTR/CPL derived in SQL) across the matching campaigns"""
+        t = CampaignDailyInsight
+        spend = func.sum(t.spend)
+        impressions = func.sum(t.impressions)
+        clicks = func.sum(t.link_clicks)
+        leads = func.sum(t.leads)
+        stmt = select(
+            t.date,
+            spend.label("spend"),
+            impressions.label("impressions"),
+            clicks.label("link_clicks"),
+            leads.label("leads"),
+            func.count(t.campaign_id).label("campaigns"),
+            ratio(spend, impressions, 1000).label("cpm"),
+            ratio(clicks, impressions, 100).label("ctr"),
+            ratio(spend, leads).label("cpl")
+        )
+        if campaign_type or brand:
+            stmt = stmt.join(CampaignModel, CampaignModel.id == t.campaign_id)
+            if campaign_type:
+                stmt = stmt.where(CampaignModel.campaign_type == campaign_type)
+            if brand:
+                stmt = stmt.where(CampaignModel.brand == brand)
+        if campaign_id:
+            stmt = stmt.where(t.campaign_id == campaign_id)
+        if date_from:
+            stmt = stmt.where(t.date >= date_from)
+        if date_to:
+            stmt = stmt.where(t.date <= date_to)
+        stmt = stmt.group_by(t.date).order_by(t.date)
+
+        result = await db.execute(stmt)
+        return [
+            {
+                "date": row.date,
+                "spend": round(row.spend or 0.0, 2),
+                "impressions": row.impressions or 0,
+                "link_clicks": row.link_clicks or 0,
+                "leads": row.leads or 0,
+                "campaigns": row.campaigns,
+                "cpm": round(row.cpm, 2),
+                "ctr": round(row.ctr, 2),
+                "cpl": round(row.cpl, 2)
+            }
+            for row in result
+        ]
+
+
+daily_insights = DailyInsightService()
@@ -1,14 +1,84 @@
-import requests
+import asyncio
+import json
+import os
 import re
-from datetime import datetime
-from typing import List, Dict, Optional, Any
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Any, Tuple
+from app.core.config import settings, BASE_DIR
+from app.core.database import SessionLocal
+from app.core.http_client import http_client
+from app.core.responses import json_body, make_etag
+from app.core.upsert import bulk_upsert
+from app.models.legacy_event import LegacyEventStat, LegacyEventSignupSnapshot
+from app.services.refresh_coordinator import refresh_coordinator
+
+ASP_DATE_RE = re.compile(r'Date\((\d+)\)')
+
+
+def _as_count(value) -> int:
+    """
+    SignupCount as an int. The feed is hand-edited upstream and sometimes sends
+    "12.5", "1,234" or "N/A": those count as 12, 1234 and 0 rather than failing the row.
+    """
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(float(str(value).replace(",", "")))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+class EventFeedUnavailable(Exception):
+    """No copy of the feed has ever been fetched and upstream is failing"""
+
+
+class EventFeedSnapshot:
+    """One good copy of the legacy events feed, serialized once for every reader"""
+
+    def __init__(
+        self,
+        events: List[Dict[str, Any]],
+        fetched_at: float,
+        upstream_etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ):
+        self.events = events
+        # Last time upstream confirmed this data (fetch or 304 revalidation)
+        self.fetched_at = fetched_at
+        # Validators for conditional requests to the feed
+        self.upstream_etag = upstream_etag
+        self.last_modified = last_modified
+        self.body = json_body(events)
+        self.etag = make_etag(self.body)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
 
 class EventService:
+    REFRESH_KEY = "legacy_events"
+
     def __init__(self):
         self.url = "https://findamasters.com/_HeadOfficeScripts/n8nHandler.ashx?a=S1Pv28UyKt4dqOQhsTyD9gs7hUT6IFwUUzlmsP460JxoVlzEBtqtjCL1iWCL6WBS&type=1"
         self.headers = {
             "User-Agent": "n8n-FAU-Agentv1.1"
         }
+        # The feed's certificate doesn't verify from every network; keep skipping it
+        http_client.configure_host(urlsplit(self.url).hostname, rate=5, verify=False)
+
+        # Last good copy, persisted so a restart during an outage still has data
+        self.cache_file = os.path.join(BASE_DIR, "cached_events.json")
+        self._snapshot: Optional[EventFeedSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+        # (snapshot etag, day) last written to the stats tables; unchanged feeds are written once a day
+        self._ingested: Optional[Tuple[str, date]] = None
 
     def _parse_asp_date(self, date_str: str) -> str:
         """Parse ASP.NET JSON date format /Date(1234567890)/"""
@@ -16,7 +86,7 @@ class EventService:
             return ""
         try:
             # Extract timestamp
-            match = re.search(r'Date\((\d+)\)', date_str)
+            match = ASP_DATE_RE.search(date_str)
             if match:
                 timestamp = int(match.group(1)) / 1000
                 return datetime.fromtimestamp(timestamp).strftime("%d %b %Y")
@@ -39,29 +109,217 @@ class EventService:
             return "LinkedIn"
         return medium
 
-    def fetch_events(self) -> List[Dict[str, Any]]:
-        """Fetch and transform events"""
+    def _transform(self, data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        events = []
+        for item in data:
+            events.append({
+                "id": item.get("TagID"),
+                "product": item.get("ProductGroup"),
+                "venue": item.get("ProductName"),
+                "audience": item.get("TargetAudience"),
+                "brand": item.get("TrafficSource"), # FAM/FAP
+                "platform": self._clean_platform(item.get("Medium")),
+                "signups": item.get("SignupCount", 0),
+                "date": self._parse_asp_date(item.get("LiveDate"))
+            })
+        return events
+
+    def _save_cache_file(self, snapshot: EventFeedSnapshot):
+        try:
+            tmp_path = f"{self.cache_file}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({
+                    "events": snapshot.events,
+                    "fetched_at": snapshot.fetched_at,
+                    "upstream_etag": snapshot.upstream_etag,
+                    "last_modified": snapshot.last_modified
+                }, f)
+            # Readers never see a half-written file
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            print(f"Failed to save events cache: {e}")
+
+    def _load_cache_file(self) -> Optional[EventFeedSnapshot]:
+        if not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, "r") as f:
+                data = json.load(f)
+            print(f"Loaded {len(data['events'])} legacy events from cache file")
+            return EventFeedSnapshot(
+                data["events"],
+                data.get("fetched_at") or 0,
+                data.get("upstream_etag"),
+                data.get("last_modified")
+            )
+        except Exception as e:
+            print(f"Failed to load events cache: {e}")
+            return None
+
+    def _refresh(self) -> Dict:
+        """Fetch the feed (conditionally when we have validators) and publish it"""
+        current = self._snapshot
+        headers = dict(self.headers)
+        if current is not None:
+            if current.upstream_etag:
+                headers["If-None-Match"] = current.upstream_etag
+            if current.last_modified:
+                headers["If-Modified-Since"] = current.last_modified
+
+        response = http_client.request("GET", self.url, headers=headers, timeout=15)
+        if response.status_code == 304 and current is not None:
+            current.fetched_at = time.time()
+            self._save_cache_file(current)
+            return {"events": len(current.events), "revalidated": True, "ingested": self._ingest(current)}
+
+        response.raise_for_status()
+        data = response.json()
+        if not isinstance(data, list):
+            raise ValueError(f"Unexpected events feed payload: {type(data).__name__}")
+
+        snapshot = EventFeedSnapshot(
+            self._transform(data),
+            time.time(),
+            response.headers.get("ETag"),
+            response.headers.get("Last-Modified")
+        )
+        with self._snapshot_lock:
+            self._snapshot = snapshot
+        self._save_cache_file(snapshot)
+        return {"events": len(snapshot.events), "revalidated": False, "ingested": self._ingest(snapshot)}
+
+    def _stat_rows(self, events: List[Dict[str, Any]]) -> List[Dict]:
+        rows = {}
+        now = datetime.utcnow()
+        for event in events:
+            if event.get("id") is None:
+                continue
+            live_date = None
+            if event.get("date"):
+                try:
+                    live_date = datetime.strptime(event["date"], "%d %b %Y").date()
+                except ValueError:
+                    pass
+            # Keyed by TagID so a duplicated row can't hit the same key twice in one upsert
+            rows[str(event["id"])] = {
+                "tag_id": str(event["id"]),
+                "product": event.get("product"),
+                "venue": event.get("venue"),
+                "audience": event.get("audience"),
+                "brand": event.get("brand"),
+                "platform": event.get("platform"),
+                "signups": _as_count(event.get("signups")),
+                "live_date": live_date,
+                "week_start": live_date - timedelta(days=live_date.weekday()) if live_date else None,
+                "updated_at": now
+            }
+        return list(rows.values())
+
+    def _ingest(self, snapshot: EventFeedSnapshot) -> int:
+        """
+        Upsert the feed into legacy_event_stats and record today's SignupCount per TagID.
+        Best effort: a database error is logged and never fails the feed refresh.
+        """
+        today = datetime.utcnow().date()
+        if self._ingested == (snapshot.etag, today):
+            return 0
+
+        db = SessionLocal()
+        try:
+            rows = self._stat_rows(snapshot.events)
+            signups = [
+                {"tag_id": r["tag_id"], "snapshot_date": today, "signups": r["signups"], "captured_at": r["updated_at"]}
+                for r in rows
+            ]
+            written = bulk_upsert(db, LegacyEventStat, rows)
+            bulk_upsert(db, LegacyEventSignupSnapshot, signups)
+            self._ingested = (snapshot.etag, today)
+            return written
+        except Exception as e:
+            print(f"Error ingesting legacy event stats: {e}")
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+    def refresh(self, force: bool = False):
+        """Single-flight background refresh; failing upstreams are retried at most once per interval"""
+        return refresh_coordinator.trigger(
+            self.REFRESH_KEY,
+            self._refresh,
+            min_interval=settings.EVENTS_REFRESH_MIN_INTERVAL_SECONDS,
+            force=force
+        )
+
+    def _current_snapshot(self) -> Optional[EventFeedSnapshot]:
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._snapshot_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load_cache_file()
+                snapshot = self._snapshot
+        if snapshot is not None and snapshot.age > settings.EVENTS_CACHE_TTL_SECONDS:
+            # Serve what we have; the refresh swaps in new data when it lands
+            self.refresh()
+        return snapshot
+
+    def _cold_refresh(self):
+        """
+        The refresh a cold start waits on. Throttled like any other refresh, so while
+        upstream is down requests fail fast instead of each starting its own fetch.
+        """
+        future = self.refresh()
+        if future is None and self._snapshot is not None:
+            # A refresh landed between the cache check and now
+            future = Future()
+            future.set_result(None)
+        if future is None:
+            error = refresh_coordinator.status(self.REFRESH_KEY)["last_error"] or "refresh throttled"
+            raise EventFeedUnavailable(f"Legacy events feed unavailable: {error}")
+        return future
+
+    def get_snapshot(self) -> EventFeedSnapshot:
+        """
+        The cached feed. Only the very first call, with nothing in memory or on disk,
+        waits for upstream; every other call returns immediately, stale or not.
+        """
+        snapshot = self._current_snapshot()
+        if snapshot is not None:
+            return snapshot
+        future = self._cold_refresh()
+        try:
+            future.result()
+        except Exception as e:
+            raise EventFeedUnavailable(f"Legacy events feed unavailable: {e}")
+        return self._snapshot
+
+    async def get_snapshot_async(self) -> EventFeedSnapshot:
+        """get_snapshot() for async routes: a cold start waits without holding a thread"""
+        snapshot = self._current_snapshot()
+        if snapshot is not None:
+            return snapshot
+        future = self._cold_refresh()
         try:
-            # Disable SSL verify to avoid local cert issues
-            response = requests.get(self.url, headers=self.headers, timeout=15, verify=False)
-            response.raise_for_status()
-            data = response.json()
-            
-            events = []
-            for item in data:
-                events.append({
-                    "id": item.get("TagID"),
-                    "product": item.get("ProductGroup"),
-                    "venue": item.get("ProductName"),
-                    "audience": item.get("TargetAudience"),
-                    "brand": item.get("TrafficSource"), # FAM/FAP
-                    "platform": self._clean_platform(item.get("Medium")),
-                    "signups": item.get("SignupCount", 0),
-                    "date": self._parse_asp_date(item.get("LiveDate"))
-                })
-            return events
+            await asyncio.wrap_future(future)
         except Exception as e:
+            raise EventFeedUnavailable(f"Legacy events feed unavailable: {e}")
+        return self._snapshot
+
+    def fetch_events(self) -> List[Dict[str, Any]]:
+        """Transformed events from the cache, or [] if the feed has never been reachable"""
+        try:
+            return self.get_snapshot().events
+        except EventFeedUnavailable as e:
             print(f"Error fetching events: {e}")
             return []
 
+    def get_status(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            "cached_events": len(snapshot.events) if snapshot else 0,
+            "age_seconds": round(snapshot.age, 1) if snapshot else None,
+            "ttl_seconds": settings.EVENTS_CACHE_TTL_SECONDS,
+            "refresh": refresh_coordinator.status(self.REFRESH_KEY)
+        }
+
 event_service = EventService()
@@ -1,18 +1,48 @@
-import requests
+import hashlib
 import os
-import json
 from hubspot import HubSpot
+from hubspot.crm.contacts import Filter, FilterGroup, PublicObjectSearchRequest
 import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from concurrent.futures import Future
+from functools import partial
 from app.core.config import settings
+from app.core.database import SessionLocal, write_guard
+from app.core.pagination import cursor_condition, keyset_order, make_cursor
+from app.core.upsert import bulk_upsert
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.models.contact import Contact
+from app.models.sync_state import SyncState
+from app.services.refresh_coordinator import RefreshCoordinator
 import re
 
+# One dedicated worker: at most one HubSpot sync runs at a time, with a cooldown between runs
+hubspot_sync_scheduler = RefreshCoordinator(
+    max_workers=1,
+    min_interval=settings.HUBSPOT_SYNC_COOLDOWN_SECONDS,
+    name="hubspot-sync"
+)
+
 class HubSpotService:
+    SYNC_KEY = "hubspot_contacts"
+    # CRM search API will not page past this many results for one query
+    SEARCH_RESULT_LIMIT = 10000
+    # Contacts buffered per upsert + commit during a sync
+    INGEST_BATCH_SIZE = 500
+    # Fields that make up a contact's content hash
+    HASHED_FIELDS = ("first_name", "last_name", "email", "phone", "company", "job_title")
+    # Allowed list orderings; each has a (column, id) index for keyset seeks
+    SORT_COLUMNS = {"id": None, "email": Contact.email, "updated_at": Contact.updated_at}
+
     def __init__(self):
         # NOTE: In production, store this in .env. Hardcoded for prototype as requested.
         self.access_token = os.getenv("HUBSPOT_ACCESS_TOKEN", "your_token_here")
         self.client = HubSpot(access_token=self.access_token)
+        # Cached COUNT(*) of contacts; maintained by the ingest, None means recount
+        self._total_count: Optional[int] = None
 
     def clean_phone(self, phone: str) -> str:
         if not phone:
@@ -21,16 +51,125 @@ class HubSpotService:
         return re.sub(r'\D', '', phone)
 
 
-    def sync_contacts_background(self, db: Session):
+    def _get_sync_state(self, db: Session) -> SyncState:
+        state = db.get(SyncState, self.SYNC_KEY)
+        if state is None:
+            state = SyncState(key=self.SYNC_KEY)
+            db.add(state)
+        return state
+
+    def _modified_at(self, contact) -> Optional[datetime]:
+        # updated_at is HubSpot's hs_lastmodifieddate
+        if contact.updated_at is None:
+            return None
+        return contact.updated_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def _normalize_contact(self, contact) -> Dict:
+        """Map a HubSpot contact to a contacts row, with a hash of its synced fields"""
+        props = contact.properties
+        row = {
+            "id": contact.id,
+            "first_name": props.get("firstname") or "",
+            "last_name": props.get("lastname") or "",
+            "email": props.get("email") or "",
+            "phone": self.clean_phone(props.get("phone")),
+            "company": props.get("company") or "",
+            "job_title": props.get("jobtitle") or ""
+        }
+        row["content_hash"] = hashlib.sha1(
+            "\x1f".join(row[f] for f in self.HASHED_FIELDS).encode("utf-8")
+        ).hexdigest()
+        return row
+
+    def _ingest_batch(
+        self,
+        db: Session,
+        rows: List[Dict],
+        modified: Dict[str, Optional[datetime]],
+        failed_at: List[datetime]
+    ) -> int:
+        """
+        Bulk-upsert one batch of normalized contacts and commit it.
+        Rows whose content hash matches what is stored are skipped. Returns rows written;
+        the hs_lastmodifieddate (from `modified`, by contact id) of each row that could
+        not be written is appended to `failed_at` so the watermark can stop short of it.
+        """
+        if not rows:
+            return 0
+        # Last copy wins if a contact shows up twice in one batch
+        by_id = {r["id"]: r for r in rows}
+        stored = dict(
+            db.query(Contact.id, Contact.content_hash)
+            .filter(Contact.id.in_(list(by_id)))
+            .all()
+        )
+        now = datetime.now(timezone.utc)
+        changed = []
+        for contact_id, row in by_id.items():
+            if stored.get(contact_id) != row["content_hash"]:
+                # Core upserts bypass the ORM onupdate hook, so stamp it here
+                changed.append({**row, "updated_at": now})
+        failed = []
+        written = bulk_upsert(db, Contact, changed, batch_size=self.INGEST_BATCH_SIZE, failed=failed)
+        if failed:
+            failed_at.extend(modified[r["id"]] for r in failed if modified.get(r["id"]) is not None)
+            print(f"{len(failed)} HubSpot contacts failed to save; they will be fetched again next sync")
+
+        # Keep the cached total in step without re-counting the table
+        inserted = sum(1 for r in changed if r["id"] not in stored)
+        if written == len(changed):
+            if self._total_count is not None:
+                self._total_count += inserted
+        elif inserted:
+            self.invalidate_count()
+        return written
+
+    def _advance_watermark(
+        self,
+        db: Session,
+        newest: Optional[datetime],
+        full: bool = False,
+        failed_at: Optional[List[datetime]] = None
+    ):
+        """
+        Move the watermark up to `newest`, but never past the oldest contact that failed
+        to save this run (pulling it back if need be), so the next incremental sync refetches it
         """
-        Background task to fetch all contacts from HubSpot and update local DB.
-        Runs silently.
+        state = self._get_sync_state(db)
+        if newest is not None and (state.watermark is None or newest > state.watermark):
+            state.watermark = newest
+        if failed_at and state.watermark is not None:
+            state.watermark = min(state.watermark, min(failed_at))
+        if full:
+            state.last_full_sync_at = datetime.utcnow()
+
+    def _commit_watermark(
+        self,
+        db: Session,
+        newest: Optional[datetime],
+        full: bool = False,
+        failed_at: Optional[List[datetime]] = None
+    ):
+        with write_guard(db.get_bind()):
+            self._advance_watermark(db, newest, full=full, failed_at=failed_at)
+            db.commit()
+
+    def sync_contacts_full(self, db: Session) -> int:
+        """
+        Fetch all contacts from HubSpot and update local DB.
+        Also resets the incremental watermark to the newest contact seen.
+        Streams pages into batched upserts; returns the number of contacts changed.
         """
         properties = ["firstname", "lastname", "email", "phone", "company", "jobtitle"]
-        all_contacts = []
         after = None
+        buffer = []
+        modified_by_id = {}
+        failed_at = []  # hs_lastmodifieddate of contacts that failed to save this run
+        fetched = 0
+        changed = 0
+        newest = None
         
-        print("Starting HubSpot Background Sync...")
+        print("Starting HubSpot Full Sync...")
         try:
             while True:
                 # Rate limit protection: HubSpot Public API tier ~10 req/sec, but let's be safe
@@ -42,57 +181,255 @@ class HubSpotService:
                     properties=properties,
                     archived=False
                 )
-                all_contacts.extend(api_response.results)
+                for contact in api_response.results:
+                    buffer.append(self._normalize_contact(contact))
+                    modified = self._modified_at(contact)
+                    modified_by_id[contact.id] = modified
+                    if modified is not None and (newest is None or modified > newest):
+                        newest = modified
+                fetched += len(api_response.results)
+
+                # Write as we go so memory is bounded by the batch, not the CRM
+                if len(buffer) >= self.INGEST_BATCH_SIZE:
+                    changed += self._ingest_batch(db, buffer, modified_by_id, failed_at)
+                    buffer = []
+                    modified_by_id = {}
                 
                 if not api_response.paging:
                     break
                 after = api_response.paging.next.after
+
+            changed += self._ingest_batch(db, buffer, modified_by_id, failed_at)
+            # Pages arrive in ID order, so the watermark can only move once everything is in
+            self._commit_watermark(db, newest, full=True, failed_at=failed_at)
+            print(f"HubSpot Full Sync Complete ({fetched} fetched, {changed} changed).")
+            return changed
             
-            print(f"Fetched {len(all_contacts)} contacts. Saving to DB...")
+        except Exception as e:
+            print(f"Error syncing HubSpot contacts: {e}")
+            db.rollback()
+            raise
 
-            for contact in all_contacts:
-                props = contact.properties
-                phone_raw = props.get("phone")
-                
-                db_contact = Contact(
-                    id=contact.id,
-                    first_name=props.get("firstname") or "",
-                    last_name=props.get("lastname") or "",
-                    email=props.get("email") or "",
-                    phone=self.clean_phone(phone_raw),
-                    company=props.get("company") or "",
-                    job_title=props.get("jobtitle") or ""
+    def sync_contacts_incremental(self, db: Session) -> int:
+        """
+        Fetch only contacts modified since the stored hs_lastmodifieddate watermark
+        via the CRM search API. Falls back to a full sync when no watermark exists yet.
+        """
+        state = db.get(SyncState, self.SYNC_KEY)
+        if state is None or state.watermark is None:
+            print("No HubSpot sync watermark yet, running full sync")
+            return self.sync_contacts_full(db)
+
+        properties = ["firstname", "lastname", "email", "phone", "company", "jobtitle"]
+        # Look back a little: the search index can lag behind recent edits
+        since = state.watermark - timedelta(seconds=settings.HUBSPOT_SYNC_OVERLAP_SECONDS)
+        after = None
+        buffer = []
+        modified_by_id = {}
+        failed_at = []  # hs_lastmodifieddate of contacts that failed to save this run
+        fetched = 0
+        changed = 0
+        newest = None
+
+        print(f"Starting HubSpot Incremental Sync (modified since {since.isoformat()})...")
+        try:
+            while True:
+                time.sleep(0.5)
+
+                search_request = PublicObjectSearchRequest(
+                    filter_groups=[FilterGroup(filters=[Filter(
+                        property_name="hs_lastmodifieddate",
+                        operator="GTE",
+                        value=str(int(since.replace(tzinfo=timezone.utc).timestamp() * 1000))
+                    )])],
+                    sorts=[{"propertyName": "hs_lastmodifieddate", "direction": "ASCENDING"}],
+                    properties=properties,
+                    limit=100,
+                    after=after
                 )
-                db.merge(db_contact)
-            
-            db.commit()
-            print("HubSpot Background Sync Complete.")
-            
+                api_response = self.client.crm.contacts.search_api.do_search(
+                    public_object_search_request=search_request
+                )
+
+                for contact in api_response.results:
+                    buffer.append(self._normalize_contact(contact))
+                    modified = self._modified_at(contact)
+                    modified_by_id[contact.id] = modified
+                    if modified is not None and (newest is None or modified > newest):
+                        newest = modified
+                fetched += len(api_response.results)
+
+                # Results are sorted by modification time, so the watermark can
+                # advance with every committed batch and an interrupted sync resumes
+                if len(buffer) >= self.INGEST_BATCH_SIZE:
+                    changed += self._ingest_batch(db, buffer, modified_by_id, failed_at)
+                    buffer = []
+                    modified_by_id = {}
+                    self._commit_watermark(db, newest, failed_at=failed_at)
+
+                if not api_response.paging:
+                    break
+                after = int(api_response.paging.next.after)
+
+                # Search results stop at 10k per query, so re-anchor on the newest timestamp
+                if after >= self.SEARCH_RESULT_LIMIT:
+                    if newest is None or newest <= since:
+                        print("Too many contacts share one modification time, stopping at search limit")
+                        break
+                    since = newest
+                    after = None
+
+            changed += self._ingest_batch(db, buffer, modified_by_id, failed_at)
+            self._commit_watermark(db, newest, failed_at=failed_at)
+            print(f"HubSpot Incremental Sync Complete ({fetched} fetched, {changed} changed).")
+            return changed
+
         except Exception as e:
             print(f"Error syncing HubSpot contacts: {e}")
             db.rollback()
+            raise
+
+    def sync_contacts_background(self, db: Session) -> int:
+        """
+        Bring the local DB up to date with HubSpot using the caller's session.
+        Incremental when possible; use sync_contacts_full to force a resync.
+        """
+        return self.sync_contacts_incremental(db)
 
+    def _run_scheduled_sync(self, full: bool = False) -> Dict:
+        """Scheduler job - always runs on its own session, never a request's"""
+        with SessionLocal() as db:
+            if full:
+                changed = self.sync_contacts_full(db)
+            else:
+                changed = self.sync_contacts_incremental(db)
+        return {"mode": "full" if full else "incremental", "rows_changed": changed}
 
-    def get_contacts_paginated(self, db: Session, skip: int = 0, limit: int = 100):
+    def schedule_sync(self, full: bool = False) -> Optional[Future]:
         """
-        Return contacts from local DB with pagination.
+        Start a sync on the dedicated HubSpot worker. Triggers inside the cooldown are
+        ignored (None); a trigger during a running sync returns that sync's Future.
+        An explicit full sync skips the cooldown but never overlaps a running sync.
         """
-        total = db.query(Contact).count()
-        contacts = db.query(Contact).offset(skip).limit(limit).all()
-        
+        return hubspot_sync_scheduler.trigger(
+            self.SYNC_KEY,
+            partial(self._run_scheduled_sync, full),
+            force=full
+        )
+
+    def get_sync_status(self, db: Session) -> Dict:
+        status = hubspot_sync_scheduler.status(self.SYNC_KEY)
+        state = db.get(SyncState, self.SYNC_KEY)
+        status["watermark"] = state.watermark.isoformat() if state and state.watermark else None
+        status["last_full_sync_at"] = (
+            state.last_full_sync_at.isoformat() if state and state.last_full_sync_at else None
+        )
+        status["cooldown_seconds"] = hubspot_sync_scheduler.min_interval
+        return status
+
+
+    def _serialize_contact(self, c: Contact) -> Dict:
+        return {
+            "id": c.id,
+            "firstName": c.first_name,
+            "lastName": c.last_name,
+            "email": c.email,
+            "phone": c.phone,
+            "company": c.company,
+            "jobTitle": c.job_title,
+            "hubspotUrl": f"https://app.hubspot.com/contacts/{settings.HUBSPOT_ACCOUNT_ID}/contact/{c.id}"
+        }
+
+    def count_contacts(self, db: Session) -> int:
+        """Total contacts, counted once and then kept current by the sync"""
+        total = self._total_count
+        if total is None:
+            total = db.query(func.count(Contact.id)).scalar() or 0
+            self._total_count = total
+        return total
+
+    async def count_contacts_async(self, db: AsyncSession) -> int:
+        total = self._total_count
+        if total is None:
+            total = (await db.execute(select(func.count(Contact.id)))).scalar() or 0
+            self._total_count = total
+        return total
+
+    def invalidate_count(self):
+        self._total_count = None
+
+    def contacts_page_statement(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+        skip: int = 0
+    ):
+        """
+        SELECT for one page of contacts ordered by (sort, id). With a cursor it seeks
+        straight to the next row via the composite index; fetches limit + 1 to detect more.
+        Raises ValueError for an unknown sort or a bad cursor, including one issued for
+        a different sort or order.
+        """
+        if sort not in self.SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort '{sort}'")
+        sort_column = self.SORT_COLUMNS[sort]
+
+        stmt = select(Contact).order_by(*keyset_order(sort_column, Contact.id, descending))
+        if cursor:
+            order = "desc" if descending else "asc"
+            stmt = stmt.where(cursor_condition(cursor, sort, order, sort_column, Contact.id))
+        elif skip:
+            stmt = stmt.offset(skip)
+        return stmt.limit(limit + 1)
+
+    def build_contacts_page(self, contacts: List[Contact], limit: int, sort: str, descending: bool, total: int) -> Dict:
+        has_more = len(contacts) > limit
+        contacts = contacts[:limit]
+        next_cursor = None
+        if has_more and contacts:
+            next_cursor = make_cursor(sort, "desc" if descending else "asc", self.SORT_COLUMNS[sort], contacts[-1])
         return {
-            "items": [
-                {
-                    "id": c.id,
-                    "firstName": c.first_name,
-                    "lastName": c.last_name,
-                    "email": c.email,
-                    "phone": c.phone,
-                    "company": c.company,
-                    "jobTitle": c.job_title,
-                    "hubspotUrl": f"https://app.hubspot.com/contacts/{settings.HUBSPOT_ACCOUNT_ID}/contact/{c.id}"
-                }
-                for c in contacts
-            ],
-            "total": total
+            "items": [self._serialize_contact(c) for c in contacts],
+            "total": total,
+            "nextCursor": next_cursor,
+            "hasMore": has_more
         }
+
+    def get_contacts_page(
+        self,
+        db: Session,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+        skip: int = 0
+    ) -> Dict:
+        """
+        Return one page of contacts from the local DB. Pass the previous page's
+        nextCursor to continue; `skip` is only honoured for legacy page-number callers.
+        """
+        stmt = self.contacts_page_statement(limit, cursor, sort, descending, skip)
+        contacts = db.execute(stmt).scalars().all()
+        return self.build_contacts_page(contacts, limit, sort, descending, self.count_contacts(db))
+
+    async def get_contacts_page_async(
+        self,
+        db: AsyncSession,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        sort: str = "id",
+        descending: bool = False,
+        skip: int = 0
+    ) -> Dict:
+        """get_contacts_page() on an AsyncSession, for the async contacts route"""
+        stmt = self.contacts_page_statement(limit, cursor, sort, descending, skip)
+        contacts = (await db.execute(stmt)).scalars().all()
+        return self.build_contacts_page(contacts, limit, sort, descending, await self.count_contacts_async(db))
+
+    def get_contacts_paginated(self, db: Session, skip: int = 0, limit: int = 100):
+        """
+        Return contacts from local DB with pagination.
+        """
+        return self.get_contacts_page(db, limit=limit, skip=skip)
@@ -1,25 +1,65 @@
 import json
 import os
+import threading
 import requests
-from typing import List, Dict, Optional
-from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+from typing import Iterator, List, Dict, Optional, Tuple
+from datetime import date, datetime, timedelta
 import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
+from sqlalchemy import bindparam
 from sqlalchemy.orm import Session
 from app.core.config import settings, BASE_DIR
+from app.core.database import SessionLocal, write_guard
+from app.core.http_client import http_client
+from app.core.upsert import bulk_upsert
 from app.schemas.campaign import Campaign, CampaignList
 from app.models.campaign import CampaignModel
+from app.services.campaign_classifier import classify
+from app.services.campaign_rules import campaign_rules
+from app.services.campaign_snapshot import CampaignSnapshot
+from app.services.country_insights import country_insights
+from app.services.daily_insights import daily_insights
+from app.services.refresh_coordinator import refresh_coordinator
+from app.services.stats_cube import stats_cube
+
+
+class CampaignPagingError(Exception):
+    """A campaigns page failed mid-listing, so the campaigns seen so far are not the full set"""
+
+    def __init__(self, pages_fetched: int):
+        super().__init__(f"Campaign listing stopped after {pages_fetched} page(s): page {pages_fetched + 1} failed")
+        self.pages_fetched = pages_fetched
+
 
 class MetaService:
+    # Graph API accepts at most 50 sub-requests per batch call
+    GRAPH_BATCH_LIMIT = 50
+    # Rows per INSERT ... ON CONFLICT transaction when saving campaigns
+    UPSERT_BATCH_SIZE = 500
+    REFRESH_KEY = "meta_campaigns"
+    # Concurrent batch POSTs while fetching insights
+    INSIGHTS_WORKERS = 10
+
     def __init__(self):
         self.access_token = settings.META_ACCESS_TOKEN.strip().strip('"').strip("'")
         self.ad_account_id = settings.AD_ACCOUNT_ID.strip().strip('"').strip("'")
         self.api_version = "v19.0"
         self.base_url = "https://graph.facebook.com"
+        # Ceiling for the Graph limiter; it slows down further as usage headers climb
+        http_client.configure_host(
+            urlsplit(self.base_url).hostname,
+            rate=settings.META_MAX_REQUESTS_PER_SECOND,
+            pool_size=self.INSIGHTS_WORKERS * 2
+        )
         
         # Absolute path for JSON backup
         self.cache_file = os.path.join(BASE_DIR, "cached_campaigns.json")
 
+        # In-memory CampaignList, swapped whole after each refresh
+        self._snapshot: Optional[CampaignSnapshot] = None
+        self._snapshot_lock = threading.Lock()
+
     def _save_cache_file(self, data: CampaignList):
         """Save clean campaign list to JSON file as backup"""
         try:
@@ -58,7 +98,7 @@ class MetaService:
         params["access_token"] = self.access_token
         
         try:
-            response = requests.get(url, params=params, timeout=10)
+            response = http_client.request("GET", url, params=params, timeout=10)
             
             # DEBUG LOGGING START
             print(f"[DEBUG] Meta API Request to {endpoint} Status: {response.status_code}")
@@ -102,348 +142,408 @@ class MetaService:
         except Exception as e:
             print(f"[ERROR] Could not fetch account name: {e}")
             return "Unknown"
-    def fetch_active_campaigns(self) -> List[Dict]:
-        """Fetch only ACTIVE campaigns with minimal fields for speed"""
+    def iter_campaign_pages(self, page_size: int = 500) -> Iterator[List[Dict]]:
+        """
+        Yield pages of campaigns as they arrive, following Graph paging cursors. Raises
+        CampaignPagingError if a page can't be fetched, rather than ending early.
+        """
         endpoint = f"{self.ad_account_id}/campaigns"
         fields = [
             "id", "name", "objective", "status", "effective_status",
             "daily_budget", "spend"
         ]
+        if settings.META_COUNTRY_INSIGHTS:
+            # Ad set geo targeting rides along with the page instead of one call per campaign
+            fields.append("adsets.limit(100){targeting{geo_locations}}")
         params = {
             "fields": ",".join(fields),
             # "effective_status": '["ACTIVE"]', # Removed to ensure we get all campaigns
-            "limit": 500 # Increased limit to capture history
+            "limit": page_size
         }
-        
+
+        pages_fetched = 0
+        while True:
+            # _make_request adds the token to params, so hand it a copy
+            data = self._make_request(endpoint, dict(params))
+            if not data:
+                raise CampaignPagingError(pages_fetched)
+            pages_fetched += 1
+
+            page = data.get("data", [])
+            if page:
+                yield page
+
+            paging = data.get("paging", {})
+            after = paging.get("cursors", {}).get("after")
+            # Graph only includes 'next' when there is another page to fetch
+            if not paging.get("next") or not after:
+                return
+            params["after"] = after
+
+    def fetch_active_campaigns(self) -> List[Dict]:
+        """Fetch all campaigns (every page) with minimal fields for speed"""
         campaigns = []
-        data = self._make_request(endpoint, params)
-        if data:
-            campaigns.extend(data.get("data", []))
+        for page in self.iter_campaign_pages():
+            campaigns.extend(page)
         
         return campaigns
 
-    def _clean_campaign_name(self, name: str) -> str:
-        """Remove common prefixes from campaign names"""
-        # List of prefixes to remove (in order of priority - most specific first)
-        prefixes_to_remove = [
-            "FAU - FAM - Brand Paid Social - ",
-            "FAU - FAP - Brand Paid Social - ",
-            "FAU - FAM - Paid Social Brand - ",
-            "FAU - FAP - Paid Social Brand - ",
-            "FAU - FAM - Paid Social Lead Gen - ",
-            "FAU - FAP - Paid Social Lead Gen - ",
-            "FAU - FAM - Paid Social - ",
-            "FAU - FAP - Paid Social - ",
-            "FAU - FAM - PG LIVE - ",
-            "FAU - FAP - PG LIVE - ",
-            "FAU - FAM - ",
-            "FAU - FAP - ",
-            "FAM - Brand Paid Social - ",
-            "FAP - Brand Paid Social - ",
-            "FAM - Paid Social Brand - ",
-            "FAP - Paid Social Brand - ",
-            "FAM - Paid Social - ",
-            "FAP - Paid Social - ",
-            "FAM - PG LIVE - ",
-            "FAP - PG LIVE - ",
-            "FAM - ",
-            "FAP - ",
-            "Brand Paid Social - FAM - ",
-            "Brand Paid Social - FAP - ",
-            "Brand Social - FAP - ",
-            "Brand Social - FAM - ",
-            "Paid Social Lead Gen - FAM - ",
-            "Paid Social Lead Gen - FAP - ",
-            "Paid Social Brand - FAM - ",
-            "Paid Social Brand - FAP - ",
-            "Paid Social - FAM - ",
-            "Paid Social - FAP - ",
-            "Paid Social Brand - ",
-            "Paid Social - ",
-            "PG LIVE - FAM - ",
-            "PG LIVE - FAP - ",
-            "PG LIVE - ",
-            "PG LIVE",
-            "LeadGen - FAM - ",
-            "LeadGen - FAP - ",
-            "LeadGen - ",
-            "Lead Gen - FAM - ",
-            "Lead Gen - FAP - ",
-            "Lead Gen - ",
-            "Brand Paid Social - ",
-            "Paid Social - ",
-            "Brand - ",
-        ]
-        
-        cleaned_name = name
-        for prefix in prefixes_to_remove:
-            if cleaned_name.startswith(prefix):
-                cleaned_name = cleaned_name[len(prefix):]
-                break
-        
-        # Also remove "PG LIVE" if it appears at the start (without dash)
-        if cleaned_name.startswith("PG LIVE"):
-            cleaned_name = cleaned_name[7:].strip()
-        
-        return cleaned_name
-    
-    def _extract_date(self, name: str) -> str:
-        """Extract date from campaign name (everything after the last dash)"""
-        import re
-        
-        # Find the last occurrence of " - " in the name
-        if " - " in name:
-            parts = name.split(" - ")
-            potential_date = parts[-1].strip()
-            
-            # Check if this looks like a date (contains month name and/or year)
-            # Pattern to match various date formats with 2 or 4 digit years
-            date_pattern = r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC|january|february|march|april|may|june|july|august|september|october|november|december).*\d{2,4}|\d{2,4}'
-            
-            if re.search(date_pattern, potential_date, re.IGNORECASE):
-                # Extract just the month(s) and year portion
-                # Pattern: Month or Month/Month followed by 2 or 4 digit year
-                clean_pattern = r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)(?:/(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec))?\s*(\d{2,4})'
-                match = re.search(clean_pattern, potential_date, re.IGNORECASE)
-                
-                if match:
-                    month1 = match.group(1).capitalize()
-                    month2 = match.group(2).capitalize() if match.group(2) else None
-                    year = match.group(3)
-                    
-                    # Ensure year is 2 digits
-                    if len(year) == 4:
-                        year = year[2:]  # Convert 2025 to 25
-                    
-                    # Format as "Month Year" or "Month/Month Year"
-                    if month2:
-                        return f"{month1}/{month2} {year}"
-                    else:
-                        return f"{month1} {year}"
-        
-        return None
-    
-    def _remove_date_from_name(self, name: str) -> str:
-        """Remove date from campaign name (everything after the last dash if it's a date)"""
-        import re
-        
-        clean_name = name
-        parts = name.split(" - ")
-        
-        # Pattern to match various date formats with 2 or 4 digit years
-        date_pattern = r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec|JAN|FEB|MAR|APR|MAY|JUN|JUL|AUG|SEP|OCT|NOV|DEC|january|february|march|april|may|june|july|august|september|october|november|december).*\d{2,4}|\d{2,4}'
-        
-        # 1. Try to strip date from end if present
-        if len(parts) > 1:
-            potential_date = parts[-1].strip()
-            if re.search(date_pattern, potential_date, re.IGNORECASE):
-                clean_name = " - ".join(parts[:-1]).strip()
-        
-        # 2. Remove generic branding terms (GLOBAL FIX)
-        # Verify we catch "Brand Paid Social" specifically first to avoid partial matches leaving junk
-        clean_name = re.sub(r'brand\s+paid\s+social', '', clean_name, flags=re.IGNORECASE)
-        clean_name = re.sub(r'paid\s+social', '', clean_name, flags=re.IGNORECASE)
-        clean_name = re.sub(r'brand', '', clean_name, flags=re.IGNORECASE)
-
-        # 3. Clean up leading/trailing separators or double separators
-        # e.g. " - Campaign Name" or "Name - - part"
-        clean_name = re.sub(r'^\s*[-|]\s*', '', clean_name) # Leading separator
-        clean_name = re.sub(r'\s*[-|]\s*$', '', clean_name) # Trailing separator
-        clean_name = re.sub(r'\s*[-|]\s*[-|]\s*', ' - ', clean_name) # Double separator
-
-        return clean_name.strip()
-    
-    def _detect_brand(self, name: str, campaign_type: str = None) -> str:
-        """Detect if campaign is for FAM, FAP, or FAU based on name"""
-        name_upper = name.upper()
-        
-        # For Event campaigns, don't use FAU detection - they should show individual FAM or FAP
-        # Only apply FAU detection for Brand and LeadGen campaigns
-        if campaign_type != "Event":
-            # Check for explicit dual brand indicators first (return FAU for FindAUniversity)
-            if "FAM/FAP" in name_upper or "FAP/FAM" in name_upper:
-                return "FAU"
-        
-        # Check for individual brand indicators
-        has_fam = " FAM " in name_upper or name_upper.startswith("FAM ") or name_upper.endswith(" FAM") or "FAM -" in name_upper or "- FAM" in name_upper
-        has_fap = " FAP " in name_upper or name_upper.startswith("FAP ") or name_upper.endswith(" FAP") or "FAP -" in name_upper or "- FAP" in name_upper
-        
-        # For non-Event campaigns, if both FAM and FAP are present, return FAU
-        if campaign_type != "Event" and has_fam and has_fap:
-            return "FAU"
-        elif has_fam:
-            return "FAM"
-        elif has_fap:
-            return "FAP"
-        elif has_fap:
-            return "FAP"
-        # Default to FAU if no specific brand detected (per user request)
-        return "FAU"
-    
+    def _make_batch_request(self, sub_requests: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Send up to 50 GET sub-requests to the Graph API in a single batch POST.
+        Returns one parsed body per sub-request, or None where that sub-request failed.
+        """
+        url = f"{self.base_url}/{self.api_version}/"
+        payload = {
+            "access_token": self.access_token,
+            "batch": json.dumps(sub_requests),
+            "include_headers": "false"
+        }
+
+        try:
+            response = http_client.request("POST", url, data=payload, timeout=30)
+            print(f"[DEBUG] Meta API Batch Request ({len(sub_requests)} items) Status: {response.status_code}")
+            response.raise_for_status()
+            results = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Error sending batch request: {e}")
+            return [None] * len(sub_requests)
+
+        if not isinstance(results, list):
+            print(f"[DEBUG] Unexpected batch response: {results}")
+            return [None] * len(sub_requests)
+
+        parsed = []
+        for i in range(len(sub_requests)):
+            # Meta returns null for sub-requests that timed out on their side
+            item = results[i] if i < len(results) else None
+            if not item or item.get("code") != 200:
+                parsed.append(None)
+                continue
+            try:
+                parsed.append(json.loads(item.get("body") or "{}"))
+            except ValueError:
+                parsed.append(None)
+        return parsed
+
+    def _fetch_single_insights(self, campaign_id: str) -> Dict:
+        """Fetch all-time insights for one campaign (fallback for failed batch items)"""
+        insights_endpoint = f"{campaign_id}/insights"
+        insights_params = {
+            "fields": "spend,impressions",
+            "date_preset": "maximum"  # Use maximum for all-time data
+        }
+        insights_data = self._make_request(insights_endpoint, insights_params)
+
+        if insights_data and "data" in insights_data and len(insights_data["data"]) > 0:
+            return insights_data["data"][0]
+        return {"spend": "0", "impressions": "0"}
+
     def _fetch_batch_insights(self, batch_ids: List[str]) -> Dict[str, Dict]:
-        """Helper to fetch a single batch of insights"""
+        """Helper to fetch a single batch of insights (one Graph batch POST)"""
         insights_map = {}
-        for campaign_id in batch_ids:
-            insights_endpoint = f"{campaign_id}/insights"
-            insights_params = {
-                "fields": "spend,impressions",
-                "date_preset": "maximum"  # Use maximum for all-time data
-            }
-            insights_data = self._make_request(insights_endpoint, insights_params)
-            
-            if insights_data and "data" in insights_data and len(insights_data["data"]) > 0:
-                insights_map[campaign_id] = insights_data["data"][0]
+        query = urlencode({"fields": "spend,impressions", "date_preset": "maximum"})
+        sub_requests = [
+            {"method": "GET", "relative_url": f"{campaign_id}/insights?{query}"}
+            for campaign_id in batch_ids
+        ]
+
+        failed_ids = []
+        for campaign_id, body in zip(batch_ids, self._make_batch_request(sub_requests)):
+            if body is None:
+                failed_ids.append(campaign_id)
+            elif body.get("data"):
+                insights_map[campaign_id] = body["data"][0]
             else:
                 insights_map[campaign_id] = {"spend": "0", "impressions": "0"}
+
+        # Only the sub-requests that failed go back through the per-ID path
+        if failed_ids:
+            print(f"[DEBUG] Batch had {len(failed_ids)} failed items, retrying individually")
+            for campaign_id in failed_ids:
+                insights_map[campaign_id] = self._fetch_single_insights(campaign_id)
         return insights_map
 
-    def fetch_campaign_insights_batch(self, campaign_ids: List[str]) -> Dict[str, Dict]:
-        """Fetch insights for multiple campaigns using parallel requests"""
-        insights_map = {}
-        batch_size = 50 # Meta API limit is 50, but we process per ID inside the loop, so this is just chunking for threads
-        # Actually our helper processes one by one, so we can just chunk the IDs
-        
-        # Split campaign_ids into chunks
-        chunks = [campaign_ids[i:i + batch_size] for i in range(0, len(campaign_ids), batch_size)]
+    def _fetch_in_parallel(self, fetch_chunk, ids: List[str], chunk_size: int) -> Dict[str, object]:
+        """Run fetch_chunk over chunks of ids on the insights pool and merge the resulting maps"""
+        results = {}
+        # Split ids into chunks; each chunk becomes one batch POST
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
         
         print(f"Starting parallel fetch with {len(chunks)} chunks...")
         start_time = datetime.now()
         
-        with ThreadPoolExecutor(max_workers=10) as executor:
+        with ThreadPoolExecutor(max_workers=self.INSIGHTS_WORKERS) as executor:
             # Submit all chunks to the thread pool
-            future_to_chunk = {executor.submit(self._fetch_batch_insights, chunk): chunk for chunk in chunks}
+            future_to_chunk = {executor.submit(fetch_chunk, chunk): chunk for chunk in chunks}
             
             for future in concurrent.futures.as_completed(future_to_chunk):
                 try:
                     data = future.result()
-                    insights_map.update(data)
+                    results.update(data)
                 except Exception as exc:
                     print(f"Chunk fetch generated an exception: {exc}")
                     
         print(f"Parallel fetch completed in {(datetime.now() - start_time).total_seconds():.2f}s")
+        return results
+
+    def fetch_campaign_insights_batch(self, campaign_ids: List[str]) -> Dict[str, Dict]:
+        """Fetch insights for multiple campaigns using parallel Graph batch requests"""
+        return self._fetch_in_parallel(self._fetch_batch_insights, campaign_ids, self.GRAPH_BATCH_LIMIT)
+
+    def _fetch_batch_country_insights(self, batch_ids: List[str]) -> Dict[str, Tuple[List[Dict], List[Dict]]]:
+        """
+        Lifetime and last-7-day insights broken down by country, two sub-requests per campaign
+        in one batch POST. Campaigns with a failed sub-request are left out so their stored
+        rows are kept rather than wiped.
+        """
+        fields = "spend,impressions,reach,inline_link_clicks,actions"
+        lifetime_query = urlencode({"fields": fields, "breakdowns": "country", "date_preset": "maximum", "limit": 500})
+        recent_query = urlencode({"fields": "spend,impressions", "breakdowns": "country", "date_preset": "last_7d", "limit": 500})
+        sub_requests = []
+        for campaign_id in batch_ids:
+            sub_requests.append({"method": "GET", "relative_url": f"{campaign_id}/insights?{lifetime_query}"})
+            sub_requests.append({"method": "GET", "relative_url": f"{campaign_id}/insights?{recent_query}"})
+
+        bodies = self._make_batch_request(sub_requests)
+        breakdowns = {}
+        for i, campaign_id in enumerate(batch_ids):
+            lifetime, recent = bodies[2 * i], bodies[2 * i + 1]
+            if lifetime is None or recent is None:
+                continue
+            breakdowns[campaign_id] = (lifetime.get("data", []), recent.get("data", []))
+        return breakdowns
+
+    def fetch_country_insights_batch(self, campaign_ids: List[str]) -> Dict[str, Tuple[List[Dict], List[Dict]]]:
+        """Per-country breakdowns for many campaigns, in parallel batch POSTs"""
+        return self._fetch_in_parallel(
+            self._fetch_batch_country_insights, campaign_ids, self.GRAPH_BATCH_LIMIT // 2
+        )
+
+    def _daily_insights_params(self, since: Optional[date], until: date) -> Dict:
+        params = {"fields": "spend,impressions,reach,inline_link_clicks,actions", "time_increment": 1, "limit": 500}
+        if since is None:
+            params["date_preset"] = "maximum"
+        else:
+            params["time_range"] = json.dumps({"since": since.isoformat(), "until": until.isoformat()})
+        return params
+
+    def _fetch_batch_daily_insights(self, batch: List[Tuple[str, Optional[date]]]) -> Dict[str, List[Dict]]:
+        """
+        One row per day for each (campaign, since) in one batch POST; a campaign's first
+        fetch (since=None) covers its whole lifetime. Further pages are followed per campaign.
+        Campaigns whose fetch failed are left out.
+        """
+        until = datetime.utcnow().date()
+        sub_requests = [
+            {"method": "GET", "relative_url": f"{campaign_id}/insights?{urlencode(self._daily_insights_params(since, until))}"}
+            for campaign_id, since in batch
+        ]
+
+        days_map = {}
+        for (campaign_id, since), body in zip(batch, self._make_batch_request(sub_requests)):
+            if body is None:
+                continue
+            days = list(body.get("data", []))
+            while body and body.get("paging", {}).get("next"):
+                params = self._daily_insights_params(since, until)
+                params["after"] = body["paging"].get("cursors", {}).get("after")
+                body = self._make_request(f"{campaign_id}/insights", params)
+                if not body:
+                    days = None
+                    break
+                days.extend(body.get("data", []))
+            if days is not None:
+                days_map[campaign_id] = days
+        return days_map
+
+    def sync_daily_insights(self, db: Session, campaign_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch only the days each campaign is missing (plus a short trailing window), store
+        them, and return lifetime totals summed from the daily table in the insights shape.
+        """
+        windows = daily_insights.fetch_windows(db, campaign_ids)
+        days_map = self._fetch_in_parallel(
+            self._fetch_batch_daily_insights, list(windows.items()), self.GRAPH_BATCH_LIMIT
+        )
+
+        now = datetime.utcnow()
+        rows = []
+        for campaign_id, days in days_map.items():
+            rows.extend(daily_insights.build_rows(campaign_id, days, now))
+        daily_insights.store(db, rows, batch_size=self.UPSERT_BATCH_SIZE)
+        fetched_days = sum(len(days) for days in days_map.values())
+        print(f"Daily insights: {fetched_days} days fetched for {len(days_map)}/{len(campaign_ids)} campaigns")
+
+        insights_map = daily_insights.totals(db, campaign_ids)
+        # No history and the daily fetch failed: fall back to the lifetime total
+        for campaign_id in campaign_ids:
+            if campaign_id not in insights_map and campaign_id not in days_map and windows[campaign_id] is None:
+                insights_map[campaign_id] = self._fetch_single_insights(campaign_id)
         return insights_map
 
+    def _targeted_countries(self, rc: Dict) -> List[str]:
+        """Union of the countries in the campaign's ad set geo targeting"""
+        countries = set()
+        for adset in (rc.get("adsets") or {}).get("data", []):
+            geo = (adset.get("targeting") or {}).get("geo_locations") or {}
+            countries.update(geo.get("countries") or [])
+        return sorted(countries)
 
-    def update_campaigns_background(self, db: Session):
-        """Fetch fresh data from Meta and update DB (Intended for background thread)"""
-        print("Fetching live data from Meta...")
-        raw_campaigns = self.fetch_active_campaigns()
+    def _build_campaign(self, rc: Dict, insight: Dict) -> Campaign:
+        """Classify a raw Meta campaign and combine it with its insights"""
+        name = rc.get("name", "")
+        # Type, brand, date and display name all come from the ORIGINAL name
+        classification = classify(name)
+        
+        total_spend = 0.0
+        total_impressions = 0
         
+        try:
+            total_spend = float(insight.get("spend", 0))
+            total_impressions = int(insight.get("impressions", 0))
+        except (ValueError, TypeError) as e:
+            print(f"Error parsing insights for {name}: {e}")
+        
+        return Campaign(
+            id=rc["id"],
+            name=classification.display_name,
+            objective=rc.get("objective"),
+            status=rc["status"],
+            effective_status=rc["effective_status"],
+            daily_budget=float(rc.get("daily_budget", 0))/100 if rc.get("daily_budget") else 0,
+            targeted_countries=[],
+            countries=[],
+            total_spend=round(total_spend, 2),
+            total_impressions=total_impressions,
+            country_count=0,
+            campaign_type=classification.campaign_type,  # Add campaign type for frontend filtering
+            brand=classification.brand,  # Add brand (FAM/FAP/Both)
+            platform="Meta", # Default to Meta
+            campaign_date=classification.campaign_date  # Add extracted date
+        )
+
+    def _campaign_row(self, campaign_obj: Campaign, raw_name: str) -> Dict:
+        """Map a Campaign to a CampaignModel row for bulk upsert"""
+        return {
+            "id": campaign_obj.id,
+            "name": campaign_obj.name,
+            "raw_name": raw_name,
+            "status": campaign_obj.status,
+            "effective_status": campaign_obj.effective_status,
+            "objective": campaign_obj.objective,
+            "daily_budget": campaign_obj.daily_budget,
+            "total_spend": campaign_obj.total_spend,
+            "total_impressions": campaign_obj.total_impressions,
+            "campaign_type": campaign_obj.campaign_type,
+            "brand": campaign_obj.brand,
+            "platform": campaign_obj.platform,
+            "campaign_date": campaign_obj.campaign_date,
+            "country_count": campaign_obj.country_count,
+            "countries": [c.model_dump() for c in campaign_obj.countries],
+            "targeted_countries": campaign_obj.targeted_countries,
+            "updated_at": datetime.utcnow()
+        }
+
+    def _process_campaign_page(self, db: Session, raw_campaigns: List[Dict]) -> List[Campaign]:
+        """Fetch insights for one page of campaigns, classify and persist them"""
+        campaign_ids = [rc["id"] for rc in raw_campaigns]
+        print(f"Fetching insights for {len(campaign_ids)} campaigns...")
+        if settings.META_DAILY_INSIGHTS:
+            insights_map = self.sync_daily_insights(db, campaign_ids)
+        else:
+            insights_map = self.fetch_campaign_insights_batch(campaign_ids)
+        country_map = self.fetch_country_insights_batch(campaign_ids) if settings.META_COUNTRY_INSIGHTS else {}
+
+        campaigns = []
+        country_rows = []
+        ingested_at = datetime.utcnow()
+        for rc in raw_campaigns:
+            # Removed status check to ensure we get ALL campaigns (paused, archived, etc.)
+            # if rc.get("effective_status") != "ACTIVE":
+            #     continue
+
+            campaign_obj = self._build_campaign(rc, insights_map.get(rc["id"], {}))
+            if settings.META_COUNTRY_INSIGHTS:
+                campaign_obj.targeted_countries = self._targeted_countries(rc)
+            if rc["id"] in country_map:
+                lifetime, recent = country_map[rc["id"]]
+                rows = country_insights.build_rows(rc["id"], lifetime, recent, campaign_obj.targeted_countries, ingested_at)
+                campaign_obj.country_count = sum(1 for r in rows if r["impressions"] > 0)
+                country_rows.extend(rows)
+            campaigns.append(campaign_obj)
+
+        # One ON CONFLICT upsert per batch instead of merge+commit per row
+        rows = [self._campaign_row(c, rc.get("name", "")) for c, rc in zip(campaigns, raw_campaigns)]
+        saved = bulk_upsert(db, CampaignModel, rows, batch_size=self.UPSERT_BATCH_SIZE)
+        if saved < len(rows):
+            print(f"Saved {saved}/{len(rows)} campaigns from this page")
+        if country_map:
+            country_insights.store(db, list(country_map), country_rows, batch_size=self.UPSERT_BATCH_SIZE)
+        return campaigns
+
+    def update_campaigns_background(self, db: Session):
+        """
+        Fetch fresh data from Meta and update DB (Intended for background thread).
+        Raises CampaignPagingError after saving what it got if the listing broke off,
+        so the refresh is recorded as failed rather than complete.
+        """
         if not self.access_token:
             print("No Meta access token found")
             return # Assuming _get_empty_structure() is not needed here as it's a background update
         
         # Verify Account Name (Log it clearly)
         self.get_account_name()
+
+        # Pick up rule edits made by other workers since the last refresh
+        campaign_rules.reload_if_changed(db)
             
-        print("Fetching live data from Meta...") # This line is redundant after the first print
-        
-        if not raw_campaigns:
-            print("No campaigns found")
-            return
-        
-        # Fetch insights for ALL fetched campaigns
-        campaign_ids = [rc["id"] for rc in raw_campaigns]
-        print(f"Fetching insights for {len(campaign_ids)} campaigns...")
-        insights_map = self.fetch_campaign_insights_batch(campaign_ids)
+        print("Fetching live data from Meta...")
         
-        # Prepare for DB bulk update/insert
+        # Lists for the JSON cache file
         brand_campaigns_list = []
         lead_campaigns_list = []
+        page_count = 0
+        truncated: Optional[CampaignPagingError] = None
 
-        for rc in raw_campaigns:
-            # Removed status check to ensure we get ALL campaigns (paused, archived, etc.)
-            # if rc.get("effective_status") != "ACTIVE":
-            #     continue
+        # Process each page as soon as it lands while the next page is fetched in the background
+        pages = self.iter_campaign_pages()
+        with ThreadPoolExecutor(max_workers=1) as prefetcher:
+            next_page = prefetcher.submit(next, pages, None)
+            while True:
+                try:
+                    raw_campaigns = next_page.result()
+                except CampaignPagingError as e:
+                    truncated = e
+                    break
+                if raw_campaigns is None:
+                    break
+                next_page = prefetcher.submit(next, pages, None)
+                page_count += 1
 
-            
-            name = rc.get("name", "")
-            name_lower = name.lower()
-            
-            # Determine campaign type based on ORIGINAL name (before cleaning)
-            c_type = "Brand"  # default
-            
-            if "pg live" in name_lower or "pglive" in name_lower:
-                c_type = "Event"
-            elif "lead" in name_lower or "leadgen" in name_lower:
-                c_type = "LeadGen"
-            elif "paid social brand" in name_lower or "brand" in name_lower:
-                c_type = "Brand"
-            
-            # Get insights from batch results
-            insight = insights_map.get(rc["id"], {})
-            
-            total_spend = 0.0
-            total_impressions = 0
-            
-            try:
-                total_spend = float(insight.get("spend", 0))
-                total_impressions = int(insight.get("impressions", 0))
-            except (ValueError, TypeError) as e:
-                print(f"Error parsing insights for {name}: {e}")
-            
-            # Extract date from original name before cleaning
-            campaign_date = self._extract_date(name)
-            
-            # Clean the campaign name for display
-            display_name = self._clean_campaign_name(name)
-            
-            # Remove date from display name
-            display_name = self._remove_date_from_name(display_name)
-            
-            # Detect brand (FAM or FAP or FAU) - pass campaign type to handle Events differently
-            brand = self._detect_brand(name, c_type)
-            
-            campaign_obj = Campaign(
-                id=rc["id"],
-                name=display_name,
-                objective=rc.get("objective"),
-                status=rc["status"],
-                effective_status=rc["effective_status"],
-                daily_budget=float(rc.get("daily_budget", 0))/100 if rc.get("daily_budget") else 0,
-                targeted_countries=[],
-                countries=[],
-                total_spend=round(total_spend, 2),
-                total_impressions=total_impressions,
-                country_count=0,
-                campaign_type=c_type,  # Add campaign type for frontend filtering
-                brand=brand,  # Add brand (FAM/FAP/Both)
-                platform="Meta", # Default to Meta
-                campaign_date=campaign_date  # Add extracted date
-            )
-             
-            # Create DB model
-            db_model = CampaignModel(
-                id=campaign_obj.id,
-                name=campaign_obj.name,
-                status=campaign_obj.status,
-                effective_status=campaign_obj.effective_status,
-                objective=campaign_obj.objective,
-                daily_budget=campaign_obj.daily_budget,
-                total_spend=campaign_obj.total_spend,
-                total_impressions=campaign_obj.total_impressions,
-                campaign_type=campaign_obj.campaign_type,
-                brand=campaign_obj.brand,
-                platform=campaign_obj.platform,
-                campaign_date=campaign_obj.campaign_date,
-                country_count=campaign_obj.country_count,
-                countries=campaign_obj.countries,
-                targeted_countries=campaign_obj.targeted_countries,
-                updated_at=datetime.utcnow()
-            )
-            
-            try:
-                db.merge(db_model) # UPSERT
-                db.commit() # Commit each record individually to ensure partial success
-            except Exception as e:
-                print(f"Error saving campaign {name}: {e}")
-                db.rollback()
-            
-            # Add to lists for cache file
-            if c_type == "LeadGen":
-                lead_campaigns_list.append(campaign_obj)
-            else:
-                brand_campaigns_list.append(campaign_obj)
+                for campaign_obj in self._process_campaign_page(db, raw_campaigns):
+                    # Add to lists for cache file
+                    if campaign_obj.campaign_type == "LeadGen":
+                        lead_campaigns_list.append(campaign_obj)
+                    else:
+                        brand_campaigns_list.append(campaign_obj)
+
+        if truncated is not None:
+            print(f"Partial Meta sync: {truncated}. Campaigns on later pages keep their previous data.")
+            if page_count:
+                snapshot = self._publish_snapshot(db)
+                stats_cube.rebuild_quietly(db)
+                # The lists above only cover the pages that arrived; the DB still has every campaign
+                self._save_cache_file(snapshot.campaigns)
+            raise truncated
+        
+        if not page_count:
+            print("No campaigns found")
+            return
+
+        # Readers switch to the new data in one step
+        self._publish_snapshot(db)
+        stats_cube.rebuild_quietly(db)
 
         # Updated cache file
         self._save_cache_file(CampaignList(
@@ -452,96 +552,172 @@ class MetaService:
             last_updated=datetime.now().isoformat()
         ))
 
-        # Final commit check not needed if committing per row, but keeping clean exit
-        print("Background update finished - all valid campaigns saved.")
+        print(f"Background update finished - all valid campaigns saved ({page_count} pages).")
 
 
-    def get_campaigns(self, db: Session) -> CampaignList:
-        # Check DB first
+    def reclassify_campaigns(self, db: Session) -> Dict:
+        """
+        Re-run the (reloaded) rules over the stored raw names and write back only the rows
+        whose classification changed. No Meta calls. updated_at is left alone: it tracks
+        Meta data freshness, which a rule edit doesn't change.
+        """
+        start_time = datetime.now()
+        ruleset = campaign_rules.reload_if_changed(db)
+        rows = db.query(
+            CampaignModel.id, CampaignModel.raw_name, CampaignModel.name,
+            CampaignModel.campaign_type, CampaignModel.brand, CampaignModel.campaign_date
+        ).all()
+
+        changes = []
+        skipped = 0
+        for row in rows:
+            if row.raw_name is None:
+                # Stored before raw names were kept; the next Meta refresh fills it in
+                skipped += 1
+                continue
+            c = ruleset.classify(row.raw_name)
+            if (c.display_name, c.campaign_type, c.brand, c.campaign_date) != (row.name, row.campaign_type, row.brand, row.campaign_date):
+                changes.append({
+                    "b_id": row.id,
+                    "b_name": c.display_name,
+                    "b_campaign_type": c.campaign_type,
+                    "b_brand": c.brand,
+                    "b_campaign_date": c.campaign_date
+                })
+
+        table = CampaignModel.__table__
+        stmt = table.update().where(table.c.id == bindparam("b_id")).values(
+            name=bindparam("b_name"),
+            campaign_type=bindparam("b_campaign_type"),
+            brand=bindparam("b_brand"),
+            campaign_date=bindparam("b_campaign_date"),
+            updated_at=table.c.updated_at
+        )
+        guard = write_guard(db.get_bind())
+        for i in range(0, len(changes), self.UPSERT_BATCH_SIZE):
+            with guard:
+                db.execute(stmt, changes[i:i + self.UPSERT_BATCH_SIZE])
+                db.commit()
+
+        if changes:
+            snapshot = self._publish_snapshot(db)
+            self._save_cache_file(snapshot.campaigns)
+            # Observations are grouped by campaign type
+            stats_cube.rebuild_quietly(db)
+
+        result = {
+            "rules_version": ruleset.version,
+            "campaigns": len(rows),
+            "changed": len(changes),
+            "skipped_without_raw_name": skipped,
+            "duration_seconds": round((datetime.now() - start_time).total_seconds(), 3)
+        }
+        print(f"Reclassified campaigns: {result}")
+        return result
+
+    def _run_refresh(self):
+        """Refresh job for the coordinator - uses its own session, not the request's"""
+        print("Background update started")
+        with SessionLocal() as bg_db:
+            self.update_campaigns_background(bg_db)
+        print("Background update finished")
+
+    def refresh_campaigns(self, force: bool = False) -> Optional[Future]:
+        """Start the Meta refresh, or join the one already in flight"""
+        return refresh_coordinator.trigger(
+            self.REFRESH_KEY,
+            self._run_refresh,
+            min_interval=settings.META_REFRESH_MIN_INTERVAL_SECONDS,
+            force=force
+        )
+
+    def get_refresh_status(self) -> Dict:
+        return refresh_coordinator.status(self.REFRESH_KEY)
+
+    def _campaign_from_row(self, c: CampaignModel, countries: Optional[List] = None) -> Campaign:
+        return Campaign(
+            id=c.id,
+            name=c.name,
+            status=c.status,
+            effective_status=c.effective_status,
+            objective=c.objective,
+            daily_budget=c.daily_budget,
+            total_spend=c.total_spend,
+            total_impressions=c.total_impressions,
+            campaign_type=c.campaign_type,
+            brand=c.brand,
+            platform=c.platform,
+            campaign_date=c.campaign_date,
+            # Kept in step with the fact table even when a page's country fetch failed
+            country_count=sum(1 for x in countries if x.impressions > 0) if countries else c.country_count,
+            countries=countries or [],
+            targeted_countries=c.targeted_countries
+        )
+
+    def _publish_snapshot(self, db: Session) -> CampaignSnapshot:
+        """Rebuild the campaign snapshot from the DB and swap it in atomically"""
+        db_campaigns = db.query(CampaignModel).all()
+        # Per-country metrics come from the fact table (ratios computed in SQL), not the JSON column
+        countries_by_campaign = country_insights.load_by_campaign(db)
+
+        brand_campaigns = []
+        lead_campaigns = []
+        for c in db_campaigns:
+            campaign_obj = self._campaign_from_row(c, countries_by_campaign.get(c.id))
+            if c.campaign_type == "Brand" or c.campaign_type == "Event":
+                brand_campaigns.append(campaign_obj)
+            elif c.campaign_type == "LeadGen":
+                lead_campaigns.append(campaign_obj)
+
+        campaign_list = CampaignList(
+            Brand=brand_campaigns,
+            LeadGen=lead_campaigns,
+            last_updated=datetime.now().isoformat()
+        )
+        data_updated_at = max((c.updated_at for c in db_campaigns if c.updated_at), default=None)
+
+        with self._snapshot_lock:
+            version = (self._snapshot.version if self._snapshot else 0) + 1
+            snapshot = CampaignSnapshot(campaign_list, version, len(db_campaigns), data_updated_at)
+            self._snapshot = snapshot
+        print(f"[DEBUG] Published campaign snapshot v{version} ({len(db_campaigns)} campaigns)")
+        return snapshot
+
+    def get_published_snapshot(self) -> Optional[CampaignSnapshot]:
+        """
+        The in-memory snapshot if one with rows is published, else None. Never touches
+        the DB or blocks, so async routes can call it directly.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or not snapshot.row_count:
+            return None
         # We'll consider data "fresh" if updated within last 10 minutes
         ten_mins_ago = datetime.utcnow() - timedelta(minutes=10)
-        
-        # Always fetch all campaigns from DB sorted by name
-        db_campaigns = db.query(CampaignModel).all()
-        
-        is_stale = False
-        if not db_campaigns:
-             is_stale = True # Empty DB, must fetch
-        else:
-             # Check if ANY record is old (using the first one as proxy or check all)
-             # Simple check: if the first record is old, trigger update
-             if db_campaigns[0].updated_at < ten_mins_ago:
-                 is_stale = True
+        is_stale = snapshot.is_stale(ten_mins_ago)
+        print(f"[DEBUG] Snapshot Hit! Returning {snapshot.row_count} campaigns (Stale: {is_stale})")
+        if is_stale:
+            print("Data is stale, triggering background update...")
+            # Joins the in-flight refresh if another request already started one
+            self.refresh_campaigns()
+        return snapshot
 
-        if db_campaigns:
-            print(f"[DEBUG] DB Hit! Returning {len(db_campaigns)} campaigns (Stale: {is_stale})")
-            
-            if is_stale:
-                print("Data is stale, triggering background update...")
-                # We need a new session for the background thread because 'db' is scoped to request
-                # However, for simplicity/safety in this context, we can just run it synchronously if we don't want to mess with scoped sessions, 
-                # OR better: accept that the user sees old data and we trigger update.
-                # threading.Thread(target=self.update_campaigns_background, args=(db,)).start() 
-                # PASSING DB SESSION TO THREAD IS RISKY
-                # For this specific task, "Stale While Revalidate" usually implies we return old data, 
-                # but we need to trigger the update. 
-                # To be safe with FastAPI/SQLAlchemy 'db' session dependency, we should probably do a synchronous check 
-                # OR properly create a new session factory.
-                
-                # Given complexity, we'll do this:
-                # If data exists, return it.
-                # If it's stale, launch a thread that creates its ONE-OFF new session to update.
-                # BUT we don't have the session factory here easily injected without more refactoring.
-                
-                # SIMPLIFICATION for "Perm Fix":
-                # We will just return the DB data. 
-                # The "Background Update" needs a fresh session.
-                # We will create a fresh session inside the thread or helper.
-                
-                # Let's use a simple executor to run the update logic, but we need `SessionLocal`.
-                from app.core.database import SessionLocal
-                def bg_update():
-                    print("Background update started")
-                    with SessionLocal() as bg_db:
-                         self.update_campaigns_background(bg_db)
-                    print("Background update finished")
-
-                executor = ThreadPoolExecutor(max_workers=1)
-                executor.submit(bg_update)
-
-            brand_campaigns = []
-            lead_campaigns = []
-            
-            for c in db_campaigns:
-                campaign_obj = Campaign(
-                    id=c.id,
-                    name=c.name,
-                    status=c.status,
-                    effective_status=c.effective_status,
-                    objective=c.objective,
-                    daily_budget=c.daily_budget,
-                    total_spend=c.total_spend,
-                    total_impressions=c.total_impressions,
-                    campaign_type=c.campaign_type,
-                    brand=c.brand,
-                    platform=c.platform,
-                    campaign_date=c.campaign_date,
-                    country_count=c.country_count,
-                    countries=c.countries,
-                    targeted_countries=c.targeted_countries
-                )
-                
-                if c.campaign_type == "Brand" or c.campaign_type == "Event":
-                    brand_campaigns.append(campaign_obj)
-                elif c.campaign_type == "LeadGen":
-                    lead_campaigns.append(campaign_obj)
-                
-            return CampaignList(
-                Brand=brand_campaigns,
-                LeadGen=lead_campaigns,
-                last_updated=datetime.now().isoformat()
-            )
-        
+    def load_campaign_snapshot(self) -> CampaignSnapshot:
+        """get_campaign_snapshot() with its own session, for running off the event loop"""
+        with SessionLocal() as db:
+            return self.get_campaign_snapshot(db)
+
+    def get_campaign_snapshot(self, db: Session) -> CampaignSnapshot:
+        """
+        Return the materialized campaign list. The DB is only read when the snapshot
+        is first built or after a refresh commits; every other read is O(1).
+        """
+        published = self.get_published_snapshot()
+        if published is not None:
+            return published
+
+        snapshot = self._snapshot or self._publish_snapshot(db)
+        if snapshot.row_count:
+            return self.get_published_snapshot() or snapshot
         
         # If DB is empty, TRY JSON BACKUP FIRST
         print("[DEBUG] DB is empty! Checking JSON backup path: " + self.cache_file)
@@ -549,60 +725,31 @@ class MetaService:
         if json_backup:
             print(f"[DEBUG] JSON Backup Hit! Returning {len(json_backup.Brand) + len(json_backup.LeadGen)} campaigns.")
             # Trigger background update to refresh DB/File
-            from app.core.database import SessionLocal
-            def bg_update():
-               print("Background update started (from JSON fallback)")
-               with SessionLocal() as bg_db:
-                    self.update_campaigns_background(bg_db)
-            
-            executor = ThreadPoolExecutor(max_workers=1)
-            executor.submit(bg_update)
-            
-            return json_backup
+            self.refresh_campaigns()
+            # Not published: the DB snapshot replaces it as soon as the refresh lands
+            return CampaignSnapshot(json_backup, snapshot.version, len(json_backup.Brand) + len(json_backup.LeadGen))
 
         # If BOTH are empty, we MUST block and fetch (Cold Start)
         print("[DEBUG] CRITICAL: DB and JSON Backup are empty. Blocking main thread for cold start fetch.")
-        self.update_campaigns_background(db)
-        
-        # Fetch from DB again (Non-Recursive) to avoid infinite loop if API returns nothing
-        print("[DEBUG] Cold start fetch complete. Querying DB for results...")
-        db_campaigns_final = db.query(CampaignModel).all()
-        
-        brand_campaigns_final = []
-        lead_campaigns_final = []
-        
-        for c in db_campaigns_final:
-            campaign_obj = Campaign(
-                id=c.id, name=c.name, status=c.status,
-                effective_status=c.effective_status, objective=c.objective,
-                daily_budget=c.daily_budget, total_spend=c.total_spend,
-                total_impressions=c.total_impressions, campaign_type=c.campaign_type,
-                brand=c.brand, platform=c.platform, campaign_date=c.campaign_date,
-                country_count=c.country_count, countries=c.countries,
-                targeted_countries=c.targeted_countries
-            )
-            if c.campaign_type == "Brand" or c.campaign_type == "Event":
-                brand_campaigns_final.append(campaign_obj)
-            elif c.campaign_type == "LeadGen":
-                lead_campaigns_final.append(campaign_obj)
-                
-        return CampaignList(
-            Brand=brand_campaigns_final,
-            LeadGen=lead_campaigns_final,
-            last_updated=datetime.now().isoformat()
-        )
-        
+        # Concurrent cold-start requests all wait on the same refresh
+        try:
+            self.refresh_campaigns(force=True).result()
+        except Exception as e:
+            print(f"Cold start refresh failed: {e}")
         
+        # The refresh publishes its own snapshot; rebuild only if it didn't get that far
+        print("[DEBUG] Cold start fetch complete.")
+        if self._snapshot is not snapshot:
+            return self._snapshot
+        return self._publish_snapshot(db)
 
+    def get_campaigns(self, db: Session) -> CampaignList:
+        return self.get_campaign_snapshot(db).campaigns
 
-    def get_aggregated_stats(self, campaign_type: str, country: str) -> Dict[str, float]:
-        # Return default averages for predictions
-        return {
-            "CPM": 12.50,
-            "CPC": 1.50,
-            "CPL": 25.0,
-            "Frequency": 1.2
-        }
+
+    def get_aggregated_stats(self, campaign_type: str, country: str, month: Optional[int] = None) -> Dict[str, float]:
+        # Medians from stored insights, falling back to region/global data and then the old defaults
+        return stats_cube.get_stats(campaign_type, country, month)
         
 
 meta_service = MetaService()
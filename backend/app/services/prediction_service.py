@@ -1,22 +1,36 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from app.services.meta_service import meta_service
 
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; batches then fall back to one calculate_predictions call per scenario
+    np = None
+
+METRIC_COLUMNS = ("CPM", "CPC", "CPL", "Frequency")
+
 class PredictionService:
+    def _client_spend_base(self, campaign_type: str) -> int:
+        if campaign_type == "Brand":
+            return 3000
+        elif campaign_type == "LeadGen":
+            return 3900
+        return 3000 # Default
+
+    def media_spend(self, campaign_type: str, duration_months: int) -> float:
+        """Media budget for a plan: 25% of the client spend"""
+        return self._client_spend_base(campaign_type) * duration_months * 0.25
+
     def calculate_predictions(
         self, 
         campaign_type: str, 
         countries: List[str], 
         allocations: Dict[str, float], 
-        duration_months: int
+        duration_months: int,
+        month: Optional[int] = None
     ) -> Dict:
         
         # 1. Determine Client Spend
-        if campaign_type == "Brand":
-            client_spend_base = 3000
-        elif campaign_type == "LeadGen":
-            client_spend_base = 3900
-        else:
-            client_spend_base = 3000 # Default
+        client_spend_base = self._client_spend_base(campaign_type)
             
         total_client_spend = client_spend_base * duration_months
         
@@ -40,7 +54,7 @@ class PredictionService:
         }
         
         for country in countries:
-            stats = meta_service.get_aggregated_stats(campaign_type, country)
+            stats = meta_service.get_aggregated_stats(campaign_type, country, month)
             
             # Budget for this country
             alloc = allocations.get(country, 0)
@@ -88,4 +102,114 @@ class PredictionService:
             
         return results
 
+    def calculate_predictions_batch(self, scenarios: List[Dict]) -> List[Dict]:
+        """
+        calculate_predictions for many scenarios at once. Each scenario is a dict of
+        calculate_predictions' arguments. Scenarios are laid out as a (scenario x country)
+        matrix padded to the longest country list, and every formula runs as one array
+        operation with the same float operations in the same order, so the results are
+        identical to calling calculate_predictions per scenario.
+        """
+        if np is None:
+            return [self.calculate_predictions(**scenario) for scenario in scenarios]
+        if not scenarios:
+            return []
+
+        n = len(scenarios)
+        width = max(len(s["countries"]) for s in scenarios)
+        # One stats lookup per distinct (type, country, month), not per cell
+        stats_rows: Dict[tuple, int] = {}
+        stats_table: List[List[float]] = []
+        cells: List[List[int]] = []
+        allocs: List[List[float]] = []
+        bases: List[int] = []
+        durations: List[int] = []
+
+        for scenario in scenarios:
+            campaign_type = scenario["campaign_type"]
+            month = scenario.get("month")
+            allocations = scenario["allocations"]
+            bases.append(self._client_spend_base(campaign_type))
+            durations.append(scenario["duration_months"])
+            row_cells = []
+            for country in scenario["countries"]:
+                key = (campaign_type, country, month)
+                row = stats_rows.get(key)
+                if row is None:
+                    stats = meta_service.get_aggregated_stats(campaign_type, country, month)
+                    row = stats_rows[key] = len(stats_table)
+                    stats_table.append([stats[m] for m in METRIC_COLUMNS])
+                row_cells.append(row)
+            cells.append(row_cells)
+            allocs.append([allocations.get(country, 0) for country in scenario["countries"]])
+
+        lengths = np.fromiter((len(c) for c in cells), dtype=np.int64, count=n)
+        filled = np.arange(width)[None, :] < lengths[:, None]
+        cell_matrix = np.zeros((n, width), dtype=np.int64)
+        cell_matrix[filled] = [c for row in cells for c in row]
+        alloc_matrix = np.zeros((n, width))
+        alloc_matrix[filled] = [a for row in allocs for a in row]
+        types = [s["campaign_type"] for s in scenarios]
+        is_brand = np.array([t == "Brand" for t in types], dtype=bool)
+        is_leadgen = np.array([t == "LeadGen" for t in types], dtype=bool)
+
+        table = np.asarray(stats_table, dtype=float).reshape(-1, len(METRIC_COLUMNS))
+        if not len(table):
+            table = np.zeros((1, len(METRIC_COLUMNS)))
+        cpm, cpc, cpl, freq = (table[cell_matrix, m] for m in range(len(METRIC_COLUMNS)))
+
+        client_spend = np.array(bases, dtype=np.int64) * np.array(durations, dtype=np.int64)
+        media_spend = client_spend * 0.25
+        budget = media_spend[:, None] * (alloc_matrix / 100.0)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            impressions = np.where(cpm > 0, (budget / cpm) * 1000, 0.0)
+            reach = np.where(freq > 0, impressions / freq, 0.0)
+            clicks = np.where((is_brand | is_leadgen)[:, None] & (cpc > 0), budget / cpc, 0.0)
+            leads = np.where(is_leadgen[:, None] & (cpl > 0), budget / cpl, 0.0)
+
+        # int() truncates toward zero; padding cells are zeroed before the totals
+        counts = [np.where(filled, np.trunc(a), 0).astype(np.int64) for a in (impressions, reach, clicks, leads)]
+        totals = [c.sum(axis=1).tolist() for c in counts]
+        counts = [c.tolist() for c in counts]
+        budget = budget.tolist()
+        # Displayed rates only depend on the stats row, so round each row once
+        rounded = [[round(v, 2) for v in row] for row in stats_table]
+        client_spend = client_spend.tolist()
+        media_spend = media_spend.tolist()
+
+        results = []
+        for i, scenario in enumerate(scenarios):
+            breakdown = [
+                {
+                    "country": country,
+                    "budget": round(budget[i][j], 2),
+                    "impressions": counts[0][i][j],
+                    "reach": counts[1][i][j],
+                    "link_clicks": counts[2][i][j],
+                    "leads": counts[3][i][j],
+                    "cpm": rates[0],
+                    "cpc": rates[1],
+                    "cpl": rates[2],
+                    "frequency": rates[3]
+                }
+                for j, (country, rates) in enumerate(zip(scenario["countries"], (rounded[c] for c in cells[i])))
+            ]
+            results.append({
+                "summary": {
+                    "client_spend": client_spend[i],
+                    "media_spend": media_spend[i],
+                    "duration_months": scenario["duration_months"],
+                    "campaign_type": scenario["campaign_type"]
+                },
+                "breakdown": breakdown,
+                "totals": {
+                    "impressions": totals[0][i],
+                    "reach": totals[1][i],
+                    "link_clicks": totals[2][i],
+                    "leads": totals[3][i]
+                }
+            })
+        return results
+
 prediction_service = PredictionService()
@@ -0,0 +1,112 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+
+class RefreshState:
+    """Bookkeeping for one refresh key"""
+
+    def __init__(self):
+        self.future: Optional[Future] = None
+        self.last_started: Optional[float] = None
+        self.last_success: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_result: Any = None
+        self.run_count = 0
+
+    @property
+    def in_flight(self) -> bool:
+        return self.future is not None and not self.future.done()
+
+    def as_dict(self) -> Dict:
+        def ts(value: Optional[float]) -> Optional[str]:
+            return datetime.fromtimestamp(value).isoformat() if value else None
+
+        return {
+            "in_flight": self.in_flight,
+            "last_started": ts(self.last_started),
+            "last_success": ts(self.last_success),
+            "last_error": self.last_error,
+            "last_error_at": ts(self.last_error_at),
+            "last_duration_seconds": round(self.last_duration, 3) if self.last_duration is not None else None,
+            "last_result": self.last_result,
+            "run_count": self.run_count
+        }
+
+
+class RefreshCoordinator:
+    """
+    Process-wide single-flight runner for background refreshes.
+    At most one refresh runs per key; callers arriving while it is running join the
+    same Future instead of starting their own, and new runs are throttled by a
+    minimum interval. All work runs on one long-lived worker pool.
+    """
+
+    def __init__(self, max_workers: int = 2, min_interval: float = 60.0, name: str = "refresh"):
+        self.min_interval = min_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._states: Dict[str, RefreshState] = {}
+        self._lock = threading.Lock()
+
+    def trigger(
+        self,
+        key: str,
+        fn: Callable[[], Any],
+        min_interval: Optional[float] = None,
+        force: bool = False
+    ) -> Optional[Future]:
+        """
+        Start a refresh for `key` unless one is already running (returns that one)
+        or the last one started less than `min_interval` seconds ago (returns None).
+        `force` skips the interval check but still joins an in-flight refresh.
+        """
+        interval = self.min_interval if min_interval is None else min_interval
+        with self._lock:
+            state = self._states.setdefault(key, RefreshState())
+            if state.in_flight:
+                return state.future
+
+            now = time.time()
+            if not force and state.last_started and now - state.last_started < interval:
+                return None
+
+            state.last_started = now
+            state.future = self._executor.submit(self._run, state, key, fn)
+            return state.future
+
+    def _run(self, state: RefreshState, key: str, fn: Callable[[], Any]) -> Any:
+        start = time.time()
+        try:
+            result = fn()
+        except Exception as e:
+            print(f"Refresh '{key}' failed: {e}")
+            with self._lock:
+                state.last_error = str(e)
+                state.last_error_at = time.time()
+                state.last_duration = time.time() - start
+                state.run_count += 1
+            raise
+
+        with self._lock:
+            state.last_success = time.time()
+            state.last_duration = state.last_success - start
+            state.last_result = result
+            state.run_count += 1
+        return result
+
+    def status(self, key: Optional[str] = None) -> Dict:
+        """Refresh state for one key, or for every key seen so far"""
+        with self._lock:
+            if key is not None:
+                return self._states.get(key, RefreshState()).as_dict()
+            return {k: s.as_dict() for k, s in self._states.items()}
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+refresh_coordinator = RefreshCoordinator()
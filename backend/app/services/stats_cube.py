@@ -0,0 +1,421 @@
+import math
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import extract, func, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.campaign import CampaignCountryInsight, CampaignDailyInsight, CampaignModel
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional (pandas brings it in); the pure-Python build gives the same numbers
+    np = None
+
+# What predictions used before there was any stored data; the last step of every fallback
+DEFAULT_STATS = {"CPM": 12.50, "CPC": 1.50, "CPL": 25.0, "Frequency": 1.2}
+METRICS = ("CPM", "CPC", "CPL", "Frequency")
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+MEDIAN = QUANTILES.index(0.5)
+# Outcomes with a spend response curve: outcome ~ a * spend^b, fitted per cell in log-log space
+CURVE_OUTCOMES = ("impressions", "reach", "link_clicks", "leads")
+
+ANY = "*"  # Wildcard for campaign type / area
+ALL_MONTHS = 0
+
+REGIONS = {
+    "Europe": (
+        "AD AL AT BA BE BG BY CH CY CZ DE DK EE ES FI FO FR GB GI GR HR HU IE IS IT LI LT LU LV "
+        "MC MD ME MK MT NL NO PL PT RO RS RU SE SI SK SM UA VA XK"
+    ),
+    "North America": "BM CA GL PM US",
+    "Latin America": (
+        "AG AR AW BB BO BR BS BZ CL CO CR CU CW DM DO EC GD GT GY HN HT JM KN KY LC MX NI PA PE PR "
+        "PY SR SV TC TT UY VC VE VG VI"
+    ),
+    "Middle East": "AE BH IL IQ IR JO KW LB OM PS QA SA SY TR YE",
+    "Africa": (
+        "AO BF BI BJ BW CD CF CG CI CM CV DJ DZ EG ER ET GA GH GM GN GQ GW KE KM LR LS LY MA MG "
+        "ML MR MU MW MZ NA NE NG RE RW SC SD SL SN SO SS ST SZ TD TG TN TZ UG ZA ZM ZW"
+    ),
+    "Asia": (
+        "AF AM AZ BD BN BT CN GE HK ID IN JP KG KH KR KZ LA LK MM MN MO MV MY NP PH PK SG TH TJ "
+        "TL TM TW UZ VN"
+    ),
+    "Oceania": "AU FJ NC NZ PF PG SB TO VU WS",
+}
+COUNTRY_REGION = {code: region for region, codes in REGIONS.items() for code in codes.split()}
+
+MONTH_NUMBERS = {m: i + 1 for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"))}
+
+# (campaign_id, country, spend, impressions, reach, link_clicks, leads)
+Observation = Tuple[str, str, float, int, int, int, int]
+
+
+def region_of(country: str) -> Optional[str]:
+    return COUNTRY_REGION.get((country or "").upper())
+
+
+def campaign_date_month(campaign_date: Optional[str]) -> int:
+    """Month number from a parsed campaign_date ("Mar 25", "Mar/Apr 25"); 0 when there isn't one"""
+    return MONTH_NUMBERS.get((campaign_date or "")[:3].lower(), ALL_MONTHS)
+
+
+def _quantiles(values: List[float]) -> List[float]:
+    """Linear-interpolated quantiles of a non-empty list, same definition as numpy's default"""
+    values = sorted(values)
+    last = len(values) - 1
+    out = []
+    for q in QUANTILES:
+        pos = q * last
+        lo = int(pos)
+        hi = min(lo + 1, last)
+        out.append(values[lo] + (values[hi] - values[lo]) * (pos - lo))
+    return out
+
+
+def _fit_curve(n: float, sx: float, sy: float, sxx: float, sxy: float) -> Tuple[float, float]:
+    """(log a, b) of the least-squares line log y = log a + b log x, NaNs without spread in x"""
+    denominator = n * sxx - sx * sx
+    if n < 2 or denominator <= 1e-12 * max(n * sxx, 1.0):
+        return float("nan"), float("nan")
+    b = (n * sxy - sx * sy) / denominator
+    return (sy - b * sx) / n, b
+
+
+def _group_quantiles_np(cells, values, n_cells: int):
+    """QUANTILES of `values` grouped by cell id in one sort; NaN rows for empty cells"""
+    counts = np.bincount(cells, minlength=n_cells)
+    out = np.full((n_cells, len(QUANTILES)), np.nan)
+    if not len(values):
+        return out, counts
+    order = np.lexsort((values, cells))
+    ordered = values[order]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    pos = starts[:, None] + np.asarray(QUANTILES)[None, :] * np.maximum(counts - 1, 0)[:, None]
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, starts[:, None] + np.maximum(counts - 1, 0)[:, None])
+    lo = np.minimum(lo, len(ordered) - 1)
+    hi = np.minimum(hi, len(ordered) - 1)
+    filled = counts > 0
+    out[filled] = (ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))[filled]
+    return out, counts
+
+
+class StatsCube:
+    """
+    Percentiles of CPM/CPC/CPL/frequency per (campaign_type, area, month). Area is a
+    country, a region or ANY; month is 1-12 or ALL_MONTHS. Cells live in one array
+    (cell x metric x quantile) and `index` maps a key to its row, so a lookup is a few
+    dict hits whatever the amount of data behind it. Each cell also holds a fitted
+    spend response curve (log a, b) per CURVE_OUTCOMES entry for the budget optimizer.
+    """
+
+    def __init__(
+        self,
+        index: Dict[Tuple[str, str, int], int],
+        stats,
+        counts,
+        observations: int,
+        built_at: datetime,
+        curves=None,
+        curve_counts=None
+    ):
+        self.index = index
+        self.stats = stats
+        self.counts = counts
+        self.observations = observations
+        self.built_at = built_at
+        self.curves = curves if curves is not None else []
+        self.curve_counts = curve_counts if curve_counts is not None else []
+
+    def fallback_keys(self, campaign_type: str, country: str, month: Optional[int] = None) -> List[Tuple[str, str, int]]:
+        """Most to least specific: country and month, country, region, every country, every type"""
+        country = (country or "").upper()
+        keys = []
+        if month:
+            keys.append((campaign_type, country, month))
+        keys.append((campaign_type, country, ALL_MONTHS))
+        region = region_of(country)
+        if region:
+            keys.append((campaign_type, region, ALL_MONTHS))
+        keys.append((campaign_type, ANY, ALL_MONTHS))
+        keys.append((ANY, ANY, ALL_MONTHS))
+        return keys
+
+    def resolve(self, campaign_type: str, country: str, month: Optional[int] = None, min_samples: int = 1) -> Dict[str, Dict]:
+        """Per metric: the first cell in the fallback chain with enough samples, else DEFAULT_STATS"""
+        rows = [(key, self.index.get(key)) for key in self.fallback_keys(campaign_type, country, month)]
+        rows = [(key, row) for key, row in rows if row is not None]
+        resolved = {}
+        for m, metric in enumerate(METRICS):
+            for key, row in rows:
+                samples = int(self.counts[row][m])
+                if samples >= min_samples:
+                    values = [float(v) for v in self.stats[row][m]]
+                    resolved[metric] = {
+                        "value": values[MEDIAN],
+                        "percentiles": {f"p{round(q * 100)}": v for q, v in zip(QUANTILES, values)},
+                        "samples": samples,
+                        "source": {"campaign_type": key[0], "area": key[1], "month": key[2]}
+                    }
+                    break
+            else:
+                resolved[metric] = {"value": DEFAULT_STATS[metric], "percentiles": {}, "samples": 0, "source": None}
+        return resolved
+
+    def medians(self, campaign_type: str, country: str, month: Optional[int] = None, min_samples: int = 1) -> Dict[str, float]:
+        """resolve() reduced to the medians, without building the per-metric detail"""
+        rows = [self.index.get(key) for key in self.fallback_keys(campaign_type, country, month)]
+        rows = [row for row in rows if row is not None]
+        medians = {}
+        for m, metric in enumerate(METRICS):
+            row = next((row for row in rows if self.counts[row][m] >= min_samples), None)
+            medians[metric] = float(self.stats[row][m][MEDIAN]) if row is not None else DEFAULT_STATS[metric]
+        return medians
+
+    def curve(
+        self, campaign_type: str, country: str, outcome: str, month: Optional[int] = None, min_samples: int = 1
+    ) -> Optional[Dict]:
+        """
+        Response curve for `outcome` from the first cell in the fallback chain with enough
+        samples and a usable fit (b > 0). None when no cell has one.
+        """
+        o = CURVE_OUTCOMES.index(outcome)
+        for key in self.fallback_keys(campaign_type, country, month):
+            row = self.index.get(key)
+            if row is None or self.curve_counts[row][o] < min_samples:
+                continue
+            log_a, b = (float(v) for v in self.curves[row][o])
+            if b > 0:
+                return {
+                    "log_a": log_a,
+                    "b": b,
+                    "samples": int(self.curve_counts[row][o]),
+                    "source": {"campaign_type": key[0], "area": key[1], "month": key[2]}
+                }
+        return None
+
+    @classmethod
+    def build(cls, observations: Sequence[Observation], types: Dict[str, str], months: Dict[str, int]) -> "StatsCube":
+        """
+        One observation per (campaign, country) row with enough delivery. Each lands in the
+        cells (type, country, month), (type, country, *), (type, region, *), (type, *, *)
+        and (*, *, *); a ratio only counts where its denominator is non-zero, and a curve
+        only uses observations where its outcome is non-zero.
+        """
+        min_impressions = settings.STATS_CUBE_MIN_IMPRESSIONS
+        keys: List[Tuple[str, str, int]] = []
+        values: List[Tuple[float, ...]] = []
+        nan = float("nan")
+        used = 0
+        for campaign_id, country, spend, impressions, reach, clicks, leads in observations:
+            campaign_type = types.get(campaign_id)
+            if not campaign_type or spend <= 0 or impressions < min_impressions:
+                continue
+            row = (
+                spend * 1000 / impressions,
+                spend / clicks if clicks > 0 else nan,
+                spend / leads if leads > 0 else nan,
+                impressions / reach if reach > 0 else nan,
+                # Curve inputs: log spend, then log of each CURVE_OUTCOMES entry
+                math.log(spend),
+                math.log(impressions),
+                math.log(reach) if reach > 0 else nan,
+                math.log(clicks) if clicks > 0 else nan,
+                math.log(leads) if leads > 0 else nan
+            )
+            used += 1
+            month = months.get(campaign_id, ALL_MONTHS)
+            region = region_of(country)
+            if month:
+                keys.append((campaign_type, country, month))
+                values.append(row)
+            keys.append((campaign_type, country, ALL_MONTHS))
+            values.append(row)
+            if region:
+                keys.append((campaign_type, region, ALL_MONTHS))
+                values.append(row)
+            keys.append((campaign_type, ANY, ALL_MONTHS))
+            values.append(row)
+            keys.append((ANY, ANY, ALL_MONTHS))
+            values.append(row)
+
+        index: Dict[Tuple[str, str, int], int] = {}
+        cells = [index.setdefault(key, len(index)) for key in keys]
+
+        n_cells = len(index)
+        log_spend = len(METRICS)
+        if np is not None:
+            cells_arr = np.asarray(cells, dtype=np.int64)
+            values_arr = np.asarray(values, dtype=float).reshape(-1, len(METRICS) + 1 + len(CURVE_OUTCOMES))
+            stats = np.full((n_cells, len(METRICS), len(QUANTILES)), np.nan)
+            counts = np.zeros((n_cells, len(METRICS)), dtype=np.int64)
+            for m in range(len(METRICS)):
+                valid = ~np.isnan(values_arr[:, m])
+                stats[:, m, :], counts[:, m] = _group_quantiles_np(cells_arr[valid], values_arr[valid, m], n_cells)
+            curves = np.full((n_cells, len(CURVE_OUTCOMES), 2), np.nan)
+            curve_counts = np.zeros((n_cells, len(CURVE_OUTCOMES)), dtype=np.int64)
+            for o in range(len(CURVE_OUTCOMES)):
+                y = values_arr[:, log_spend + 1 + o]
+                valid = ~np.isnan(y)
+                c, x, y = cells_arr[valid], values_arr[valid, log_spend], y[valid]
+                # Per-cell sums for the least-squares fit, one bincount each
+                n, sx, sy, sxx, sxy = (np.bincount(c, weights=w, minlength=n_cells) for w in (None, x, y, x * x, x * y))
+                curve_counts[:, o] = n
+                # Same fit as _fit_curve, for every cell at once
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    denominator = n * sxx - sx * sx
+                    fitted = (n >= 2) & (denominator > 1e-12 * np.maximum(n * sxx, 1.0))
+                    slope = np.where(fitted, (n * sxy - sx * sy) / denominator, np.nan)
+                    curves[:, o, 0] = (sy - slope * sx) / n
+                    curves[:, o, 1] = slope
+        else:
+            grouped = [[[] for _ in METRICS] for _ in index]
+            sums = [[[0.0] * 5 for _ in CURVE_OUTCOMES] for _ in index]
+            for cell, row in zip(cells, values):
+                for m in range(len(METRICS)):
+                    if row[m] == row[m]:  # not NaN
+                        grouped[cell][m].append(row[m])
+                x = row[log_spend]
+                for o in range(len(CURVE_OUTCOMES)):
+                    y = row[log_spend + 1 + o]
+                    if y == y:
+                        acc = sums[cell][o]
+                        acc[0] += 1
+                        acc[1] += x
+                        acc[2] += y
+                        acc[3] += x * x
+                        acc[4] += x * y
+            stats = [[_quantiles(v) if v else [nan] * len(QUANTILES) for v in cell] for cell in grouped]
+            counts = [[len(v) for v in cell] for cell in grouped]
+            curves = [[_fit_curve(*acc) for acc in cell] for cell in sums]
+            curve_counts = [[int(acc[0]) for acc in cell] for cell in sums]
+
+        return cls(index, stats, counts, used, datetime.utcnow(), curves, curve_counts)
+
+
+class StatsCubeService:
+    """
+    Keeps the StatsCube in step with the insight tables. Country rows are cached per
+    campaign and only campaigns with rows written since the last build are re-read;
+    types and months (cheap, one row per campaign) are re-read every time because
+    reclassification changes types without touching the fact rows.
+    """
+
+    def __init__(self):
+        self._cube: Optional[StatsCube] = None
+        self._rows: Dict[str, List[Observation]] = {}
+        self._watermark: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def _campaign_months(self, db: Session, campaign_dates: Dict[str, Optional[str]]) -> Dict[str, int]:
+        """Month each campaign spent most in (daily insights), else the month in its name"""
+        month = extract("month", CampaignDailyInsight.date)
+        spend_by_month = db.execute(
+            select(CampaignDailyInsight.campaign_id, month, func.sum(CampaignDailyInsight.spend))
+            .group_by(CampaignDailyInsight.campaign_id, month)
+        ).all()
+        best: Dict[str, Tuple[float, int]] = {}
+        for campaign_id, m, spend in spend_by_month:
+            if m and (spend or 0) > best.get(campaign_id, (0.0, 0))[0]:
+                best[campaign_id] = (spend, int(m))
+        months = {cid: campaign_date_month(d) for cid, d in campaign_dates.items()}
+        months.update({cid: m for cid, (_, m) in best.items()})
+        return months
+
+    def _load_rows(self, db: Session, campaign_ids: Optional[List[str]] = None, batch_size: int = 500) -> Dict[str, List[Observation]]:
+        t = CampaignCountryInsight
+        stmt = select(t.campaign_id, t.country, t.spend, t.impressions, t.reach, t.link_clicks, t.leads)
+        if campaign_ids is None:
+            batches = [db.execute(stmt)]
+        else:
+            batches = [
+                db.execute(stmt.where(t.campaign_id.in_(campaign_ids[i:i + batch_size])))
+                for i in range(0, len(campaign_ids), batch_size)
+            ]
+        rows: Dict[str, List[Observation]] = defaultdict(list)
+        for batch in batches:
+            for r in batch:
+                rows[r.campaign_id].append((
+                    r.campaign_id, r.country, r.spend or 0.0, r.impressions or 0,
+                    r.reach or 0, r.link_clicks or 0, r.leads or 0
+                ))
+        return rows
+
+    def rebuild(self, db: Session, full: bool = False) -> StatsCube:
+        """Re-read changed country rows (all of them when `full` or the counts drift) and swap in a new cube"""
+        with self._lock:
+            start_time = datetime.now()
+            total, newest = db.query(func.count(), func.max(CampaignCountryInsight.updated_at)).select_from(
+                CampaignCountryInsight
+            ).one()
+
+            if full or self._watermark is None:
+                self._rows = dict(self._load_rows(db))
+                mode = "full"
+            else:
+                changed = [cid for (cid,) in db.query(CampaignCountryInsight.campaign_id).filter(
+                    CampaignCountryInsight.updated_at > self._watermark
+                ).distinct()]
+                rows = dict(self._rows)
+                rows.update(self._load_rows(db, changed))
+                mode = f"{len(changed)} changed campaigns"
+                if sum(len(r) for r in rows.values()) != total:
+                    # Rows went away without new ones being written (campaign deleted upstream)
+                    rows = dict(self._load_rows(db))
+                    mode = "full (row count drifted)"
+                self._rows = rows
+            self._watermark = newest
+
+            campaigns = db.query(CampaignModel.id, CampaignModel.campaign_type, CampaignModel.campaign_date).all()
+            types = {c.id: c.campaign_type for c in campaigns}
+            months = self._campaign_months(db, {c.id: c.campaign_date for c in campaigns})
+            observations = [o for rows in self._rows.values() for o in rows]
+            cube = StatsCube.build(observations, types, months)
+            self._cube = cube
+
+        duration = (datetime.now() - start_time).total_seconds()
+        print(f"Built stats cube ({mode}): {len(cube.index)} cells from {cube.observations} observations in {duration:.3f}s")
+        return cube
+
+    def rebuild_quietly(self, db: Session) -> None:
+        """rebuild() for the refresh paths: a failure keeps the previous cube"""
+        try:
+            self.rebuild(db)
+        except Exception as e:
+            print(f"Stats cube rebuild failed: {e}")
+
+    def get_cube(self) -> StatsCube:
+        """The current cube, built from the DB on first use (an empty one, i.e. the defaults, if that fails)"""
+        cube = self._cube
+        if cube is None:
+            try:
+                with SessionLocal() as db:
+                    cube = self.rebuild(db) if self._cube is None else self._cube
+            except Exception as e:
+                print(f"Stats cube unavailable, using default stats: {e}")
+                cube = StatsCube.build([], {}, {})
+        return cube
+
+    def lookup(self, campaign_type: str, country: str, month: Optional[int] = None) -> Dict[str, Dict]:
+        return self.get_cube().resolve(campaign_type, country, month, settings.STATS_CUBE_MIN_SAMPLES)
+
+    def get_stats(self, campaign_type: str, country: str, month: Optional[int] = None) -> Dict[str, float]:
+        """Median CPM/CPC/CPL/Frequency for the most specific cell with enough data"""
+        return self.get_cube().medians(campaign_type, country, month, settings.STATS_CUBE_MIN_SAMPLES)
+
+    def get_status(self) -> Dict:
+        cube = self._cube
+        return {
+            "built_at": cube.built_at.isoformat() if cube else None,
+            "cells": len(cube.index) if cube else 0,
+            "observations": cube.observations if cube else 0,
+            "campaigns_cached": len(self._rows),
+            "numpy": np is not None
+        }
+
+
+stats_cube = StatsCubeService()
@@ -0,0 +1,25 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway SQLite file before anything imports app.core.database
+_db_dir = tempfile.mkdtemp(prefix="keystone-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+atexit.register(shutil.rmtree, _db_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def db():
+    """A session on the test database, with every table created"""
+    import app.models  # noqa: F401  (registers the models on Base.metadata)
+    from app.core.database import Base, SessionLocal, engine
+
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
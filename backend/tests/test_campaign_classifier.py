@@ -0,0 +1,46 @@
+import json
+import os
+
+import pytest
+
+from app.services import campaign_classifier
+from app.models.campaign import CampaignRule
+from app.services.campaign_classifier import DEFAULT_RULES, RuleSet, classify, set_ruleset
+from app.services.campaign_rules import campaign_rules
+
+# Raw Meta campaign name -> expected classification, recorded from the original
+# meta_service if-chains (_clean_campaign_name, _extract_date, _remove_date_from_name, _detect_brand)
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "campaign_names.json")
+
+with open(CORPUS_PATH, encoding="utf-8") as f:
+    CORPUS = json.load(f)
+
+
+def expected(case):
+    return (case["campaign_type"], case["brand"], case["campaign_date"], case["display_name"])
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=lambda case: repr(case["name"]))
+def test_classify_matches_corpus(case):
+    assert tuple(classify(case["name"])) == expected(case)
+
+
+def test_seeded_rules_match_corpus(db):
+    # Empty table -> load() seeds DEFAULT_RULES, reads them back and compiles the RuleSet
+    db.query(CampaignRule).delete()
+    db.commit()
+    try:
+        ruleset = campaign_rules.load(db)
+        assert len(ruleset.rules) == len(DEFAULT_RULES)
+        for case in CORPUS:
+            assert tuple(classify(case["name"])) == expected(case), case["name"]
+    finally:
+        set_ruleset(RuleSet(DEFAULT_RULES))
+
+
+def test_default_rules_match_corpus_without_ahocorasick(monkeypatch):
+    monkeypatch.setattr(campaign_classifier, "ahocorasick", None)
+    ruleset = RuleSet(DEFAULT_RULES, version=1)
+    assert ruleset._types._index._automaton is None
+    for case in CORPUS:
+        assert tuple(ruleset.classify(case["name"])) == expected(case), case["name"]
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import responses
+from app.main import app
+from app.models.campaign import CampaignModel
+from app.services.meta_service import meta_service
+
+CAMPAIGNS_URL = "/api/v1/campaigns/"
+
+
+@pytest.fixture
+def client():
+    # httpx asks for gzip/br by default; requests opt in per test instead
+    return TestClient(app, headers={"Accept-Encoding": "identity"})
+
+
+@pytest.fixture
+def campaigns(db, monkeypatch):
+    """40 fresh campaigns published as the in-memory snapshot; refreshes are recorded, not run"""
+    refreshes = []
+    monkeypatch.setattr(meta_service, "refresh_campaigns", lambda force=False: refreshes.append(force))
+    monkeypatch.setattr(meta_service, "_snapshot", None)
+
+    db.query(CampaignModel).delete()
+    db.add_all(
+        CampaignModel(
+            id=str(i),
+            name=f"Masters Fair {i}",
+            raw_name=f"FAM - Masters Fair {i} - Mar 25",
+            status="ACTIVE",
+            effective_status="ACTIVE",
+            total_spend=12.5 * i,
+            total_impressions=1000 * i,
+            campaign_type="LeadGen" if i % 3 == 0 else "Brand",
+            brand="FAM",
+            campaign_date="Mar 25",
+            countries=[],
+            targeted_countries=["GB"],
+            updated_at=datetime.utcnow()
+        )
+        for i in range(40)
+    )
+    db.commit()
+    meta_service._publish_snapshot(db)
+    yield refreshes
+    db.query(CampaignModel).delete()
+    db.commit()
+
+
+def test_campaigns_send_etag_and_answer_if_none_match_with_304(client, campaigns):
+    first = client.get(CAMPAIGNS_URL)
+    assert first.status_code == 200
+    assert first.headers["etag"] == meta_service._snapshot.etag
+    assert first.headers["cache-control"] == "no-cache"
+    assert "content-encoding" not in first.headers
+    assert len(first.json()["Brand"]) + len(first.json()["LeadGen"]) == 40
+
+    second = client.get(CAMPAIGNS_URL, headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["etag"] == first.headers["etag"]
+
+    weak = client.get(CAMPAIGNS_URL, headers={"If-None-Match": f'"stale", W/{first.headers["etag"]}'})
+    assert weak.status_code == 304
+    assert campaigns == []
+
+
+def test_republished_snapshot_gets_a_new_etag(client, campaigns, db):
+    etag = client.get(CAMPAIGNS_URL).headers["etag"]
+
+    db.query(CampaignModel).filter(CampaignModel.id == "1").update({"total_spend": 99.0})
+    db.commit()
+    meta_service._publish_snapshot(db)
+
+    response = client.get(CAMPAIGNS_URL, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+
+def test_campaigns_gzip_when_accepted(client, campaigns, monkeypatch):
+    # Pin gzip so the test doesn't depend on brotli being installed
+    monkeypatch.setattr(responses, "brotli", None)
+    plain = client.get(CAMPAIGNS_URL)
+
+    compressed = client.get(CAMPAIGNS_URL, headers={"Accept-Encoding": "gzip"})
+    assert compressed.status_code == 200
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert compressed.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    assert int(compressed.headers["content-length"]) < len(plain.content)
+    # The test client inflates the body; it must be the same document
+    assert compressed.json() == plain.json()
+
+    # Either variant's tag revalidates the other
+    revalidated = client.get(
+        CAMPAIGNS_URL, headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == compressed.headers["etag"]
+
+
+def test_small_bodies_are_not_compressed(client, campaigns):
+    # No campaign delivered to ZZ: the filtered list is well under RESPONSE_COMPRESS_MIN_BYTES
+    response = client.get(CAMPAIGNS_URL, params={"country": "ZZ"}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.json()["Brand"] == [] and response.json()["LeadGen"] == []
+    assert "etag" in response.headers
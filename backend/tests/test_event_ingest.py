@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from app.models.legacy_event import LegacyEventSignupSnapshot, LegacyEventStat
+from app.services.event_service import EventFeedSnapshot, _as_count, event_service
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (7, 7),
+    ("42", 42),
+    ("12.5", 12),
+    (12.9, 12),
+    ("1,234", 1234),
+    ("N/A", 0),
+    ("", 0),
+    (None, 0),
+    ("nan", 0),
+    ("inf", 0),
+    ([], 0),
+])
+def test_signup_counts_parse_leniently(raw, expected):
+    assert _as_count(raw) == expected
+
+
+@pytest.fixture
+def clean_stats(db, monkeypatch):
+    monkeypatch.setattr(event_service, "_ingested", None)
+    for model in (LegacyEventStat, LegacyEventSignupSnapshot):
+        db.query(model).delete()
+    db.commit()
+    yield db
+    for model in (LegacyEventStat, LegacyEventSignupSnapshot):
+        db.query(model).delete()
+    db.commit()
+
+
+def test_bad_signup_values_do_not_stop_the_ingest(clean_stats):
+    db = clean_stats
+    events = [
+        {"id": 1, "product": "PG LIVE", "venue": "London", "date": "04 Mar 2026", "brand": "FAM", "signups": "N/A"},
+        {"id": 2, "product": "PG LIVE", "venue": "Leeds", "date": "11 Mar 2026", "brand": "FAP", "signups": "12.5"},
+        {"id": 3, "product": "PG LIVE", "venue": "Glasgow", "date": "not a date", "brand": "FAM", "signups": 30},
+    ]
+
+    assert event_service._ingest(EventFeedSnapshot(events, time.time())) == 3
+
+    stats = {s.tag_id: s for s in db.query(LegacyEventStat).all()}
+    assert {tag: s.signups for tag, s in stats.items()} == {"1": 0, "2": 12, "3": 30}
+    assert stats["3"].live_date is None
+    snapshots = {s.tag_id: s.signups for s in db.query(LegacyEventSignupSnapshot).all()}
+    assert snapshots == {"1": 0, "2": 12, "3": 30}
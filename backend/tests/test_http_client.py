@@ -0,0 +1,177 @@
+import json
+import socket
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from app.core import http_client as http_module
+from app.core.config import settings
+from app.core.http_client import HTTPClient, UpstreamThrottled
+
+
+class StubServer:
+    """Local HTTP server that answers with scripted (status, headers, body) tuples, then 200s"""
+
+    def __init__(self):
+        self.responses = deque()
+        self.hits = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _answer(self):
+                length = int(self.headers.get("content-length") or 0)
+                if length:
+                    self.rfile.read(length)
+                stub.hits.append((self.command, self.path, time.monotonic()))
+                status, headers, body = stub.responses.popleft() if stub.responses else (200, {}, {"ok": True})
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _answer
+            do_POST = _answer
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True)
+        self._thread.start()
+
+    def script(self, *responses):
+        self.responses.extend((r, {}, {}) if isinstance(r, int) else r for r in responses)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Short backoff so retry tests run in milliseconds
+    monkeypatch.setattr(settings, "HTTP_BACKOFF_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "HTTP_BACKOFF_MAX_SECONDS", 0.05)
+    return HTTPClient()
+
+
+def upstream_metrics(client):
+    return client.metrics()["127.0.0.1"]
+
+
+def test_retries_503s_then_returns_the_200(client, stub):
+    stub.script(503, 503)
+
+    response = client.request("GET", f"{stub.url}/insights", timeout=5)
+
+    assert response.status_code == 200
+    assert len(stub.hits) == 3
+    metrics = upstream_metrics(client)
+    assert metrics["requests"] == 3
+    assert metrics["retries"] == 2
+    assert metrics["status"] == {"5xx": 2, "2xx": 1}
+
+
+def test_gives_up_after_max_retries_with_the_last_response(client, stub):
+    stub.script(*[502] * 10)
+
+    response = client.request("POST", f"{stub.url}/batch", data={"batch": "[]"}, retries=3, timeout=5)
+
+    assert response.status_code == 502
+    assert len(stub.hits) == 4
+    assert upstream_metrics(client)["retries"] == 3
+
+
+def test_client_errors_are_not_retried(client, stub):
+    stub.script(404, (400, {}, {"error": {"code": 100, "message": "Invalid parameter"}}))
+
+    assert client.request("GET", f"{stub.url}/missing", timeout=5).status_code == 404
+    assert client.request("GET", f"{stub.url}/bad", timeout=5).status_code == 400
+    assert len(stub.hits) == 2
+    assert upstream_metrics(client)["retries"] == 0
+
+
+def test_429_waits_for_retry_after_and_slows_the_host(client, stub):
+    stub.script((429, {"Retry-After": "0.3"}, {}))
+
+    response = client.request("GET", f"{stub.url}/campaigns", timeout=5)
+
+    assert response.status_code == 200
+    assert len(stub.hits) == 2
+    assert stub.hits[1][2] - stub.hits[0][2] >= 0.3
+    metrics = upstream_metrics(client)
+    assert metrics["throttled"] == 1
+    assert metrics["rate_per_second"] < metrics["configured_rate_per_second"]
+
+
+def test_graph_throttle_codes_on_400_are_retried(client, stub):
+    stub.script((400, {}, {"error": {"code": 17, "message": "User request limit reached"}}))
+
+    response = client.request("GET", f"{stub.url}/insights", timeout=5)
+
+    assert response.status_code == 200
+    assert len(stub.hits) == 2
+    assert upstream_metrics(client)["throttled"] == 1
+
+
+def test_usage_headers_scale_the_rate_down(client, stub):
+    stub.script((200, {"X-App-Usage": json.dumps({"call_count": 90, "total_time": 10})}, {}))
+
+    client.request("GET", f"{stub.url}/campaigns", timeout=5)
+
+    metrics = upstream_metrics(client)
+    assert metrics["usage_pct"] == 90
+    assert metrics["rate_per_second"] == pytest.approx(metrics["configured_rate_per_second"] * 0.2)
+
+
+def test_long_pause_fails_fast_with_upstream_throttled(client, stub, monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_MAX_LIMITER_WAIT_SECONDS", 1.0)
+    stub.script((429, {"Retry-After": "120"}, {}))
+
+    # No retries left, so the 429 comes back and the host stays paused for two minutes
+    assert client.request("GET", f"{stub.url}/campaigns", retries=0, timeout=5).status_code == 429
+
+    with pytest.raises(UpstreamThrottled):
+        client.request("GET", f"{stub.url}/campaigns", timeout=5)
+    assert len(stub.hits) == 1
+    assert upstream_metrics(client)["paused_for_seconds"] > 100
+
+
+def test_connection_errors_are_retried_then_raised(client):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    # Nothing listens on the port any more
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.request("GET", f"http://127.0.0.1:{port}/", retries=2, timeout=1)
+    metrics = upstream_metrics(client)
+    assert metrics["errors"] == 3
+    assert metrics["retries"] == 2
+
+
+def test_backoff_is_full_jitter_under_an_exponential_ceiling(client, monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_BACKOFF_BASE_SECONDS", 0.5)
+    monkeypatch.setattr(settings, "HTTP_BACKOFF_MAX_SECONDS", 30.0)
+    monkeypatch.setattr(http_module.random, "uniform", lambda low, high: high)
+
+    assert [client._backoff(attempt, None) for attempt in range(8)] == [0.5, 1, 2, 4, 8, 16, 30, 30]
+    # Retry-After is a floor, not replaced by a shorter jittered delay
+    assert client._backoff(0, 5.0) == 5.0
+    assert client._backoff(6, 5.0) == 30
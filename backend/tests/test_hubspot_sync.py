@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.config import settings
+from app.core.upsert import bulk_upsert
+from app.models.contact import Contact
+from app.models.sync_state import SyncState
+from app.services import hubspot_service as hubspot_module
+from app.services.hubspot_service import HubSpotService
+
+BASE = datetime(2026, 3, 1, 12, 0, 0)
+
+hubspot_service = HubSpotService()
+
+
+def contact(n: int, minutes: int):
+    return SimpleNamespace(
+        id=str(n),
+        properties={"firstname": f"First{n}", "lastname": "Last", "email": f"c{n}@example.com"},
+        updated_at=(BASE + timedelta(minutes=minutes)).replace(tzinfo=timezone.utc)
+    )
+
+
+def page(results, after=None):
+    paging = SimpleNamespace(next=SimpleNamespace(after=str(after))) if after is not None else None
+    return SimpleNamespace(results=results, paging=paging)
+
+
+class FakeCRM:
+    """Serves the same pages to basic_api.get_page and search_api.do_search, recording searches"""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.searches = []
+        self.crm = SimpleNamespace(contacts=SimpleNamespace(
+            basic_api=SimpleNamespace(get_page=self._get_page),
+            search_api=SimpleNamespace(do_search=self._do_search)
+        ))
+
+    def _serve(self, after):
+        return self.pages[int(after or 0)]
+
+    def _get_page(self, limit, after, properties, archived):
+        return self._serve(after)
+
+    def _do_search(self, public_object_search_request):
+        self.searches.append(public_object_search_request)
+        return self._serve(public_object_search_request.after)
+
+
+@pytest.fixture
+def hubspot(db, monkeypatch):
+    """Install a fake CRM; ids in the returned set fail to save, the way a bad row does in bulk_upsert"""
+    failing = set()
+
+    def flaky_upsert(db, model, rows, batch_size=500, columns=None, failed=None):
+        bad = [r for r in rows if r["id"] in failing]
+        if failed is not None:
+            failed.extend(bad)
+        return bulk_upsert(db, model, [r for r in rows if r["id"] not in failing], batch_size, columns)
+
+    monkeypatch.setattr(hubspot_module, "bulk_upsert", flaky_upsert)
+    monkeypatch.setattr(hubspot_module.time, "sleep", lambda seconds: None)
+    monkeypatch.setattr(hubspot_service, "INGEST_BATCH_SIZE", 2)
+    db.query(Contact).delete()
+    db.query(SyncState).filter(SyncState.key == hubspot_service.SYNC_KEY).delete()
+    db.commit()
+    hubspot_service.invalidate_count()
+
+    def install(pages):
+        fake = FakeCRM(pages)
+        monkeypatch.setattr(hubspot_service, "client", fake)
+        return fake
+
+    yield install, failing
+    db.query(Contact).delete()
+    db.query(SyncState).filter(SyncState.key == hubspot_service.SYNC_KEY).delete()
+    db.commit()
+
+
+def watermark(db):
+    db.expire_all()
+    return db.get(SyncState, hubspot_service.SYNC_KEY).watermark
+
+
+def set_watermark(db, value):
+    db.merge(SyncState(key=hubspot_service.SYNC_KEY, watermark=value))
+    db.commit()
+
+
+def test_incremental_sync_advances_to_newest_when_everything_saves(db, hubspot):
+    install, _ = hubspot
+    set_watermark(db, BASE)
+    install([page([contact(1, 1), contact(2, 2)], after=1), page([contact(3, 3), contact(4, 4)])])
+
+    assert hubspot_service.sync_contacts_incremental(db) == 4
+    assert watermark(db) == BASE + timedelta(minutes=4)
+
+
+def test_incremental_sync_holds_watermark_at_oldest_failed_row(db, hubspot):
+    install, failing = hubspot
+    set_watermark(db, BASE)
+    failing.add("2")
+    install([page([contact(1, 1), contact(2, 2)], after=1), page([contact(3, 3), contact(4, 4)])])
+
+    assert hubspot_service.sync_contacts_incremental(db) == 3
+    # Later batches saved fine, but the watermark stays at contact 2's modification time
+    assert watermark(db) == BASE + timedelta(minutes=2)
+    assert db.get(Contact, "2") is None
+
+    # The next run searches from there (minus the overlap) and picks contact 2 up
+    failing.clear()
+    crm = install([page([contact(2, 2), contact(3, 3), contact(4, 4)])])
+    assert hubspot_service.sync_contacts_incremental(db) == 1
+    since = BASE + timedelta(minutes=2) - timedelta(seconds=settings.HUBSPOT_SYNC_OVERLAP_SECONDS)
+    expected = str(int(since.replace(tzinfo=timezone.utc).timestamp() * 1000))
+    assert crm.searches[0].filter_groups[0].filters[0].value == expected
+    assert db.get(Contact, "2") is not None
+    assert watermark(db) == BASE + timedelta(minutes=4)
+
+
+def test_full_sync_pulls_watermark_back_to_a_failed_older_row(db, hubspot):
+    install, failing = hubspot
+    set_watermark(db, BASE + timedelta(days=1))
+    failing.add("7")
+    install([page([contact(7, 30), contact(8, 60)], after=1), page([contact(9, 90)])])
+
+    assert hubspot_service.sync_contacts_full(db) == 2
+    assert watermark(db) == BASE + timedelta(minutes=30)
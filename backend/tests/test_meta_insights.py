@@ -0,0 +1,121 @@
+import json
+import math
+import threading
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+import requests
+
+from app.services import meta_service as meta_module
+from app.services.meta_service import meta_service
+
+N_CAMPAIGNS = 1234
+
+
+class FakeResponse:
+    def __init__(self, body, status_code: int = 200):
+        self._body = body
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class FakeGraph:
+    """
+    Stands in for http_client.request: batch POSTs answer every sub-request unless its
+    campaign id is in failed_items, or the whole POST fails when it contains a failed_posts id.
+    Per-ID GETs (the fallback path) answer with their own spend so the tests can tell them apart.
+    """
+
+    def __init__(self, failed_items=(), failed_posts=()):
+        self.failed_items = set(failed_items)
+        self.failed_posts = set(failed_posts)
+        self.gets = []
+        self.posts = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        if method == "GET":
+            campaign_id = urlsplit(url).path.split("/")[-2]
+            with self._lock:
+                self.gets.append(campaign_id)
+            return FakeResponse({"data": [{"spend": "9", "impressions": "90"}]})
+
+        batch = json.loads(data["batch"])
+        ids = [sub["relative_url"].split("/")[0] for sub in batch]
+        with self._lock:
+            self.posts.append(ids)
+        assert len(batch) <= meta_service.GRAPH_BATCH_LIMIT
+        assert all(parse_qs(urlsplit(sub["relative_url"]).query)["date_preset"] == ["maximum"] for sub in batch)
+        if self.failed_posts & set(ids):
+            return FakeResponse({"error": {"message": "Please reduce the amount of data"}}, status_code=500)
+        results = []
+        for campaign_id in ids:
+            if campaign_id in self.failed_items:
+                # Meta returns null for sub-requests that timed out on its side
+                results.append(None)
+            else:
+                results.append({"code": 200, "body": json.dumps({"data": [{"spend": "2", "impressions": "20"}]})})
+        return FakeResponse(results)
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    def install(**kwargs):
+        fake = FakeGraph(**kwargs)
+        monkeypatch.setattr(meta_module.http_client, "request", fake.request)
+        return fake
+    return install
+
+
+def campaign_ids(n=N_CAMPAIGNS):
+    return [str(10_000 + i) for i in range(n)]
+
+
+def test_insights_take_one_post_per_50_campaigns(graph):
+    fake = graph()
+    ids = campaign_ids()
+
+    insights = meta_service.fetch_campaign_insights_batch(ids)
+
+    assert len(fake.posts) == math.ceil(N_CAMPAIGNS / meta_service.GRAPH_BATCH_LIMIT)
+    assert fake.gets == []
+    assert sorted(i for chunk in fake.posts for i in chunk) == sorted(ids)
+    assert set(insights) == set(ids)
+    assert all(insight == {"spend": "2", "impressions": "20"} for insight in insights.values())
+
+
+def test_failed_sub_requests_fall_back_to_single_gets(graph):
+    ids = campaign_ids()
+    failed = set(ids[3::97])
+    fake = graph(failed_items=failed)
+
+    insights = meta_service.fetch_campaign_insights_batch(ids)
+
+    assert len(fake.posts) == math.ceil(N_CAMPAIGNS / meta_service.GRAPH_BATCH_LIMIT)
+    # Only the failed items are re-fetched, once each
+    assert sorted(fake.gets) == sorted(failed)
+    assert set(insights) == set(ids)
+    for campaign_id, insight in insights.items():
+        expected = {"spend": "9", "impressions": "90"} if campaign_id in failed else {"spend": "2", "impressions": "20"}
+        assert insight == expected
+
+
+def test_failed_batch_post_falls_back_for_its_chunk_only(graph):
+    ids = campaign_ids()
+    limit = meta_service.GRAPH_BATCH_LIMIT
+    broken_chunk = ids[2 * limit:3 * limit]
+    fake = graph(failed_posts={broken_chunk[0]})
+
+    insights = meta_service.fetch_campaign_insights_batch(ids)
+
+    assert len(fake.posts) == math.ceil(N_CAMPAIGNS / limit)
+    assert sorted(fake.gets) == sorted(broken_chunk)
+    assert set(insights) == set(ids)
+    assert all(insights[i] == {"spend": "9", "impressions": "90"} for i in broken_chunk)
@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { DataGrid, type GridColDef, GridToolbar } from '@mui/x-data-grid';
 import { Box, Typography, Paper } from '@mui/material';
 import axios from 'axios';
@@ -22,19 +22,25 @@ const Contacts = () => {
         page: 0,
         pageSize: 100,
     });
+    // nextCursor returned for each page, so page N+1 is fetched by keyset instead of offset
+    const cursorsRef = useRef<Record<number, string>>({});
 
     useEffect(() => {
         const fetchContacts = async () => {
             setLoading(true);
             try {
-                // Fetch paginated data
+                // Fetch paginated data (cursor when we have one, page number otherwise)
+                const cursor = cursorsRef.current[paginationModel.page];
                 const response = await axios.get('http://localhost:8000/api/v1/hubspot/contacts', {
-                    params: {
-                        page: paginationModel.page,
-                        pageSize: paginationModel.pageSize
-                    }
+                    params: cursor
+                        ? { cursor, pageSize: paginationModel.pageSize }
+                        : { page: paginationModel.page, pageSize: paginationModel.pageSize }
                 });
 
+                if (response.data.nextCursor) {
+                    cursorsRef.current[paginationModel.page + 1] = response.data.nextCursor;
+                }
+
                 // Handle new response structure { items: [], total: ... }
                 // Fallback to empty array if items is undefined
                 setRows(response.data.items || []);
@@ -98,7 +104,13 @@ const Contacts = () => {
                     pageSizeOptions={[100]}
                     paginationModel={paginationModel}
                     paginationMode="server"
-                    onPaginationModelChange={setPaginationModel}
+                    onPaginationModelChange={(model) => {
+                        // Cursors are only valid for the page size they were issued with
+                        if (model.pageSize !== paginationModel.pageSize) {
+                            cursorsRef.current = {};
+                        }
+                        setPaginationModel(model);
+                    }}
                     slots={{ toolbar: GridToolbar }}
                     slotProps={{
                         toolbar: {